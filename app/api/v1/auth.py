@@ -1,9 +1,10 @@
 # app/api/v1/auth.py
 
-import re
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
+from app.core.login_throttle import controlador_login
+from app.core.documentos import somente_digitos
 from app.core.security import (
     authenticate_user,
     create_access_token,
@@ -32,8 +33,14 @@ class ChangePasswordRequest(BaseModel):
 
 
 @router.post("/login", response_model=dict)
-async def login(login: UserLogin, db: AsyncSession = Depends(get_db)):
-    user = await authenticate_user(db, login.username, login.password)
+async def login(
+    login: UserLogin, request: Request, db: AsyncSession = Depends(get_db)
+):
+    # Rejeita com 429 antes de qualquer trabalho de bcrypt
+    ip = controlador_login.ip_da_requisicao(request)
+    async with controlador_login.admitir(login.username, ip):
+        user = await authenticate_user(db, login.username, login.password)
+
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -206,7 +213,7 @@ async def reset_password(
         )
 
     # 3. Remover máscara do CNPJ/CPF do usuário-alvo
-    clean_documento = re.sub(r"\D", "", target_user.cnpj_cpf)
+    clean_documento = somente_digitos(target_user.cnpj_cpf)
 
     # 4. Gerar hash da nova senha (CPF/CNPJ sem máscara)
     new_hashed_password = get_password_hash(clean_documento)
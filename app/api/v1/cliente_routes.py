@@ -1,6 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
+from app.core.replica import get_read_db
 from app.schemas.cliente import Cliente, ClienteCreate
 from app.crud.cliente import (
     get_cliente_by_id,
@@ -10,13 +20,38 @@ from app.crud.cliente import (
     get_clientes_by_usuario_id,
     delete_cliente,
     get_todos_os_clientes,
+    importar_clientes,
+    buscar_clientes,
 )
+from app.core.importacao import ler_registros
+from app.core.documentos import formatar_cpf_cnpj
 from app.core.security import get_current_user
 from app.schemas.usuario import User
 
 router = APIRouter()
 
 
+@router.get("/busca", response_model=list[Cliente])
+async def buscar_clientes_autocomplete(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    cursor: str | None = None,
+    limite: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    # Admin busca em todos os clientes; demais usuários só nos próprios
+    usuario_id = None if current_user.role_id == 1 else current_user.id
+    clientes, proximo_cursor = await buscar_clientes(
+        db, q, usuario_id, cursor=cursor, limite=limite
+    )
+
+    if proximo_cursor:
+        response.headers["X-Proximo-Cursor"] = proximo_cursor
+
+    return clientes
+
+
 @router.get("/{id}", response_model=Cliente)
 async def obter_cliente_by_id(
     id: int,
@@ -66,9 +101,19 @@ async def criar_cliente(
     return await create_cliente(db, cliente_novo.model_dump(), current_user.id)
 
 
+@router.post("/importar")
+async def importar_clientes_lote(
+    arquivo: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    registros = ler_registros(await arquivo.read(), arquivo.filename)
+    return await importar_clientes(db, registros, current_user.id)
+
+
 @router.get("/", response_model=list[Cliente])
 async def listar_clientes(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user),
 ):
 
@@ -105,14 +150,7 @@ async def deletar_cliente(
     documento = cliente.cpf_cnpj
 
     # Formata documento como CPF ou CNPJ
-    if len(documento) == 14:  # CNPJ limpo tem 14 dígitos
-        documento_formatado = f"{documento[:2]}.{documento[2:5]}.{documento[5:8]}/{documento[8:12]}-{documento[12:]}"
-    elif len(documento) == 11:  # CPF limpo tem 11 dígitos
-        documento_formatado = (
-            f"{documento[:3]}.{documento[3:6]}.{documento[6:9]}-{documento[9:]}"
-        )
-    else:
-        documento_formatado = documento
+    documento_formatado = formatar_cpf_cnpj(documento) if documento else documento
 
     await delete_cliente(db, id, current_user.id)
 
@@ -0,0 +1,81 @@
+# app/api/v1/cnae.py
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app.core.security import get_current_user
+from app.core.catalogo_cnae import catalogo_cnae
+from app.core.importacao import ler_catalogo_cnae_csv
+from app.core.instrumentacao_db import orcamento_consultas
+from app.crud.cnae_lista_servicos import importar_catalogo_cnae
+from app.schemas.usuario import User
+from app.schemas.cnae_lista_servicos import CnaeListaServico
+
+router = APIRouter()
+
+
+@router.get(
+    "/search",
+    response_model=list[CnaeListaServico],
+    dependencies=[Depends(orcamento_consultas(4))],  # carga inicial do catálogo (+ usuário)
+)
+async def buscar_cnae(
+    q: str = Query(..., min_length=1),
+    limite: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Busca no catálogo CNAE × lista de serviços, toda em memória: prefixo do
+    código numérico ou termos das descrições (sem acento, com ranking).
+    """
+    await catalogo_cnae.garantir_carregado(db)
+    return [linha._asdict() for linha in catalogo_cnae.buscar(q, limite)]
+
+
+@router.post("/recarregar")
+async def recarregar_catalogo_cnae(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Recarrega o catálogo CNAE em memória e publica uma nova versão, para que
+    os demais workers também recarreguem na próxima verificação.
+    """
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Apenas administradores podem executar esta ação.",
+        )
+
+    await catalogo_cnae.publicar_alteracao(db)
+    return {"versao": catalogo_cnae.versao, "total": len(catalogo_cnae.dados.linhas)}
+
+
+@router.post("/importar")
+async def importar_catalogo(
+    arquivo: UploadFile = File(...),
+    dry_run: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Carrega a planilha oficial CNAE × LC 116 (CSV), aplicando só a diferença
+    em relação à tabela atual. Com dry_run=true apenas informa o que mudaria.
+    """
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Apenas administradores podem executar esta ação.",
+        )
+
+    # Parsing síncrono do arquivo temporário fora do event loop
+    linhas, erros = await run_in_threadpool(ler_catalogo_cnae_csv, arquivo.file)
+    if not linhas:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Nenhuma linha válida no arquivo; o catálogo não foi alterado.",
+        )
+
+    relatorio = await importar_catalogo_cnae(db, linhas, dry_run=dry_run)
+    return {**relatorio, "rejeitados": len(erros), "erros": erros[:100]}
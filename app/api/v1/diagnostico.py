@@ -0,0 +1,51 @@
+# app/api/v1/diagnostico.py
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.core.config import settings
+from app.core.instrumentacao_db import consultas_lentas
+from app.core.security import get_current_user
+from app.core.replica import roteador_leitura
+from app.database import engine, replica_engine
+from app.schemas.usuario import User
+
+router = APIRouter()
+
+
+def _exigir_admin(current_user: User):
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Apenas administradores podem executar esta ação.",
+        )
+
+
+@router.get("/pool")
+async def metricas_pool(current_user: User = Depends(get_current_user)):
+    """
+    Estado do pool de conexões deste worker: conexões em uso, overflow e
+    tempo de espera por uma conexão livre.
+    """
+    _exigir_admin(current_user)
+    metricas = {"perfil": settings.DB_PROFILE, **engine.pool.metricas()}
+    if replica_engine is not None:
+        metricas["replica"] = {
+            "saudavel": await roteador_leitura.replica_saudavel(),
+            "lag_segundos": roteador_leitura.lag,
+            **replica_engine.pool.metricas(),
+        }
+    return metricas
+
+
+@router.get("/consultas-lentas")
+async def listar_consultas_lentas(
+    limite: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Últimas consultas acima de CONSULTAS_LENTAS_MS neste worker (mais recentes
+    primeiro), com parâmetros redigidos e, quando amostrado, o plano.
+    """
+    _exigir_admin(current_user)
+    return {
+        "limite_ms": settings.CONSULTAS_LENTAS_MS,
+        "consultas": consultas_lentas.listar(limite),
+    }
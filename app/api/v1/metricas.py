@@ -0,0 +1,27 @@
+# app/api/v1/metricas.py
+import secrets
+from fastapi import APIRouter, Header, HTTPException, Response, status
+from app.core.config import settings
+from app.core.metricas import registro
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metricas_prometheus(authorization: str | None = Header(None)):
+    """
+    Métricas deste worker no formato texto do Prometheus. O coletor precisa
+    enviar "Authorization: Bearer <METRICAS_TOKEN>"; sem token configurado o
+    endpoint não existe (as métricas expõem rotas e volumes internos).
+    """
+    if not settings.METRICAS_HABILITADAS or not settings.METRICAS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not secrets.compare_digest(
+        authorization or "", f"Bearer {settings.METRICAS_TOKEN}"
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Não autorizado.")
+
+    return Response(
+        content=registro.renderizar(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,7 +1,10 @@
 # app/api/v1/invoices.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+import uuid
+from datetime import date
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
+from app.core.replica import get_read_db
 from app.schemas.nota_fiscal import (
     NotaFiscal,
     NotaFiscalCreate,
@@ -10,19 +13,29 @@ from app.schemas.nota_fiscal import (
     AtualizarStatusNotaPayload,
     AtualizarStatusMotivoNotaPayload,
     AtualizarStutasNotaAceitePayload,
+    AcaoNotasLotePayload,
+    RecusarNotasLotePayload,
+    ResultadoAcaoLote,
+    PendenciasPorUsuario,
 )
 from app.schemas.usuario import User
 from app.schemas.cliente import Cliente
+from app.core.instrumentacao_db import orcamento_consultas
 from app.core.security import get_current_user
 from app.crud.nota_fiscal import (
-    create_nota_fiscal,
+    criar_nota_fiscal_com_cliente,
     get_notas_by_usuario,
     update_status_nota,
     update_nota_fiscal,
     get_todas_notas,
+    get_fila_pendentes,
+    get_pendencias_por_usuario,
+    contar_pendentes,
     get_nota_usuario_by_id,
     recusar_nota_fiscal,
     aprovar_nota_fiscal,
+    aprovar_notas_em_lote,
+    recusar_notas_em_lote,
     emitir_nota_finalizada,
 )
 from app.crud.cliente import (
@@ -45,65 +58,8 @@ async def emitir_nota(
     current_user: User = Depends(get_current_user),
 ):
 
-    # Verifica se existe cliente
-    cliente: Cliente = await get_cliente_by_cpf_cnpj(
-        db, nota_nova.cpf_cnpj, current_user.id
-    )
-
-    # Cria cliente se necessário
-    if cliente is None:
-        cliente_data = {
-            "razao_social": nota_nova.razao_social,
-            "cpf_cnpj": nota_nova.cpf_cnpj,
-            "email": nota_nova.email,
-            "telefone": nota_nova.telefone,
-            "pais": nota_nova.pais,
-            "uf": nota_nova.uf,
-            "cidade": nota_nova.cidade,
-            "cep": nota_nova.cep,
-            "logradouro": nota_nova.logradouro,
-            "numero": nota_nova.numero,
-            "complemento": nota_nova.complemento,
-            "bairro": nota_nova.bairro,
-        }
-
-        cliente = await create_cliente(db, cliente_data, current_user.id)
-
-    else:
-
-        if not cliente:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Cliente não encontrado.",
-            )
-        if cliente.usuario_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Você não tem permissão para emitir nota para este cliente.",
-            )
-
-    codigo_lista_servico = await get_codigo_servico_by_cnae(db, nota_nova.cod_cnae)
-    
-    if codigo_lista_servico is None:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Não foi encontrado código da Lista de Serviços para o CNAE {nota_nova.cod_cnae}."
-        )
-    
-    # Prepara dados da nota fiscal
-    nota_data = {
-        "usuario_id": current_user.id,
-        "cliente_id": cliente.id,
-        "cod_cnae": nota_nova.cod_cnae,
-        "valor_total": nota_nova.valor_total,
-        "descricao": nota_nova.descricao,
-        "status_id": 1,
-        "aliquota": current_user.aliquota,
-        "codigo_lista_servico": codigo_lista_servico,
-    }
-
-    # Cria a nota fiscal no banco
-    nota_fiscal = await create_nota_fiscal(db, nota_data)
+    # Cliente (upsert), código de serviço e nota em uma única transação
+    nota_fiscal = await criar_nota_fiscal_com_cliente(db, nota_nova, current_user)
 
     # # 👇 Envia notificação ao administrador
     # try:
@@ -122,37 +78,96 @@ async def emitir_nota(
 
 
 @router.post(
-    "/emitir-finalizada", response_model=NotaFiscal, status_code=status.HTTP_201_CREATED
+    "/emitir-finalizada",
+    response_model=NotaFiscal,
+    status_code=status.HTTP_201_CREATED,
+    # reserva, cliente, prestador e id da API (ou a devolução para Pendente,
+    # ou a releitura da nota quando o id da API não pôde ser vinculado)
+    dependencies=[Depends(orcamento_consultas(6))],
 )
 async def emitir_nota_finalizada_endpoint(
     payload: AtualizarStutasNotaAceitePayload,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return await emitir_nota_finalizada(db, payload.nota_id ,current_user)
+    nota = await emitir_nota_finalizada(db, payload.nota_id ,current_user)
+    if nota.id_api is None:
+        # Emitida, mas o ID da API ainda não foi vinculado: a sincronização concilia
+        response.status_code = status.HTTP_202_ACCEPTED
+    return nota
 
 
 @router.get("/", response_model=list[NotaFiscalComCliente])
 async def listar_minhas_notas(
+    desde: date | None = None,
+    ate: date | None = None,
+    # Primário: a listagem sincroniza com a API as notas em processamento
+    # (UPDATE + commit), o que falha numa réplica somente leitura
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
 
-    notas = await get_notas_by_usuario(db, current_user.id)
+    notas = await get_notas_by_usuario(db, current_user.id, desde=desde, ate=ate)
 
     return notas or []
 
 
 @router.get("/admin", response_model=list[NotaFiscalComClienteEUsuario])
 async def listar_notas(
-    db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
+    desde: date | None = None,
+    ate: date | None = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+
+    notas = await get_todas_notas(db, current_user, desde=desde, ate=ate)
+
+    return notas
+
+
+@router.get("/fila", response_model=list[NotaFiscalComClienteEUsuario])
+async def fila_pendentes(
+    response: Response,
+    cursor: str | None = None,
+    limite: int = Query(100, ge=1, le=500),
+    usuario_id: uuid.UUID | None = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
 ):
+    """
+    Notas pendentes de revisão, da mais antiga para a mais nova (todas ou de
+    um usuário). O total de pendentes vai no cabeçalho X-Total-Pendentes.
+    """
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=403, detail="Apenas administradores podem executar esta ação."
+        )
+
+    notas, proximo_cursor = await get_fila_pendentes(
+        db, cursor=cursor, limit=limite, usuario_id=usuario_id
+    )
 
-    notas = await get_todas_notas(db, current_user)
+    response.headers["X-Total-Pendentes"] = str(await contar_pendentes(db, usuario_id))
+    if proximo_cursor:
+        response.headers["X-Proximo-Cursor"] = proximo_cursor
 
     return notas
 
 
+@router.get("/fila/usuarios", response_model=list[PendenciasPorUsuario])
+async def fila_pendentes_por_usuario(
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Fila agrupada por usuário: pendentes e a pendente mais antiga de cada um."""
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=403, detail="Apenas administradores podem executar esta ação."
+        )
+    return await get_pendencias_por_usuario(db)
+
+
 @router.get("/{nota_id}", response_model=NotaFiscalComCliente)
 async def listar_minhas_notas(
     db: AsyncSession = Depends(get_db),
@@ -183,6 +198,7 @@ async def recusar_nota(
         nota_atualizada.nota_id,
         nota_atualizada.status_id,
         nota_atualizada.desc_motivo,
+        current_user.id,
     )
 
     if not nota:
@@ -205,12 +221,45 @@ async def aprovar_nota(
             status_code=403, detail="Apenas administradores podem executar esta ação."
         )
 
-    nota = await aprovar_nota_fiscal(db, payload.nota_id)  # ← só ID
+    nota = await aprovar_nota_fiscal(db, payload.nota_id, current_user.id)  # ← só ID
     if not nota:
         raise HTTPException(status_code=404, detail="Nota não encontrada.")
     return nota
 
 
+@router.put("/aprovar-lote", response_model=ResultadoAcaoLote)
+async def aprovar_notas_lote(
+    payload: AcaoNotasLotePayload,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Aprova de uma vez as notas pendentes da lista. Notas em outro status (ou
+    inexistentes) são ignoradas e listadas com o motivo.
+    """
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=403, detail="Apenas administradores podem executar esta ação."
+        )
+    return await aprovar_notas_em_lote(db, payload.nota_ids, current_user.id)
+
+
+@router.put("/recusar-lote", response_model=ResultadoAcaoLote)
+async def recusar_notas_lote(
+    payload: RecusarNotasLotePayload,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Recusa de uma vez as notas pendentes da lista, com o mesmo motivo."""
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=403, detail="Apenas administradores podem executar esta ação."
+        )
+    return await recusar_notas_em_lote(
+        db, payload.nota_ids, payload.desc_motivo, current_user.id
+    )
+
+
 @router.put("/{nota_id}/status", response_model=NotaFiscal)
 async def atualizar_status(
     nota_id: int,
@@ -220,7 +269,12 @@ async def atualizar_status(
     return await update_status_nota(db, nota_id, payload.status_id)
 
 
-@router.put("/{nota_id}", response_model=NotaFiscalComCliente)
+@router.put(
+    "/{nota_id}",
+    response_model=NotaFiscalComCliente,
+    # edição da nota e do cliente; carga inicial do catálogo CNAE se fria
+    dependencies=[Depends(orcamento_consultas(6))],
+)
 async def atualizar_nota(
     nota_id: int,
     nota_atualizada: NotaFiscalCreate,
@@ -1,33 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+from app.core.catalogo_status import catalogo_status
+from app.core.config import settings
+from app.core.instrumentacao_db import orcamento_consultas
+from app.core.metricas import cache_consultas
 from app.database import get_db
-from app.core.security import get_current_user
-from app.schemas.usuario import User  # Schema do usuário autenticado
-from app.crud.status import get_status_by_id, get_all_status
+from app.core.security import verificar_token
 from app.schemas.status_nota import StatusNota as StatusNotaSchema
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[StatusNotaSchema])
+def _resposta_em_cache(request: Request, corpo: bytes, etag: str) -> Response:
+    # Lista praticamente estática: o navegador revalida com If-None-Match e recebe 304.
+    # Rota autenticada: só o cache do navegador guarda, nunca proxies compartilhados
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.CATALOGO_CACHE_MAX_AGE}",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match == "*":
+        cache_consultas.incrementar("etag_status", "acerto")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    cache_consultas.incrementar("etag_status", "falha")
+    return Response(content=corpo, media_type="application/json", headers=headers)
+
+
+# Servidos da memória: só a carga inicial do catálogo consulta o banco
+@router.get(
+    "/",
+    response_model=List[StatusNotaSchema],
+    dependencies=[Depends(orcamento_consultas(2))],
+)
 async def get_all_status_endpoint(
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)  # ← Protegido
+    token: dict = Depends(verificar_token)  # ← Protegido (só valida o JWT)
 ):
-    return await get_all_status(db)
+    await catalogo_status.garantir_carregado(db)
+    dados = catalogo_status.dados
+    return _resposta_em_cache(request, dados.corpo_lista, dados.etag_lista)
 
 
-@router.get("/{id}", response_model=StatusNotaSchema)
+@router.get(
+    "/{id}",
+    response_model=StatusNotaSchema,
+    dependencies=[Depends(orcamento_consultas(2))],
+)
 async def get_status_by_id_endpoint(
     id: int,
+    request: Request,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)  # ← Protegido
+    token: dict = Depends(verificar_token)  # ← Protegido (só valida o JWT)
 ):
-    status = await get_status_by_id(db, id)
-    if not status:
+    await catalogo_status.garantir_carregado(db)
+    dados = catalogo_status.dados
+    if id not in dados.corpos:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Status não encontrado"
         )
-    return status
\ No newline at end of file
+    return _resposta_em_cache(request, dados.corpos[id], dados.etags[id])
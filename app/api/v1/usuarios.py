@@ -1,28 +1,62 @@
 # app/api/v1/usuarios.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
+from app.core.replica import get_read_db
 from app.crud.usuario import get_users
 from app.core.security import get_current_user
-from app.schemas.usuario import User, UserBase
+from app.schemas.usuario import User, UserBase, UsuarioListagem
 from app.models.usuario import Usuario
 from app.schemas.nota_fiscal import NotaFiscal
 from sqlalchemy import update, select
 from app.crud.usuario import atualizar_aliquotas_notas_em_lote, get_user_by_documento
+from app.crud.usuario import importar_usuarios
+from app.core.importacao import ler_registros
 
 router = APIRouter()
 
 
-@router.get("/", response_model=list[User])
+@router.get("/", response_model=list[UsuarioListagem])
 async def listar_usuarios(
-    db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
+    response: Response,
+    cursor: str | None = None,
+    limite: int = Query(100, ge=1, le=500),
+    busca: str | None = None,
+    emite: bool | None = None,
+    role_id: int | None = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
 ):
-    usuarios = await get_users(db, current_user, skip=0, limit=100)
+    usuarios, proximo_cursor = await get_users(
+        db,
+        current_user,
+        cursor=cursor,
+        limit=limite,
+        busca=busca,
+        emite=emite,
+        role_id=role_id,
+    )
+
+    # O cursor da próxima página vai no cabeçalho para manter o corpo como lista
+    if proximo_cursor:
+        response.headers["X-Proximo-Cursor"] = proximo_cursor
+
     return usuarios
 
 
 @router.post("/atualizar-aliquotas-lote")
 async def atualizar_aliquotas_lote(
+    dry_run: bool = False,
+    tamanho_lote: int | None = Query(None, ge=1),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -32,10 +66,34 @@ async def atualizar_aliquotas_lote(
             detail="Apenas administradores podem executar esta ação.",
         )
 
-    resultado = await atualizar_aliquotas_notas_em_lote(db)
+    resultado = await atualizar_aliquotas_notas_em_lote(
+        db, dry_run=dry_run, tamanho_lote=tamanho_lote
+    )
     return resultado
 
 
+@router.post("/importar")
+async def importar_usuarios_lote(
+    arquivo: UploadFile = File(...),
+    manter_role: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Cadastro em lote de usuários a partir de CSV ou JSON. No CSV, a coluna
+    "atividades" segue o formato "cnae:descrição|cnae:descrição". O role_id
+    do arquivo só é usado com ?manter_role=true.
+    """
+    if current_user.role_id != 1:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Apenas administradores podem executar esta ação.",
+        )
+
+    registros = ler_registros(await arquivo.read(), arquivo.filename)
+    return await importar_usuarios(db, registros, manter_role=manter_role)
+
+
 @router.get("/meusDadosUsuario", response_model=UserBase)
 async def read_users_me(
     db: AsyncSession = Depends(get_db),
@@ -0,0 +1,45 @@
+# app/cli/arquivar_notas.py
+"""
+Arquivo frio de notas fiscais: exporta notas finalizadas antigas para
+arquivos comprimidos (saindo da tabela) e restaura notas do arquivo.
+
+Uso:
+    python -m app.cli.arquivar_notas exportar [--idade-dias 365] [--lote 1000] [--dry-run]
+    python -m app.cli.arquivar_notas restaurar 123 456 ...
+"""
+import argparse
+import asyncio
+import json
+from app.core.schema import verificar_banco
+from app.crud.arquivo_notas import arquivar_notas_antigas, restaurar_notas
+from app.database import AsyncSessionLocal, engine
+
+
+async def main(args):
+    await verificar_banco()
+
+    async with AsyncSessionLocal() as db:
+        if args.comando == "exportar":
+            relatorio = await arquivar_notas_antigas(
+                db, idade_dias=args.idade_dias, lote=args.lote, dry_run=args.dry_run
+            )
+        else:
+            relatorio = await restaurar_notas(db, args.nota_ids)
+    print(json.dumps(relatorio, ensure_ascii=False))
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    exportar = comandos.add_parser("exportar", help="Move notas antigas para o arquivo frio")
+    exportar.add_argument("--idade-dias", type=int, default=None)
+    exportar.add_argument("--lote", type=int, default=None, help="Notas por transação")
+    exportar.add_argument("--dry-run", action="store_true", help="Só conta as notas")
+
+    restaurar = comandos.add_parser("restaurar", help="Devolve notas do arquivo para a tabela")
+    restaurar.add_argument("nota_ids", type=int, nargs="+")
+
+    asyncio.run(main(parser.parse_args()))
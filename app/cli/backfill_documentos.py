@@ -0,0 +1,98 @@
+# app/cli/backfill_documentos.py
+"""
+Preenche as colunas normalizadas clientes.cpf_cnpj_digitos e
+usuarios.cnpj_cpf_digitos nos registros antigos (comando de uso único).
+
+Roda em lotes, antes dos índices: o índice único
+ux_clientes_usuario_cpf_cnpj_digitos só é criado no fim, se não houver
+documentos duplicados para o mesmo usuário; havendo, eles são listados
+para unificação e o comando pode ser repetido depois.
+
+Uso:
+    python -m app.cli.backfill_documentos [--lote 5000]
+"""
+import argparse
+import asyncio
+from sqlalchemy import text
+from app.core.schema import garantir_colunas, preparar_banco
+from app.database import engine
+
+_TABELAS = [
+    # (tabela, coluna original, coluna normalizada)
+    ("clientes", "cpf_cnpj", "cpf_cnpj_digitos"),
+    ("usuarios", "cnpj_cpf", "cnpj_cpf_digitos"),
+]
+
+
+async def _preencher(tabela: str, origem: str, destino: str, lote: int) -> int:
+    total = 0
+    while True:
+        # Lotes pequenos com commit próprio para não segurar locks por muito tempo
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                text(
+                    f"""
+                    UPDATE {tabela} SET {destino} = regexp_replace({origem}, '\\D', '', 'g')
+                    WHERE id IN (
+                        SELECT id FROM {tabela}
+                        WHERE {destino} IS NULL AND {origem} IS NOT NULL
+                        LIMIT :lote
+                    )
+                    """
+                ),
+                {"lote": lote},
+            )
+        if result.rowcount == 0:
+            return total
+        total += result.rowcount
+        print(f"[BACKFILL] {tabela}: {total} registros preenchidos")
+
+
+async def _relatar_duplicados(limite: int = 50) -> int:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text(
+                """
+                SELECT usuario_id, cpf_cnpj_digitos, array_agg(id ORDER BY id) AS ids
+                FROM clientes
+                WHERE cpf_cnpj_digitos IS NOT NULL
+                GROUP BY usuario_id, cpf_cnpj_digitos
+                HAVING count(*) > 1
+                ORDER BY usuario_id, cpf_cnpj_digitos
+                """
+            )
+        )
+        duplicados = result.all()
+    for usuario_id, documento, ids in duplicados[:limite]:
+        print(f"[BACKFILL] Duplicado: usuário {usuario_id}, documento {documento}, clientes {ids}")
+    if len(duplicados) > limite:
+        print(f"[BACKFILL] ... e mais {len(duplicados) - limite}")
+    return len(duplicados)
+
+
+async def main(lote: int):
+    # Só as colunas: os índices sobre elas esperam o preenchimento
+    await garantir_colunas()
+
+    for tabela, origem, destino in _TABELAS:
+        total = await _preencher(tabela, origem, destino, lote)
+        print(f"[BACKFILL] {tabela}: concluído ({total} registros)")
+
+    duplicados = await _relatar_duplicados()
+    if duplicados:
+        print(
+            f"[BACKFILL] Atenção: {duplicados} documentos de cliente duplicados para o "
+            "mesmo usuário; o índice único ux_clientes_usuario_cpf_cnpj_digitos só será "
+            "criado depois que forem unificados."
+        )
+    else:
+        # Agora sem duplicados, os índices sobre as colunas novas podem ser criados
+        await preparar_banco()
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill dos documentos normalizados")
+    parser.add_argument("--lote", type=int, default=5000)
+    asyncio.run(main(parser.parse_args().lote))
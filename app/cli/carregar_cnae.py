@@ -0,0 +1,47 @@
+# app/cli/carregar_cnae.py
+"""
+Carrega o catálogo CNAE × LC 116 (cnae_lista_servicos) a partir do CSV oficial.
+
+Uso:
+    python -m app.cli.carregar_cnae caminho/cnae_lc116.csv [--dry-run]
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from app.core.importacao import ler_catalogo_cnae_csv
+from app.core.schema import verificar_banco
+from app.crud.cnae_lista_servicos import importar_catalogo_cnae
+from app.database import AsyncSessionLocal, engine
+
+
+async def main(caminho: Path, dry_run: bool):
+    await verificar_banco()
+
+    inicio = time.perf_counter()
+    with caminho.open("rb") as arquivo:
+        linhas, erros = ler_catalogo_cnae_csv(arquivo)
+    for erro in erros:
+        print(f"[CNAE] Linha {erro['linha']} ignorada: {erro['motivo']}")
+
+    if not linhas:
+        print("[CNAE] Nenhuma linha válida no arquivo; o catálogo não foi alterado.")
+    else:
+        async with AsyncSessionLocal() as db:
+            relatorio = await importar_catalogo_cnae(db, linhas, dry_run=dry_run)
+        relatorio["rejeitados"] = len(erros)
+        relatorio["segundos"] = round(time.perf_counter() - inicio, 3)
+        print(json.dumps(relatorio, ensure_ascii=False))
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("arquivo", type=Path, help="CSV CNAE × LC 116")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Só mostra a diferença, sem gravar"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.arquivo, args.dry_run))
@@ -0,0 +1,42 @@
+# app/cli/importar_usuarios.py
+"""
+Importa usuários em lote a partir de um arquivo CSV ou JSON.
+
+Uso:
+    python -m app.cli.importar_usuarios caminho/arquivo.csv [--manter-role]
+
+Sem --manter-role, a coluna role_id do arquivo é ignorada e todos entram
+com o perfil padrão.
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+from app.core.importacao import ler_registros
+from app.crud.usuario import importar_usuarios
+from app.database import AsyncSessionLocal
+
+
+async def main(caminho: Path, manter_role: bool):
+    registros = ler_registros(caminho.read_bytes(), caminho.name)
+    async with AsyncSessionLocal() as db:
+        relatorio = await importar_usuarios(db, registros, manter_role=manter_role)
+
+    for linha in relatorio["linhas"]:
+        if linha["status"] == "rejeitado":
+            print(f"[IMPORTAÇÃO] Linha {linha['linha']} rejeitada: {linha['motivo']}")
+    print(
+        json.dumps(
+            {k: v for k, v in relatorio.items() if k != "linhas"}, ensure_ascii=False
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("arquivo", type=Path, help="Arquivo CSV ou JSON")
+    parser.add_argument(
+        "--manter-role", action="store_true", help="Usa o role_id do arquivo em vez do padrão"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.arquivo, args.manter_role))
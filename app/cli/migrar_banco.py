@@ -0,0 +1,37 @@
+# app/cli/migrar_banco.py
+"""
+Prepara o schema do banco (tabelas, colunas, índices, funções e triggers).
+Passo de deploy: roda uma vez antes de subir a aplicação, que na subida só
+confere o schema.
+
+Uso:
+    python -m app.cli.migrar_banco [--verificar]
+"""
+import argparse
+import asyncio
+import sys
+from app.core.schema import objetos_faltantes, preparar_banco
+from app.database import engine
+
+
+async def main(somente_verificar: bool) -> int:
+    if not somente_verificar:
+        await preparar_banco()
+
+    async with engine.connect() as conn:
+        faltantes = await objetos_faltantes(conn)
+    await engine.dispose()
+
+    for objeto in faltantes:
+        print(f"[SCHEMA] Faltando: {objeto}")
+    if not faltantes:
+        print("[SCHEMA] Schema completo")
+    return 1 if faltantes else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepara o schema do banco")
+    parser.add_argument(
+        "--verificar", action="store_true", help="Só lista os objetos faltantes, sem DDL"
+    )
+    sys.exit(asyncio.run(main(parser.parse_args().verificar)))
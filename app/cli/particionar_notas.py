@@ -0,0 +1,94 @@
+# app/cli/particionar_notas.py
+"""
+Particionamento mensal e arquivamento de notas_fiscais.
+
+Uso:
+    python -m app.cli.particionar_notas converter
+    python -m app.cli.particionar_notas criar-futuras [--meses 3]
+    python -m app.cli.particionar_notas arquivar --meses 24 [--excluidas-dias 90] [--dry-run]
+
+"converter" é de uso único e bloqueia a tabela durante a cópia: rodar em
+janela de manutenção.
+"""
+import argparse
+import asyncio
+import json
+from sqlalchemy import text
+from app.core.particoes import (
+    TABELA,
+    arquivar_excluidas,
+    arquivar_particoes,
+    converter_para_particionada,
+    garantir_particoes_futuras,
+    tabela_particionada,
+)
+from app.core.schema import preparar_banco
+from app.database import engine
+
+
+async def converter():
+    await preparar_banco()
+    async with engine.begin() as conn:
+        relatorio = await converter_para_particionada(conn)
+    if relatorio["convertida"]:
+        # Índices e triggers já vieram na conversão; falta atualizar as estatísticas
+        async with engine.begin() as conn:
+            await conn.execute(text(f"ANALYZE {TABELA}"))
+    return relatorio
+
+
+async def criar_futuras(meses: int | None):
+    async with engine.begin() as conn:
+        if not await tabela_particionada(conn):
+            return {"erro": "A tabela não é particionada; rode 'converter' antes."}
+        return {"criadas": await garantir_particoes_futuras(conn, meses)}
+
+
+async def arquivar(meses: int | None, excluidas_dias: int | None, dry_run: bool):
+    relatorio = {"dry_run": dry_run}
+    async with engine.begin() as conn:
+        if meses is not None:
+            if await tabela_particionada(conn):
+                relatorio["particoes"] = await arquivar_particoes(
+                    conn, meses=meses, dry_run=dry_run
+                )
+            else:
+                relatorio["particoes"] = "A tabela não é particionada."
+        if excluidas_dias is not None:
+            relatorio["excluidas_movidas"] = await arquivar_excluidas(
+                conn, dias=excluidas_dias, dry_run=dry_run
+            )
+    return relatorio
+
+
+async def main(args):
+    if args.comando == "converter":
+        relatorio = await converter()
+    elif args.comando == "criar-futuras":
+        relatorio = await criar_futuras(args.meses)
+    else:
+        relatorio = await arquivar(args.meses, args.excluidas_dias, args.dry_run)
+    print(json.dumps(relatorio, ensure_ascii=False, default=str))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    comandos.add_parser("converter", help="Converte a tabela em particionada por mês")
+
+    futuras = comandos.add_parser("criar-futuras", help="Cria as partições dos próximos meses")
+    futuras.add_argument("--meses", type=int, default=None)
+
+    arquivo = comandos.add_parser("arquivar", help="Move partições antigas e excluídas para o arquivo")
+    arquivo.add_argument("--meses", type=int, default=None, help="Mantém os últimos N meses")
+    arquivo.add_argument(
+        "--excluidas-dias", type=int, default=None, help="Move excluídas há mais de N dias"
+    )
+    arquivo.add_argument("--dry-run", action="store_true", help="Só mostra o que seria movido")
+
+    args = parser.parse_args()
+    if args.comando == "arquivar" and args.meses is None and args.excluidas_dias is None:
+        parser.error("informe --meses e/ou --excluidas-dias")
+    asyncio.run(main(args))
@@ -0,0 +1,78 @@
+# app/core/arquivo_notas.py
+"""
+Formato do arquivo frio de notas: cada arquivo é uma sequência de blocos
+independentes, cada bloco um NDJSON (uma nota por linha) comprimido com
+zlib. O índice (tabela notas_arquivadas) guarda posição e tamanho do bloco
+de cada nota, então ler uma nota é um seek + a descompressão de um bloco
+pequeno, sem abrir o resto do arquivo.
+"""
+import json
+import os
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from uuid import UUID
+from app.core.config import settings
+
+NOTAS_POR_BLOCO = 200
+_NIVEL_COMPRESSAO = 6
+
+
+def diretorio_arquivo() -> Path:
+    return Path(settings.ARQUIVO_NOTAS_DIR)
+
+
+def _json_padrao(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, (Decimal, UUID)):
+        return str(valor)
+    raise TypeError(f"Tipo não serializável no arquivo: {type(valor).__name__}")
+
+
+class EscritorArquivo:
+    """
+    Acrescenta blocos a um arquivo do diretório de arquivo. Cada bloco é
+    gravado e sincronizado em disco antes de escrever_bloco retornar, para
+    que o índice só aponte para dados já persistidos.
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        diretorio_arquivo().mkdir(parents=True, exist_ok=True)
+        self._arquivo = open(diretorio_arquivo() / nome, "ab")
+
+    def escrever_bloco(self, registros: list[dict]) -> tuple[int, int]:
+        """Grava os registros em um bloco e devolve (posicao, tamanho)."""
+        linhas = b"".join(
+            json.dumps(r, default=_json_padrao, ensure_ascii=False, separators=(",", ":")).encode()
+            + b"\n"
+            for r in registros
+        )
+        bloco = zlib.compress(linhas, _NIVEL_COMPRESSAO)
+        posicao = self._arquivo.seek(0, os.SEEK_END)
+        self._arquivo.write(bloco)
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        return posicao, len(bloco)
+
+    def fechar(self):
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def ler_bloco(arquivo: str, posicao: int, tamanho: int) -> list[dict]:
+    with open(diretorio_arquivo() / arquivo, "rb") as f:
+        f.seek(posicao)
+        bloco = f.read(tamanho)
+    return [json.loads(linha) for linha in zlib.decompress(bloco).splitlines()]
+
+
+def ler_nota(arquivo: str, posicao: int, tamanho: int, nota_id: int) -> dict | None:
+    return next((r for r in ler_bloco(arquivo, posicao, tamanho) if r["id"] == nota_id), None)
@@ -0,0 +1,121 @@
+# app/core/busca_cnae.py
+import bisect
+import difflib
+import heapq
+import re
+from collections import defaultdict
+from itertools import islice
+from app.core.documentos import somente_digitos
+from app.core.texto import normalizar_busca
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset({"de", "da", "do", "das", "dos", "e", "em", "a", "o", "para", "com"})
+
+# Pesos do ranking: termo exato na descrição do CNAE vale mais que na lista de serviços
+_PESO_EXATO_CNAE = 3.0
+_PESO_EXATO_LISTA = 2.0
+_PESO_PREFIXO = 1.0
+_PESO_APROXIMADO = 0.5
+
+
+def _tokens(texto: str) -> list[str]:
+    return [
+        t for t in _TOKEN.findall(normalizar_busca(texto or "")) if t not in _STOPWORDS
+    ]
+
+
+class IndiceBuscaCnae:
+    """
+    Índice de busca em memória sobre as linhas do catálogo CNAE, montado uma
+    vez a cada recarga do catálogo:
+
+    - prefixo do código CNAE numérico (lista ordenada + bisect);
+    - termos das descrições sem acento, com busca por prefixo de termo e
+      aproximação (difflib) quando o termo não existe no vocabulário.
+    """
+
+    def __init__(self, linhas):
+        self.linhas = tuple(linhas)
+
+        self._codigos = sorted(
+            (somente_digitos(linha.cnae_numerico), i) for i, linha in enumerate(self.linhas)
+        )
+        self._chaves_codigos = [codigo for codigo, _ in self._codigos]
+
+        indice = defaultdict(set)
+        self._termos_cnae: list[frozenset] = []
+        for i, linha in enumerate(self.linhas):
+            termos_cnae = frozenset(_tokens(linha.cnae_descricao))
+            self._termos_cnae.append(termos_cnae)
+            for termo in termos_cnae.union(_tokens(linha.lista_servico_descricao)):
+                indice[termo].add(i)
+
+        self._postings = {termo: frozenset(ids) for termo, ids in indice.items()}
+        self._vocabulario = sorted(self._postings)
+
+    def _por_codigo(self, prefixo: str, limite: int) -> list:
+        inicio = bisect.bisect_left(self._chaves_codigos, prefixo)
+        resultado = []
+        for codigo, i in islice(self._codigos, inicio, None):
+            if not codigo.startswith(prefixo) or len(resultado) >= limite:
+                break
+            resultado.append(self.linhas[i])
+        return resultado
+
+    def _expandir_termo(self, termo: str) -> tuple[list[str], bool]:
+        """Termos do vocabulário que começam com `termo` (ou os mais parecidos)."""
+        inicio = bisect.bisect_left(self._vocabulario, termo)
+        encontrados = []
+        for candidato in islice(self._vocabulario, inicio, None):
+            if not candidato.startswith(termo):
+                break
+            encontrados.append(candidato)
+        if encontrados:
+            return encontrados, False
+        return difflib.get_close_matches(termo, self._vocabulario, n=3, cutoff=0.8), True
+
+    def buscar(self, consulta: str, limite: int = 20) -> list:
+        consulta = (consulta or "").strip()
+        if not consulta:
+            return []
+
+        if all(c.isdigit() or c in ".-/ " for c in consulta):
+            return self._por_codigo(somente_digitos(consulta), limite)
+
+        pontuacao: dict[int, float] | None = None
+        for termo in _tokens(consulta):
+            expandidos, aproximado = self._expandir_termo(termo)
+            pontos_termo: dict[int, float] = {}
+            for candidato in expandidos:
+                for i in self._postings[candidato]:
+                    if aproximado:
+                        peso = _PESO_APROXIMADO
+                    elif candidato == termo and termo in self._termos_cnae[i]:
+                        peso = _PESO_EXATO_CNAE
+                    elif candidato == termo:
+                        peso = _PESO_EXATO_LISTA
+                    else:
+                        peso = _PESO_PREFIXO
+                    pontos_termo[i] = max(pontos_termo.get(i, 0), peso)
+
+            # Todos os termos da consulta precisam aparecer (interseção)
+            if pontuacao is None:
+                pontuacao = pontos_termo
+            else:
+                pontuacao = {
+                    i: pontos + pontos_termo[i]
+                    for i, pontos in pontuacao.items()
+                    if i in pontos_termo
+                }
+            if not pontuacao:
+                return []
+
+        if not pontuacao:
+            return []
+
+        melhores = heapq.nsmallest(
+            limite,
+            pontuacao.items(),
+            key=lambda item: (-item[1], self.linhas[item[0]].cnae_numerico),
+        )
+        return [self.linhas[i] for i, _ in melhores]
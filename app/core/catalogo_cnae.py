@@ -0,0 +1,57 @@
+# app/core/catalogo_cnae.py
+from types import MappingProxyType
+from typing import NamedTuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.busca_cnae import IndiceBuscaCnae
+from app.core.catalogos import CatalogoVersionado, registrar_catalogo
+from app.models.cnae_lista_servicos import CnaeListaAtividades
+
+
+class LinhaCnae(NamedTuple):
+    id: int
+    cnae_numerico: str
+    cnae_descricao: str
+    codigo_lista_servico: str
+    lista_servico_descricao: str
+
+
+class IndiceCnae:
+    """Snapshot imutável da tabela cnae_lista_servicos."""
+
+    __slots__ = ("linhas", "codigo_por_cnae", "busca")
+
+    def __init__(self, linhas: list[LinhaCnae]):
+        self.linhas = tuple(linhas)
+        codigos = {}
+        for linha in self.linhas:
+            # Mesmo critério da antiga consulta com .limit(1): primeira linha vence
+            codigos.setdefault(linha.cnae_numerico, linha.codigo_lista_servico)
+        self.codigo_por_cnae = MappingProxyType(codigos)
+        self.busca = IndiceBuscaCnae(self.linhas)
+
+
+class CatalogoCnae(CatalogoVersionado):
+    nome = "cnae"
+
+    async def _carregar(self, db: AsyncSession) -> IndiceCnae:
+        result = await db.execute(
+            select(
+                CnaeListaAtividades.id,
+                CnaeListaAtividades.cnae_numerico,
+                CnaeListaAtividades.cnae_descricao,
+                CnaeListaAtividades.codigo_lista_servico,
+                CnaeListaAtividades.lista_servico_descricao,
+            ).order_by(CnaeListaAtividades.id)
+        )
+        return IndiceCnae([LinhaCnae(*linha) for linha in result])
+
+    def codigo_servico(self, cnae: str) -> str | None:
+        """Código da lista de serviços do CNAE: O(1), sem I/O."""
+        return self.dados.codigo_por_cnae.get(cnae)
+
+    def buscar(self, consulta: str, limite: int = 20) -> list[LinhaCnae]:
+        return self.dados.busca.buscar(consulta, limite)
+
+
+catalogo_cnae = registrar_catalogo(CatalogoCnae())
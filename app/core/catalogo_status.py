@@ -0,0 +1,49 @@
+# app/core/catalogo_status.py
+import hashlib
+import json
+from types import MappingProxyType
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.catalogos import CatalogoVersionado, registrar_catalogo
+from app.models.status_nota import StatusNota
+
+
+class IndiceStatus:
+    """
+    Snapshot imutável de status_nota, com as respostas HTTP já serializadas
+    e o ETag de cada uma (mudam só quando a tabela muda).
+    """
+
+    __slots__ = ("por_id", "corpo_lista", "etag_lista", "corpos", "etags")
+
+    def __init__(self, linhas: list[dict]):
+        self.por_id = MappingProxyType({linha["id"]: linha for linha in linhas})
+        self.corpo_lista = self._serializar(linhas)
+        self.etag_lista = self._etag(self.corpo_lista)
+        self.corpos = MappingProxyType(
+            {linha["id"]: self._serializar(linha) for linha in linhas}
+        )
+        self.etags = MappingProxyType(
+            {id_: self._etag(corpo) for id_, corpo in self.corpos.items()}
+        )
+
+    @staticmethod
+    def _serializar(valor) -> bytes:
+        return json.dumps(valor, ensure_ascii=False, separators=(",", ":")).encode()
+
+    @staticmethod
+    def _etag(corpo: bytes) -> str:
+        return '"' + hashlib.sha1(corpo).hexdigest()[:16] + '"'
+
+
+class CatalogoStatus(CatalogoVersionado):
+    nome = "status"
+
+    async def _carregar(self, db: AsyncSession) -> IndiceStatus:
+        result = await db.execute(
+            select(StatusNota.id, StatusNota.nome).order_by(StatusNota.id)
+        )
+        return IndiceStatus([{"id": id_, "nome": nome} for id_, nome in result])
+
+
+catalogo_status = registrar_catalogo(CatalogoStatus())
@@ -0,0 +1,101 @@
+# app/core/catalogos.py
+import abc
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+from app.core.config import settings
+from app.core.metricas import cache_consultas, catalogo_recargas
+from app.database import AsyncSessionLocal
+from app.models.versao_catalogo import VersaoCatalogo
+
+
+class CatalogoVersionado(abc.ABC):
+    """
+    Tabela pequena e quase estática carregada inteira em memória. Os dados
+    carregados são imutáveis e trocados de uma vez a cada recarga, então as
+    leituras não precisam de lock nem de I/O.
+
+    A versão fica em versoes_catalogo (incrementada por trigger a cada
+    alteração da tabela de origem); cada worker compara periodicamente a
+    versão que tem com a do banco e recarrega quando ela muda.
+    """
+
+    nome: str = ""
+
+    def __init__(self):
+        self.dados = None
+        self.versao: int | None = None
+
+    @property
+    def carregado(self) -> bool:
+        return self.dados is not None
+
+    @abc.abstractmethod
+    async def _carregar(self, db: AsyncSession):
+        """Lê a tabela de origem e monta a estrutura imutável em memória."""
+
+    async def _versao_no_banco(self, db: AsyncSession) -> int:
+        versao = await db.scalar(
+            select(VersaoCatalogo.versao).where(VersaoCatalogo.nome == self.nome)
+        )
+        return versao or 0
+
+    async def recarregar(self, db: AsyncSession):
+        versao = await self._versao_no_banco(db)
+        self.dados = await self._carregar(db)
+        self.versao = versao
+        catalogo_recargas.incrementar(self.nome)
+        print(f"[CATALOGO] {self.nome} carregado (versão {versao})")
+
+    async def garantir_carregado(self, db: AsyncSession):
+        if self.carregado:
+            cache_consultas.incrementar(f"catalogo_{self.nome}", "acerto")
+            return
+        cache_consultas.incrementar(f"catalogo_{self.nome}", "falha")
+        await self.recarregar(db)
+
+    async def verificar_versao(self, db: AsyncSession) -> bool:
+        """Recarrega se outro worker (ou o banco) publicou uma versão nova."""
+        if await self._versao_no_banco(db) != self.versao:
+            await self.recarregar(db)
+            return True
+        return False
+
+    async def publicar_alteracao(self, db: AsyncSession):
+        """Força nova versão (todos os workers recarregam) e recarrega este."""
+        stmt = pg_insert(VersaoCatalogo).values(nome=self.nome, versao=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[VersaoCatalogo.nome],
+            set_={"versao": VersaoCatalogo.versao + 1, "atualizado_em": func.now()},
+        )
+        await db.execute(stmt)
+        await db.commit()
+        await self.recarregar(db)
+
+
+_catalogos: list[CatalogoVersionado] = []
+
+
+def registrar_catalogo(catalogo: CatalogoVersionado) -> CatalogoVersionado:
+    _catalogos.append(catalogo)
+    return catalogo
+
+
+async def carregar_catalogos():
+    async with AsyncSessionLocal() as db:
+        for catalogo in _catalogos:
+            await catalogo.recarregar(db)
+
+
+async def monitorar_catalogos():
+    """Tarefa de fundo: checa a versão de todos os catálogos periodicamente."""
+    while True:
+        await asyncio.sleep(settings.CATALOGO_VERIFICACAO_SEGUNDOS)
+        try:
+            async with AsyncSessionLocal() as db:
+                for catalogo in _catalogos:
+                    await catalogo.verificar_versao(db)
+        except Exception as e:
+            print(f"[CATALOGO] Falha ao verificar versões: {e}")
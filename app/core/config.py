@@ -5,6 +5,29 @@ from typing import List
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Cache de prepared statements: "desativado", "direto" ou "pgbouncer"
+    DB_STATEMENT_CACHE_MODE: str = "desativado"
+    DB_STATEMENT_CACHE_SIZE: int = 100  # statements por conexão
+    # Perfil do engine: "dev" (pool pequeno) ou "prod". O echo do SQL é
+    # desligado nos dois; DB_ECHO=true liga.
+    # Os DB_POOL_* abaixo, quando definidos, sobrescrevem o perfil.
+    DB_PROFILE: str = "dev"
+    DB_ECHO: bool | None = None
+    DB_POOL_SIZE: int | None = None
+    DB_POOL_MAX_OVERFLOW: int | None = None
+    DB_POOL_RECYCLE_SEGUNDOS: int | None = None
+    DB_POOL_TIMEOUT_SEGUNDOS: float | None = None
+    DB_POOL_WARMUP: int | None = None  # conexões abertas na subida
+    # Na subida só se confere o schema; a criação é o passo explícito
+    # python -m app.cli.migrar_banco. True: migra na subida (ambiente local)
+    DB_MIGRAR_NA_SUBIDA: bool = False
+
+    # Réplica de leitura (opcional) para listagens e relatórios
+    DATABASE_REPLICA_URL: str | None = None
+    REPLICA_MAX_LAG_SEGUNDOS: float = 5.0  # acima disso as leituras vão ao primário
+    REPLICA_VERIFICACAO_SEGUNDOS: float = 2.0  # cache da checagem de lag
+    # Após uma escrita, as leituras do mesmo cliente ficam no primário por este tempo
+    REPLICA_LEITURA_PROPRIA_SEGUNDOS: float = 30.0
 
     # JWT
     SECRET_KEY: str
@@ -21,6 +44,44 @@ class Settings(BaseSettings):
     NFSE_CN: str
     NFSE_URL: str  # ex: https://provedor.gov.br/Service.asmx
 
+    # Controle de tentativas de login
+    LOGIN_THROTTLE_BACKEND: str = "memoria"  # "memoria" ou "postgres"
+    LOGIN_BUCKET_IDENTIFICADOR_CAPACIDADE: int = 5
+    LOGIN_BUCKET_IDENTIFICADOR_POR_MINUTO: float = 5
+    LOGIN_BUCKET_IP_CAPACIDADE: int = 20
+    LOGIN_BUCKET_IP_POR_MINUTO: float = 20
+    LOGIN_MAX_HASHES_CONCORRENTES: int = 4  # por processo
+    LOGIN_CONFIAR_X_FORWARDED_FOR: bool = False
+
+    # Instrumentação de consultas por requisição (Server-Timing e N+1)
+    CONSULTAS_INSTRUMENTACAO: bool = True
+    CONSULTAS_LIMITE_REPETICOES: int = 5  # mesma forma de SQL N vezes = provável N+1
+    CONSULTAS_MODO_ESTRITO: bool = False  # testes: estourar o orçamento falha a consulta
+    # Consultas lentas: limite, tamanho do buffer e EXPLAIN ANALYZE amostrado
+    CONSULTAS_LENTAS_MS: float = 500
+    CONSULTAS_LENTAS_BUFFER: int = 200
+    CONSULTAS_LENTAS_EXPLAIN: bool = False
+    CONSULTAS_LENTAS_AMOSTRAGEM: float = 0.1  # fração dos SELECTs lentos explicados
+
+    # Catálogos em memória (ex: CNAE): intervalo de checagem da versão
+    CATALOGO_VERIFICACAO_SEGUNDOS: int = 30
+    # Cache-Control das rotas de catálogo (/status)
+    CATALOGO_CACHE_MAX_AGE: int = 3600
+
+    # Particionamento mensal de notas_fiscais (após a conversão pela CLI)
+    NOTAS_PARTICOES_FUTURAS: int = 3  # meses criados à frente
+    NOTAS_PARTICOES_VERIFICACAO_HORAS: float = 12
+
+    # Arquivo frio: notas finalizadas antigas saem da tabela para arquivos comprimidos
+    ARQUIVO_NOTAS_DIR: str = "arquivo_notas"
+    ARQUIVO_NOTAS_IDADE_DIAS: int = 365  # idade mínima (última atualização)
+    ARQUIVO_NOTAS_LOTE: int = 1000  # notas por transação
+
+    # Métricas Prometheus (GET /metrics): desligadas por padrão; ligadas, o
+    # endpoint só responde com METRICAS_TOKEN definido (coleta com Bearer)
+    METRICAS_HABILITADAS: bool = False
+    METRICAS_TOKEN: str | None = None
+
     class Config:
         env_file = ".env"
 
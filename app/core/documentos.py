@@ -0,0 +1,92 @@
+# app/core/documentos.py
+"""
+Utilitários de CPF/CNPJ: limpeza, máscara e validação dos dígitos
+verificadores. Usado por schemas, CRUD, importações e integração NFSe.
+"""
+from typing import Iterable
+
+# Separadores usuais removidos com str.translate (bem mais rápido que re.sub)
+_SEPARADORES = str.maketrans("", "", ".-/ \t\r\n")
+_DIGITOS = frozenset("0123456789")
+
+_PESOS_CPF_1 = range(10, 1, -1)
+_PESOS_CPF_2 = range(11, 1, -1)
+_PESOS_CNPJ_1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_CNPJ_2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def somente_digitos(valor) -> str:
+    """Remove máscara e qualquer outro caractere que não seja dígito."""
+    limpo = str(valor).translate(_SEPARADORES)
+    if limpo.isascii() and limpo.isdigit():
+        return limpo
+    return "".join(c for c in limpo if c in _DIGITOS)
+
+
+def formatar_cpf_cnpj(valor: str) -> str:
+    """
+    Formata um CPF ou CNPJ com máscara adequada. Valores que não têm 11 nem
+    14 dígitos são retornados sem máscara.
+    """
+    d = somente_digitos(valor)
+    if len(d) == 11:
+        return f"{d[:3]}.{d[3:6]}.{d[6:9]}-{d[9:]}"
+    if len(d) == 14:
+        return f"{d[:2]}.{d[2:5]}.{d[5:8]}/{d[8:12]}-{d[12:]}"
+    return d
+
+
+def _digito_verificador(digitos: str, pesos) -> str:
+    resto = sum(int(d) * p for d, p in zip(digitos, pesos)) % 11
+    return "0" if resto < 2 else str(11 - resto)
+
+
+def validar_cpf(digitos: str) -> bool:
+    if len(digitos) != 11 or digitos == digitos[0] * 11:
+        return False
+    dv1 = _digito_verificador(digitos[:9], _PESOS_CPF_1)
+    dv2 = _digito_verificador(digitos[:9] + dv1, _PESOS_CPF_2)
+    return digitos[9:] == dv1 + dv2
+
+
+def validar_cnpj(digitos: str) -> bool:
+    if len(digitos) != 14 or digitos == digitos[0] * 14:
+        return False
+    dv1 = _digito_verificador(digitos[:12], _PESOS_CNPJ_1)
+    dv2 = _digito_verificador(digitos[:12] + dv1, _PESOS_CNPJ_2)
+    return digitos[12:] == dv1 + dv2
+
+
+def validar_cpf_cnpj(valor: str) -> bool:
+    d = somente_digitos(valor)
+    if len(d) == 11:
+        return validar_cpf(d)
+    if len(d) == 14:
+        return validar_cnpj(d)
+    return False
+
+
+def normalizar_cpf_cnpj(valor: str) -> str:
+    """
+    Retorna o documento só com dígitos, levantando ValueError se não for um
+    CPF/CNPJ válido. Pensado para os validators dos schemas.
+    """
+    d = somente_digitos(valor)
+    if len(d) not in (11, 14) or not validar_cpf_cnpj(d):
+        raise ValueError("CPF ou CNPJ inválido")
+    return d
+
+
+def normalizar_lote(valores: Iterable) -> list[str | None]:
+    """
+    Versão em lote para importações: devolve, na mesma ordem, o documento
+    só com dígitos ou None quando vazio ou inválido.
+    """
+    resultado = []
+    for valor in valores:
+        if not valor:
+            resultado.append(None)
+            continue
+        d = somente_digitos(valor)
+        resultado.append(d if validar_cpf_cnpj(d) else None)
+    return resultado
@@ -3,6 +3,7 @@ import resend
 from typing import List
 from fastapi.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.metricas import email_envio_segundos, medir
 
 # Configura a chave da API do Resend (só precisa fazer uma vez)
 resend.api_key = settings.RESEND_API_KEY
@@ -53,7 +54,8 @@ async def send_admin_notification(
 
     try:
         # Executa a chamada síncrona em thread (necessário em async context)
-        response = await run_in_threadpool(_send_email_sync, params)
+        with medir(email_envio_segundos):
+            response = await run_in_threadpool(_send_email_sync, params)
         print(f"[EMAIL] Notificação enviada com sucesso. ID: {response['id']}")
         return response
     except Exception as e:
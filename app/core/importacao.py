@@ -0,0 +1,185 @@
+# app/core/importacao.py
+import codecs
+import csv
+import io
+import json
+from typing import BinaryIO, TextIO
+from fastapi import HTTPException, status
+from app.core.documentos import somente_digitos
+from app.core.texto import normalizar_busca
+
+
+def _detectar_formato(conteudo: bytes, nome_arquivo: str | None) -> str:
+    if nome_arquivo:
+        nome = nome_arquivo.lower()
+        if nome.endswith(".json"):
+            return "json"
+        if nome.endswith(".csv"):
+            return "csv"
+    return "json" if conteudo.lstrip()[:1] in (b"[", b"{") else "csv"
+
+
+def _ler_csv(texto: str) -> list[dict]:
+    # Planilhas exportadas no Brasil costumam usar ";" como separador
+    amostra = texto[:4096]
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(io.StringIO(texto), dialect=dialeto)
+    return [
+        {
+            (chave or "").strip(): (valor.strip() if isinstance(valor, str) else valor)
+            for chave, valor in linha.items()
+            if chave
+        }
+        for linha in leitor
+    ]
+
+
+def ler_registros(conteudo: bytes, nome_arquivo: str | None = None) -> list[dict]:
+    """
+    Lê um arquivo de importação (CSV ou JSON com uma lista de objetos) e
+    retorna a lista de registros como dicionários. Campos vazios viram None.
+    """
+    try:
+        texto = conteudo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        texto = conteudo.decode("latin-1")
+
+    formato = _detectar_formato(conteudo, nome_arquivo)
+    try:
+        if formato == "json":
+            registros = json.loads(texto)
+            if isinstance(registros, dict):
+                registros = [registros]
+        else:
+            registros = _ler_csv(texto)
+    except (json.JSONDecodeError, csv.Error) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Arquivo de importação inválido: {e}",
+        )
+
+    if not isinstance(registros, list) or not all(isinstance(r, dict) for r in registros):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="O arquivo deve conter uma lista de registros.",
+        )
+
+    return [{k: (None if v == "" else v) for k, v in r.items()} for r in registros]
+
+
+def ler_atividades_csv(valor) -> list[dict]:
+    """
+    Converte a coluna "atividades" do CSV ("cnae:descrição|cnae:descrição")
+    na lista de dicionários usada pelo JSON. Listas já prontas passam direto.
+    """
+    if not valor:
+        return []
+    if isinstance(valor, list):
+        return valor
+    atividades = []
+    for item in str(valor).split("|"):
+        cod, _, desc = item.partition(":")
+        if cod.strip():
+            atividades.append({"cod_cnae": cod.strip(), "desc_cnae": desc.strip()})
+    return atividades
+
+
+# Cabeçalhos aceitos na planilha CNAE × LC 116 (já sem acento e em minúsculas)
+_COLUNAS_CNAE = {
+    "cnae_numerico": {"cnae", "cnae_numerico", "codigo_cnae", "cod_cnae", "subclasse", "cnae_subclasse"},
+    "cnae_descricao": {"cnae_descricao", "descricao_cnae", "descricao_subclasse", "denominacao", "descricao_da_subclasse"},
+    "codigo_lista_servico": {"codigo_lista_servico", "item_lc_116", "item_lc116", "item_lista", "item_da_lista", "lc_116", "lc116", "codigo_servico"},
+    "lista_servico_descricao": {"lista_servico_descricao", "descricao_lc_116", "descricao_lc116", "descricao_item", "descricao_do_item", "descricao_servico"},
+}
+
+
+def _chave_cabecalho(nome: str) -> str:
+    return "_".join(
+        "".join(c if c.isalnum() else " " for c in normalizar_busca(nome or "")).split()
+    )
+
+
+def _abrir_texto(binario: BinaryIO) -> TextIO:
+    """
+    Envolve o arquivo binário num leitor de texto sem carregá-lo inteiro. A
+    codificação é decidida pela amostra inicial: UTF-8 se for válida, senão
+    latin-1 (padrão das planilhas do IBGE exportadas pelo Excel).
+    """
+    amostra = binario.read(64 * 1024)
+    binario.seek(0)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+        codificacao = "utf-8-sig"
+    except UnicodeDecodeError:
+        codificacao = "latin-1"
+    return io.TextIOWrapper(binario, encoding=codificacao, newline="")
+
+
+def ler_catalogo_cnae_csv(binario: BinaryIO) -> tuple[list[tuple], list[dict]]:
+    """
+    Lê em streaming o CSV oficial CNAE × LC 116 e devolve (linhas, erros).
+
+    Cada linha vem como (cnae_numerico, cnae_descricao, codigo_lista_servico,
+    lista_servico_descricao), com o CNAE só com dígitos (7, subclasse) e os
+    textos sem espaços sobrando. Pares CNAE + item repetidos ficam só com a
+    primeira ocorrência.
+    """
+    texto = _abrir_texto(binario)
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.reader(texto, dialect=dialeto)
+
+    # 1. Mapeia os cabeçalhos para as colunas da tabela
+    cabecalho = [_chave_cabecalho(c) for c in next(leitor, [])]
+    posicoes = {}
+    for coluna, aliases in _COLUNAS_CNAE.items():
+        for i, nome in enumerate(cabecalho):
+            if nome in aliases:
+                posicoes[coluna] = i
+                break
+    faltando = [c for c in _COLUNAS_CNAE if c not in posicoes]
+    if faltando:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Colunas obrigatórias ausentes no CSV: {', '.join(faltando)}",
+        )
+    i_cnae, i_desc, i_item, i_item_desc = (posicoes[c] for c in _COLUNAS_CNAE)
+    largura = max(posicoes.values()) + 1
+
+    # 2. Normaliza linha a linha, sem montar o arquivo inteiro em memória
+    linhas, erros, vistos = [], [], set()
+    for numero, campos in enumerate(leitor, start=2):
+        if not any(campos):
+            continue
+        if len(campos) < largura:
+            erros.append({"linha": numero, "motivo": "Linha com colunas faltando"})
+            continue
+
+        cnae = somente_digitos(campos[i_cnae])
+        item = campos[i_item].strip()
+        descricao = " ".join(campos[i_desc].split())
+        item_descricao = " ".join(campos[i_item_desc].split())
+
+        if len(cnae) != 7:
+            erros.append({"linha": numero, "motivo": f"CNAE inválido: {campos[i_cnae]!r}"})
+            continue
+        if not (item and descricao and item_descricao):
+            erros.append({"linha": numero, "motivo": "Campos obrigatórios vazios"})
+            continue
+        if (cnae, item) in vistos:
+            erros.append({"linha": numero, "motivo": f"CNAE {cnae} / item {item} repetido"})
+            continue
+
+        vistos.add((cnae, item))
+        linhas.append((cnae, descricao, item, item_descricao))
+
+    # Devolve o arquivo ao chamador sem fechá-lo
+    texto.detach()
+    return linhas, erros
@@ -0,0 +1,241 @@
+# app/core/instrumentacao_db.py
+"""
+Contagem de consultas SQL por requisição: número de statements, tempo total
+no banco e formas de statement repetidas (provável N+1). Os eventos do
+engine alimentam as métricas da requisição corrente via ContextVar.
+
+Também registra as consultas lentas num buffer circular, opcionalmente com
+o plano de execução (EXPLAIN ANALYZE) de uma amostra delas.
+"""
+import asyncio
+import random
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from sqlalchemy import event
+from app.core.config import settings
+from app.core.metricas import db_consultas_segundos, tipo_operacao
+
+# Marcadores de parâmetro ($1::INTEGER, %(x)s) viram "?" e listas de IN (...)
+# expandidas viram um único marcador
+_PARAMETRO = re.compile(r"\$\d+(?:::\w+(?:\[\])?)?|%\(\w+\)s")
+_LISTA_PARAMETROS = re.compile(r"\?(?:\s*,\s*\?)+")
+_ESPACOS = re.compile(r"\s+")
+
+
+def forma_statement(statement: str) -> str:
+    """Forma normalizada do SQL, para agrupar execuções do mesmo statement."""
+    forma = _LISTA_PARAMETROS.sub("?", _PARAMETRO.sub("?", statement))
+    return _ESPACOS.sub(" ", forma).strip()
+
+
+class OrcamentoConsultasExcedido(AssertionError):
+    """Levantada no modo estrito quando o endpoint passa do orçamento declarado."""
+
+
+class MetricasRequisicao:
+    __slots__ = ("rota", "consultas", "tempo_db", "formas", "orcamento")
+
+    def __init__(self, rota: str | None = None):
+        self.rota = rota
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.formas: Counter = Counter()
+        self.orcamento: int | None = None
+
+    def registrar(self, statement: str, duracao: float):
+        self.consultas += 1
+        self.tempo_db += duracao
+        self.formas[forma_statement(statement)] += 1
+        if (
+            settings.CONSULTAS_MODO_ESTRITO
+            and self.orcamento is not None
+            and self.consultas > self.orcamento
+        ):
+            raise OrcamentoConsultasExcedido(
+                f"{self.consultas} consultas; orçamento do endpoint é {self.orcamento}"
+            )
+
+    def repetidas(self) -> list[tuple[str, int]]:
+        limite = settings.CONSULTAS_LIMITE_REPETICOES
+        return [(forma, n) for forma, n in self.formas.most_common() if n >= limite]
+
+
+metricas_requisicao: ContextVar[MetricasRequisicao | None] = ContextVar(
+    "metricas_requisicao", default=None
+)
+
+
+def _redigir(valor):
+    """Esconde o conteúdo de textos (documentos, e-mails, senhas) nos logs."""
+    if valor is None or isinstance(valor, (bool, int, float, Decimal)):
+        return valor
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, (list, tuple)):
+        return [_redigir(v) for v in valor]
+    if isinstance(valor, dict):
+        return {k: _redigir(v) for k, v in valor.items()}
+    if isinstance(valor, (str, bytes)):
+        return f"<{type(valor).__name__}:{len(valor)}>"
+    return f"<{type(valor).__name__}>"
+
+
+class RegistroConsultasLentas:
+    """
+    Buffer circular com as últimas consultas acima de
+    CONSULTAS_LENTAS_MS. Numa amostra dos SELECTs, roda EXPLAIN (ANALYZE,
+    BUFFERS) em segundo plano, numa conexão à parte, e anexa o plano.
+    """
+
+    def __init__(self):
+        self.registros: deque = deque(maxlen=settings.CONSULTAS_LENTAS_BUFFER)
+        self._explain_em_andamento = False
+        self._tarefa_explain: asyncio.Task | None = None  # referência evita GC da tarefa
+
+    def registrar(self, engine_async, statement, parameters, duracao: float):
+        metricas = metricas_requisicao.get()
+        registro = {
+            "momento": datetime.now(timezone.utc).isoformat(),
+            "duracao_ms": round(duracao * 1000, 1),
+            "endpoint": metricas.rota if metricas is not None else None,
+            "statement": forma_statement(statement),
+            "parametros": _redigir(parameters),
+            "plano": None,
+        }
+        self.registros.append(registro)
+        print(
+            f"[CONSULTA LENTA] {registro['duracao_ms']} ms em {registro['endpoint']}: "
+            f"{registro['statement'][:200]}"
+        )
+
+        if (
+            settings.CONSULTAS_LENTAS_EXPLAIN
+            and not self._explain_em_andamento
+            and statement.lstrip()[:6].upper() == "SELECT"
+            and "FOR UPDATE" not in statement.upper()
+            and random.random() < settings.CONSULTAS_LENTAS_AMOSTRAGEM
+        ):
+            # Um EXPLAIN por vez, fora da requisição que gerou a consulta
+            self._explain_em_andamento = True
+            self._tarefa_explain = asyncio.get_running_loop().create_task(
+                self._explicar(engine_async, registro, statement, parameters)
+            )
+
+    async def _explicar(self, engine_async, registro, statement, parameters):
+        # A tarefa herdou o contexto da requisição; o EXPLAIN não conta nela
+        metricas_requisicao.set(None)
+        try:
+            async with engine_async.connect() as conn:
+                await conn.exec_driver_sql("SET LOCAL statement_timeout = '30s'")
+                result = await conn.exec_driver_sql(
+                    "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters
+                )
+                registro["plano"] = "\n".join(linha[0] for linha in result)
+                # SELECT: nada a gravar, a transação é descartada
+                await conn.rollback()
+        except Exception as e:
+            registro["plano"] = f"EXPLAIN falhou: {e}"
+        finally:
+            self._explain_em_andamento = False
+
+    def listar(self, limite: int) -> list[dict]:
+        return list(self.registros)[-limite:][::-1]
+
+
+consultas_lentas = RegistroConsultasLentas()
+
+
+def _antes_execucao(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_consultas", []).append(time.perf_counter())
+
+
+def instrumentar_engine(engine_async, nome: str = "primario"):
+    """Registra os eventos de medição no engine (síncrono por baixo do async)."""
+    limite_lenta = settings.CONSULTAS_LENTAS_MS / 1000
+    por_requisicao = settings.CONSULTAS_INSTRUMENTACAO
+    prometheus = settings.METRICAS_HABILITADAS
+
+    def _depois_execucao(conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - conn.info["inicio_consultas"].pop()
+        if prometheus:
+            db_consultas_segundos.observar(duracao, nome, tipo_operacao(statement))
+        # O log de consultas lentas depende só de CONSULTAS_LENTAS_MS
+        if duracao >= limite_lenta and not statement.startswith("EXPLAIN"):
+            consultas_lentas.registrar(engine_async, statement, parameters, duracao)
+        if not por_requisicao:
+            return
+        metricas = metricas_requisicao.get()
+        if metricas is not None:
+            metricas.registrar(statement, duracao)
+
+    event.listen(engine_async.sync_engine, "before_cursor_execute", _antes_execucao)
+    event.listen(engine_async.sync_engine, "after_cursor_execute", _depois_execucao)
+
+
+def orcamento_consultas(maximo: int):
+    """
+    Dependência que declara quantas consultas o endpoint pode fazer. Acima
+    disso é emitido um alerta; com CONSULTAS_MODO_ESTRITO (testes) a consulta
+    excedente falha com OrcamentoConsultasExcedido.
+
+    As declarações se somam: a dependência de autenticação declara as
+    próprias consultas e a rota declara só as dela.
+    """
+
+    async def declarar():
+        metricas = metricas_requisicao.get()
+        if metricas is not None:
+            metricas.orcamento = (metricas.orcamento or 0) + maximo
+
+    return declarar
+
+
+class MedicaoConsultasMiddleware:
+    """
+    Middleware ASGI: abre as métricas da requisição, devolve o cabeçalho
+    Server-Timing com consultas e tempo de banco e registra N+1 e orçamentos
+    estourados.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metricas = MetricasRequisicao(f"{scope['method']} {scope['path']}")
+        token = metricas_requisicao.set(metricas)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                valor = (
+                    f'db;dur={metricas.tempo_db * 1000:.1f};'
+                    f'desc="{metricas.consultas} consultas"'
+                )
+                mensagem.setdefault("headers", []).append(
+                    (b"server-timing", valor.encode("latin-1"))
+                )
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            metricas_requisicao.reset(token)
+            self._alertar(metricas)
+
+    @staticmethod
+    def _alertar(metricas: MetricasRequisicao):
+        rota = metricas.rota
+        for forma, n in metricas.repetidas():
+            print(f"[CONSULTAS] Possível N+1 em {rota}: {n}x {forma[:200]}")
+        if metricas.orcamento is not None and metricas.consultas > metricas.orcamento:
+            print(
+                f"[CONSULTAS] {rota} fez {metricas.consultas} consultas "
+                f"(orçamento {metricas.orcamento})"
+            )
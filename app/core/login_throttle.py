@@ -0,0 +1,172 @@
+# app/core/login_throttle.py
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, Request, status
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.sql import func
+from app.core.config import settings
+from app.database import engine
+from app.models.login_bucket import LoginBucket
+
+
+class BucketConfig:
+    def __init__(self, capacidade: int, por_minuto: float):
+        self.capacidade = float(capacidade)
+        self.taxa_por_segundo = por_minuto / 60.0
+
+    def segundos_para_um_token(self) -> int:
+        if self.taxa_por_segundo <= 0:
+            return 60
+        return max(1, math.ceil(1 / self.taxa_por_segundo))
+
+
+class MemoriaBucketStore:
+    """
+    Token buckets mantidos no próprio processo. Simples e sem I/O, mas cada
+    worker tem os seus limites (use o backend Postgres com vários workers).
+    Guarda no máximo MAX_CHAVES buckets, descartando o usado há mais tempo
+    (LRU): quem some volta com o bucket cheio, o que só acontece com chaves
+    paradas há bastante tempo.
+    """
+
+    MAX_CHAVES = 50_000
+
+    def __init__(self):
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def _tokens(self, chave: str, config: BucketConfig, agora: float) -> float:
+        tokens, ultimo = self._buckets.get(chave, (config.capacidade, agora))
+        return min(config.capacidade, tokens + (agora - ultimo) * config.taxa_por_segundo)
+
+    def _gravar(self, chave: str, tokens: float, agora: float):
+        self._buckets[chave] = (tokens, agora)
+        self._buckets.move_to_end(chave)
+        while len(self._buckets) > self.MAX_CHAVES:
+            self._buckets.popitem(last=False)
+
+    async def consumir(self, pedidos: list[tuple[str, BucketConfig]]) -> BucketConfig | None:
+        # Sem await no meio: a verificação e o consumo são atômicos no event loop
+        agora = time.monotonic()
+        disponiveis = []
+        for chave, config in pedidos:
+            tokens = self._tokens(chave, config, agora)
+            if tokens < 1:
+                return config
+            disponiveis.append((chave, tokens))
+        for chave, tokens in disponiveis:
+            self._gravar(chave, tokens - 1, agora)
+        return None
+
+
+class PostgresBucketStore:
+    """
+    Token buckets na tabela login_buckets, compartilhados entre todos os
+    workers. Cada bucket é reabastecido e consumido atomicamente por um único
+    INSERT ... ON CONFLICT DO UPDATE ... WHERE ... RETURNING: se não retornar
+    linha, não havia token disponível e a transação é desfeita, devolvendo os
+    tokens já tirados dos buckets anteriores.
+    """
+
+    async def consumir(self, pedidos: list[tuple[str, BucketConfig]]) -> BucketConfig | None:
+        async with engine.connect() as conn:
+            transacao = await conn.begin()
+            for chave, config in pedidos:
+                stmt = pg_insert(LoginBucket).values(
+                    chave=chave,
+                    tokens=config.capacidade - 1,
+                    atualizado_em=func.now(),
+                )
+                reabastecido = func.least(
+                    config.capacidade,
+                    LoginBucket.tokens
+                    + func.extract(
+                        "epoch", stmt.excluded.atualizado_em - LoginBucket.atualizado_em
+                    )
+                    * config.taxa_por_segundo,
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[LoginBucket.chave],
+                    set_={
+                        "tokens": reabastecido - 1,
+                        "atualizado_em": stmt.excluded.atualizado_em,
+                    },
+                    where=reabastecido >= 1,
+                ).returning(LoginBucket.chave)
+                result = await conn.execute(stmt)
+                if result.scalar_one_or_none() is None:
+                    await transacao.rollback()
+                    return config
+            await transacao.commit()
+        return None
+
+
+class ControladorLogin:
+    """
+    Controle de admissão das tentativas de login. Combina um token bucket por
+    identificador, outro por IP e um limite de verificações bcrypt
+    simultâneas. Tentativas em excesso recebem 429 antes de qualquer hash.
+    """
+
+    def __init__(self, store, config_identificador: BucketConfig, config_ip: BucketConfig, max_hashes: int):
+        self.store = store
+        self.config_identificador = config_identificador
+        self.config_ip = config_ip
+        self.max_hashes = max_hashes
+        self._hashes = asyncio.Semaphore(max_hashes)
+
+    @staticmethod
+    def ip_da_requisicao(request: Request) -> str:
+        if settings.LOGIN_CONFIAR_X_FORWARDED_FOR:
+            encaminhado = request.headers.get("x-forwarded-for")
+            if encaminhado:
+                return encaminhado.split(",")[0].strip()
+        return request.client.host if request.client else "desconhecido"
+
+    @staticmethod
+    def _rejeitar(retry_after: int):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas de login. Aguarde e tente novamente.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    @asynccontextmanager
+    async def admitir(self, identificador: str, ip: str):
+        pedidos = [
+            (f"id:{identificador.strip().lower()}", self.config_identificador),
+            (f"ip:{ip}", self.config_ip),
+        ]
+        # O Retry-After vem do bucket que recusou (identificador ou IP)
+        recusado = await self.store.consumir(pedidos)
+        if recusado is not None:
+            self._rejeitar(recusado.segundos_para_um_token())
+
+        # Sem fila: se todas as vagas de hash estão ocupadas, rejeita na hora
+        if self._hashes.locked():
+            self._rejeitar(1)
+
+        async with self._hashes:
+            yield
+
+
+def _criar_store():
+    if settings.LOGIN_THROTTLE_BACKEND == "postgres":
+        return PostgresBucketStore()
+    return MemoriaBucketStore()
+
+
+controlador_login = ControladorLogin(
+    store=_criar_store(),
+    config_identificador=BucketConfig(
+        settings.LOGIN_BUCKET_IDENTIFICADOR_CAPACIDADE,
+        settings.LOGIN_BUCKET_IDENTIFICADOR_POR_MINUTO,
+    ),
+    config_ip=BucketConfig(
+        settings.LOGIN_BUCKET_IP_CAPACIDADE,
+        settings.LOGIN_BUCKET_IP_POR_MINUTO,
+    ),
+    max_hashes=settings.LOGIN_MAX_HASHES_CONCORRENTES,
+)
@@ -0,0 +1,239 @@
+# app/core/metricas.py
+"""
+Métricas da aplicação no formato texto do Prometheus (GET /metrics), sem
+dependência externa.
+
+As séries são criadas uma vez (no import) com os buckets já alocados; cada
+observação é um bisect + incremento de inteiro, sem lock. Quase tudo roda
+no event loop, então não há disputa; nas poucas medições feitas em threads
+(bcrypt) a perda eventual de um incremento é aceitável para métricas.
+Cada worker expõe os próprios números (o Prometheus agrega por instância).
+"""
+import bisect
+import time
+from contextlib import contextmanager
+
+# Latências em segundos: de 1 ms (consultas simples) a 60 s (timeout do SOAP)
+BUCKETS_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BUCKETS_BCRYPT = (0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1, 2)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_rotulos(nomes: tuple, valores: tuple, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = ()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self._valores: dict[tuple, float] = {}
+
+    def incrementar(self, *valores_rotulos, quantidade: float = 1):
+        self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + quantidade
+
+    def amostras(self):
+        for valores, total in list(self._valores.items()):
+            yield f"{self.nome}_total{_formatar_rotulos(self.rotulos, valores)} {_numero(total)}"
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = (), buckets=BUCKETS_PADRAO):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self.limites = tuple(sorted(buckets))
+        # Por combinação de rótulos: [contagens por bucket (+Inf no fim), soma]
+        self._series: dict[tuple, list] = {}
+
+    def _serie(self, valores_rotulos: tuple) -> list:
+        serie = self._series.get(valores_rotulos)
+        if serie is None:
+            serie = self._series.setdefault(
+                valores_rotulos, [[0] * (len(self.limites) + 1), 0.0]
+            )
+        return serie
+
+    def observar(self, valor: float, *valores_rotulos):
+        serie = self._serie(valores_rotulos)
+        serie[0][bisect.bisect_left(self.limites, valor)] += 1
+        serie[1] += valor
+
+    def amostras(self):
+        for valores, (contagens, soma) in list(self._series.items()):
+            acumulado = 0
+            for limite, quantidade in zip(self.limites + (float("inf"),), list(contagens)):
+                acumulado += quantidade
+                le = f'le="{_numero(float(limite))}"'
+                yield f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, valores, le)} {acumulado}"
+            rotulos = _formatar_rotulos(self.rotulos, valores)
+            yield f"{self.nome}_sum{rotulos} {_numero(soma)}"
+            yield f"{self.nome}_count{rotulos} {acumulado}"
+
+
+class Medidor:
+    """Valor lido na hora da coleta (ex: conexões em uso no pool)."""
+
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple, coletar):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self._coletar = coletar  # () -> iterável de (valores_rotulos, valor)
+
+    def amostras(self):
+        for valores, valor in self._coletar():
+            yield f"{self.nome}{_formatar_rotulos(self.rotulos, valores)} {_numero(valor)}"
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._metricas: dict[str, object] = {}
+
+    def _registrar(self, metrica):
+        if metrica.nome in self._metricas:
+            raise ValueError(f"Métrica já registrada: {metrica.nome}")
+        self._metricas[metrica.nome] = metrica
+        return metrica
+
+    def contador(self, nome: str, ajuda: str, rotulos: tuple = ()) -> Contador:
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def histograma(
+        self, nome: str, ajuda: str, rotulos: tuple = (), buckets=BUCKETS_PADRAO
+    ) -> Histograma:
+        return self._registrar(Histograma(nome, ajuda, rotulos, buckets))
+
+    def medidor(self, nome: str, ajuda: str, rotulos: tuple, coletar) -> Medidor:
+        return self._registrar(Medidor(nome, ajuda, rotulos, coletar))
+
+    def renderizar(self) -> str:
+        linhas = []
+        for metrica in list(self._metricas.values()):
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            try:
+                linhas.extend(metrica.amostras())
+            except Exception as e:
+                # Um medidor com defeito não derruba a coleta das demais
+                print(f"[METRICAS] Falha ao coletar {metrica.nome}: {e}")
+        return "\n".join(linhas) + "\n"
+
+
+registro = RegistroMetricas()
+
+http_requisicoes_segundos = registro.histograma(
+    "http_requisicoes_segundos",
+    "Duração das requisições HTTP por método, rota (template) e status.",
+    ("metodo", "rota", "status"),
+)
+db_consultas_segundos = registro.histograma(
+    "db_consultas_segundos",
+    "Duração das consultas ao banco por engine e tipo de instrução.",
+    ("engine", "operacao"),
+)
+pool_espera_segundos = registro.histograma(
+    "pool_espera_segundos",
+    "Espera por uma conexão livre no pool (checkout) por engine.",
+    ("engine",),
+)
+nfse_soap_segundos = registro.histograma(
+    "nfse_soap_segundos",
+    "Duração das chamadas SOAP ao provedor de NFSe por operação e resultado.",
+    ("operacao", "resultado"),
+)
+email_envio_segundos = registro.histograma(
+    "email_envio_segundos",
+    "Duração dos envios de e-mail pelo Resend por resultado.",
+    ("resultado",),
+)
+bcrypt_segundos = registro.histograma(
+    "bcrypt_segundos",
+    "Tempo de CPU das operações bcrypt (gerar hash / verificar senha).",
+    ("operacao",),
+    buckets=BUCKETS_BCRYPT,
+)
+cache_consultas = registro.contador(
+    "cache_consultas",
+    "Consultas aos caches (catálogos em memória, ETag) por resultado: acerto ou falha.",
+    ("cache", "resultado"),
+)
+catalogo_recargas = registro.contador(
+    "catalogo_recargas",
+    "Recargas dos catálogos em memória.",
+    ("catalogo",),
+)
+
+
+def tipo_operacao(statement: str) -> str:
+    """Primeira palavra da instrução SQL (SELECT, INSERT...), para rótulos de baixa cardinalidade."""
+    # Só o começo do texto: statements grandes não são copiados a cada consulta
+    partes = statement[:32].split(None, 1)
+    palavra = partes[0].upper() if partes else ""
+    return palavra if palavra in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OUTRO"
+
+
+@contextmanager
+def medir(histograma: Histograma, *rotulos):
+    """
+    Mede o bloco e observa com os `rotulos` mais o resultado: "sucesso",
+    "timeout" ou "erro" (a exceção segue adiante).
+    """
+    inicio = time.perf_counter()
+    resultado = "erro"
+    try:
+        yield
+        resultado = "sucesso"
+    except BaseException as e:
+        if "Timeout" in type(e).__name__:
+            resultado = "timeout"
+        raise
+    finally:
+        histograma.observar(time.perf_counter() - inicio, *rotulos, resultado)
+
+
+class MetricasHttpMiddleware:
+    """
+    Middleware ASGI: mede cada requisição e registra pela rota que atendeu
+    (template, ex: /nota-fiscal/{nota_id}), para não criar uma série por id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        codigo = 500
+
+        async def enviar(mensagem):
+            nonlocal codigo
+            if mensagem["type"] == "http.response.start":
+                codigo = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            rota = scope.get("route")
+            http_requisicoes_segundos.observar(
+                time.perf_counter() - inicio,
+                scope["method"],
+                getattr(rota, "path", "desconhecida"),
+                str(codigo),
+            )
@@ -0,0 +1,367 @@
+# app/core/particoes.py
+"""
+Particionamento de notas_fiscais por mês de data_criacao (RANGE nativo do
+Postgres), gerenciado pela aplicação:
+
+- converter_para_particionada: conversão única da tabela comum (CLI);
+- garantir_particoes_futuras: cria os meses seguintes antes de serem
+  necessários (na subida e periodicamente);
+- arquivar_particoes / arquivar_excluidas: tiram da tabela quente os meses
+  antigos e as notas excluídas, movendo-os para o schema "arquivo". As
+  tabelas movidas herdam de arquivo.notas_fiscais, então uma consulta nela
+  enxerga todas (é onde a busca por id procura depois da tabela quente).
+
+Os limites das partições são meses em UTC. A chave primária passa a ser
+(id, data_criacao), exigência do Postgres para tabelas particionadas; o id
+continua único pela sequência.
+"""
+import asyncio
+import re
+from datetime import date, datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.core.config import settings
+from app.core.schema import preparar_banco
+from app.database import engine
+from app.models.nota_fiscal import NotaFiscal
+from app.models.status_nota import StatusNotaId
+
+TABELA = "notas_fiscais"
+SCHEMA_ARQUIVO = "arquivo"
+PARTICAO_PADRAO = f"{TABELA}_padrao"
+PAI_ARQUIVO = f"{SCHEMA_ARQUIVO}.{TABELA}"
+EXCLUIDAS_ARQUIVO = f"{SCHEMA_ARQUIVO}.{TABELA}_excluidas"
+_NOME_PARTICAO = re.compile(rf"^{TABELA}_p(\d{{4}})_(\d{{2}})$")
+
+# Status que ainda podem mudar: partições com essas notas não são arquivadas
+_STATUS_EM_ABERTO = (
+    int(StatusNotaId.PENDENTE),
+    int(StatusNotaId.APROVADA),
+    int(StatusNotaId.EM_PROCESSAMENTO),
+)
+
+
+def inicio_mes(dia: date) -> date:
+    return date(dia.year, dia.month, 1)
+
+
+def somar_meses(mes: date, meses: int) -> date:
+    total = mes.year * 12 + mes.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nome_particao(mes: date) -> str:
+    return f"{TABELA}_p{mes:%Y_%m}"
+
+
+def _mes_da_particao(nome: str) -> date | None:
+    encontrado = _NOME_PARTICAO.match(nome)
+    if not encontrado:
+        return None
+    return date(int(encontrado.group(1)), int(encontrado.group(2)), 1)
+
+
+async def tabela_particionada(conn: AsyncConnection) -> bool:
+    return bool(
+        await conn.scalar(
+            text(
+                """
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_partitioned_table pt
+                    JOIN pg_class c ON c.oid = pt.partrelid
+                    WHERE c.oid = to_regclass(:tabela)
+                )
+                """
+            ),
+            {"tabela": TABELA},
+        )
+    )
+
+
+async def listar_particoes(conn: AsyncConnection) -> list[str]:
+    result = await conn.execute(
+        text(
+            """
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:tabela)
+            ORDER BY c.relname
+            """
+        ),
+        {"tabela": TABELA},
+    )
+    return list(result.scalars())
+
+
+async def criar_particao(conn: AsyncConnection, mes: date) -> bool:
+    """
+    Cria a partição do mês se ainda não existir. Retorna se criou.
+
+    Se a partição padrão já tiver notas do mês, o CREATE ... PARTITION OF
+    falharia: a partição é criada solta, recebe essas notas (saindo da
+    padrão) e só então é anexada, tudo na transação de quem chamou.
+    """
+    nome = nome_particao(mes)
+    if await conn.scalar(text("SELECT to_regclass(:nome)"), {"nome": nome}):
+        return False
+
+    inicio = f"'{mes.isoformat()} 00:00:00+00'"
+    fim = f"'{somar_meses(mes, 1).isoformat()} 00:00:00+00'"
+    no_mes = f"data_criacao >= {inicio} AND data_criacao < {fim}"
+    na_padrao = await conn.scalar(text("SELECT to_regclass(:nome)"), {"nome": PARTICAO_PADRAO})
+    if not na_padrao or not await conn.scalar(
+        text(f"SELECT EXISTS (SELECT 1 FROM {PARTICAO_PADRAO} WHERE {no_mes})")
+    ):
+        await conn.execute(
+            text(f"CREATE TABLE {nome} PARTITION OF {TABELA} FOR VALUES FROM ({inicio}) TO ({fim})")
+        )
+        return True
+
+    # Direto nas partições: os triggers de pendências (no pai) não disparam,
+    # e a contagem continua certa porque as notas só mudam de partição
+    colunas = ", ".join(c.name for c in NotaFiscal.__table__.columns)
+    await conn.execute(text(f"CREATE TABLE {nome} (LIKE {TABELA} INCLUDING DEFAULTS)"))
+    movidas = (
+        await conn.execute(
+            text(
+                f"""
+                WITH movidas AS (
+                    DELETE FROM {PARTICAO_PADRAO} WHERE {no_mes} RETURNING {colunas}
+                )
+                INSERT INTO {nome} ({colunas}) SELECT {colunas} FROM movidas
+                """
+            )
+        )
+    ).rowcount
+    await conn.execute(
+        text(f"ALTER TABLE {TABELA} ATTACH PARTITION {nome} FOR VALUES FROM ({inicio}) TO ({fim})")
+    )
+    print(
+        f"[PARTICOES] Atenção: {movidas} notas de {mes:%Y-%m} estavam na partição padrão "
+        f"e foram movidas para {nome}"
+    )
+    return True
+
+
+async def garantir_particoes_futuras(
+    conn: AsyncConnection, meses: int | None = None
+) -> list[str]:
+    """Garante as partições do mês atual e dos `meses` seguintes."""
+    meses = settings.NOTAS_PARTICOES_FUTURAS if meses is None else meses
+    # Vários workers sobem juntos: um de cada vez cria as partições
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:chave))"), {"chave": TABELA})
+
+    atual = inicio_mes(datetime.now(timezone.utc).date())
+    criadas = []
+    for i in range(meses + 1):
+        mes = somar_meses(atual, i)
+        if await criar_particao(conn, mes):
+            criadas.append(nome_particao(mes))
+    return criadas
+
+
+async def manter_particoes():
+    """Tarefa de fundo: cria as partições futuras na subida e periodicamente."""
+    while True:
+        try:
+            async with engine.begin() as conn:
+                if await tabela_particionada(conn):
+                    for nome in await garantir_particoes_futuras(conn):
+                        print(f"[PARTICOES] Partição {nome} criada")
+        except Exception as e:
+            print(f"[PARTICOES] Falha ao criar partições futuras: {e}")
+        await asyncio.sleep(settings.NOTAS_PARTICOES_VERIFICACAO_HORAS * 3600)
+
+
+async def converter_para_particionada(conn: AsyncConnection) -> dict:
+    """
+    Converte a tabela comum em particionada, em uma única transação (a
+    tabela fica bloqueada durante a cópia). Índices e triggers dos modelos
+    são recriados na mesma transação: nenhuma escrita chega à tabela nova
+    sem os triggers de pendências.
+    """
+    if await tabela_particionada(conn):
+        return {"convertida": False, "motivo": "A tabela já é particionada."}
+
+    # 1. Bloqueia e tira a tabela atual do caminho
+    await conn.execute(text(f"LOCK TABLE {TABELA} IN ACCESS EXCLUSIVE MODE"))
+    sequencia = await conn.scalar(text(f"SELECT pg_get_serial_sequence('{TABELA}', 'id')"))
+    if not sequencia:
+        raise RuntimeError(f"Sequência do id de {TABELA} não encontrada.")
+    legado = f"{TABELA}_legado"
+    await conn.execute(text(f"ALTER TABLE {TABELA} RENAME TO {legado}"))
+
+    # 2. data_criacao é a chave de partição: não pode ser nula
+    await conn.execute(
+        text(
+            f"""
+            UPDATE {legado} SET data_criacao = coalesce(data_atualizacao, now())
+            WHERE data_criacao IS NULL
+            """
+        )
+    )
+
+    # 3. Tabela nova com as mesmas colunas (e o mesmo default do id)
+    await conn.execute(
+        text(
+            f"""
+            CREATE TABLE {TABELA} (LIKE {legado} INCLUDING DEFAULTS)
+            PARTITION BY RANGE (data_criacao)
+            """
+        )
+    )
+    await conn.execute(text(f"ALTER TABLE {TABELA} ALTER COLUMN data_criacao SET NOT NULL"))
+
+    # 4. Uma partição por mês com dados, até os meses futuros, e a padrão
+    #    (rede de segurança para datas fora das partições criadas)
+    primeiro = await conn.scalar(text(f"SELECT min(data_criacao) FROM {legado}"))
+    atual = inicio_mes(datetime.now(timezone.utc).date())
+    mes = inicio_mes(primeiro.astimezone(timezone.utc).date()) if primeiro else atual
+    particoes = 0
+    while mes <= somar_meses(atual, settings.NOTAS_PARTICOES_FUTURAS):
+        particoes += await criar_particao(conn, mes)
+        mes = somar_meses(mes, 1)
+    await conn.execute(text(f"CREATE TABLE {PARTICAO_PADRAO} PARTITION OF {TABELA} DEFAULT"))
+
+    # 5. Cópia e conferência
+    colunas = ", ".join(c.name for c in NotaFiscal.__table__.columns)
+    copiadas = (
+        await conn.execute(text(f"INSERT INTO {TABELA} ({colunas}) SELECT {colunas} FROM {legado}"))
+    ).rowcount
+    originais = await conn.scalar(text(f"SELECT count(*) FROM {legado}"))
+    if copiadas != originais:
+        raise RuntimeError(f"Cópia incompleta: {copiadas} de {originais} notas.")
+
+    # 6. A sequência passa para a tabela nova antes de remover a antiga
+    await conn.execute(text(f"ALTER SEQUENCE {sequencia} OWNED BY {TABELA}.id"))
+    await conn.execute(text(f"DROP TABLE {legado}"))
+
+    # 7. Chave primária (precisa incluir a chave de partição) e FKs
+    await conn.execute(
+        text(f"ALTER TABLE {TABELA} ADD CONSTRAINT {TABELA}_pkey PRIMARY KEY (id, data_criacao)")
+    )
+    await conn.execute(
+        text(
+            f"""
+            ALTER TABLE {TABELA}
+            ADD CONSTRAINT {TABELA}_usuario_id_fkey FOREIGN KEY (usuario_id)
+                REFERENCES usuarios (id) ON DELETE CASCADE,
+            ADD CONSTRAINT {TABELA}_cliente_id_fkey FOREIGN KEY (cliente_id)
+                REFERENCES clientes (id) ON DELETE SET NULL,
+            ADD CONSTRAINT {TABELA}_status_id_fkey FOREIGN KEY (status_id)
+                REFERENCES status_nota (id)
+            """
+        )
+    )
+
+    # 8. Índices dos modelos e triggers (pendências) antes do commit
+    await preparar_banco(conn)
+    return {"convertida": True, "notas": copiadas, "particoes": particoes + 1}
+
+
+async def garantir_pai_arquivo(conn: AsyncConnection) -> list[str]:
+    """
+    Cria arquivo.notas_fiscais (tabela vazia, só para herança) e pendura
+    nela as tabelas já arquivadas que ainda não herdam dela. Retorna as
+    tabelas penduradas agora.
+    """
+    await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA_ARQUIVO}"))
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {PAI_ARQUIVO} (LIKE public.{TABELA})"))
+    result = await conn.execute(
+        text(
+            """
+            SELECT c.relname FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :schema AND c.relkind = 'r'
+              AND (c.relname ~ :particoes OR c.relname = :excluidas)
+              AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+            ORDER BY c.relname
+            """
+        ),
+        {
+            "schema": SCHEMA_ARQUIVO,
+            "particoes": _NOME_PARTICAO.pattern,
+            "excluidas": f"{TABELA}_excluidas",
+        },
+    )
+    orfas = list(result.scalars())
+    for nome in orfas:
+        await conn.execute(text(f"ALTER TABLE {SCHEMA_ARQUIVO}.{nome} INHERIT {PAI_ARQUIVO}"))
+    return orfas
+
+
+async def arquivar_particoes(
+    conn: AsyncConnection, *, meses: int, dry_run: bool = False
+) -> dict:
+    """
+    Desanexa as partições mensais anteriores aos últimos `meses` meses e as
+    move para o schema de arquivo. Partições com notas ainda em aberto
+    (pendentes, aprovadas ou em processamento) ficam na tabela.
+    """
+    limite = somar_meses(inicio_mes(datetime.now(timezone.utc).date()), -meses)
+    arquivadas, mantidas = [], []
+
+    for nome in await listar_particoes(conn):
+        mes = _mes_da_particao(nome)
+        if mes is None or mes >= limite:
+            continue
+
+        em_aberto = await conn.scalar(
+            text(f"SELECT EXISTS (SELECT 1 FROM {nome} WHERE status_id = ANY(:status))"),
+            {"status": list(_STATUS_EM_ABERTO)},
+        )
+        if em_aberto:
+            mantidas.append({"particao": nome, "motivo": "Possui notas em aberto."})
+            continue
+
+        if not dry_run:
+            await garantir_pai_arquivo(conn)
+            await conn.execute(text(f"ALTER TABLE {TABELA} DETACH PARTITION {nome}"))
+            await conn.execute(text(f"ALTER TABLE {nome} SET SCHEMA {SCHEMA_ARQUIVO}"))
+            await conn.execute(
+                text(f"ALTER TABLE {SCHEMA_ARQUIVO}.{nome} INHERIT {PAI_ARQUIVO}")
+            )
+        arquivadas.append(nome)
+
+    return {"limite": limite.isoformat(), "arquivadas": arquivadas, "mantidas": mantidas}
+
+
+async def arquivar_excluidas(
+    conn: AsyncConnection, *, dias: int, dry_run: bool = False
+) -> int:
+    """
+    Move para arquivo.notas_fiscais_excluidas as notas excluídas
+    (exclusão lógica) há mais de `dias` dias. Funciona com ou sem
+    particionamento. Retorna quantas notas foram (ou seriam) movidas.
+    """
+    condicao = "status_id = :excluida AND data_atualizacao < now() - make_interval(days => :dias)"
+    parametros = {"excluida": int(StatusNotaId.EXCLUIDA), "dias": dias}
+
+    if dry_run:
+        return await conn.scalar(
+            text(f"SELECT count(*) FROM {TABELA} WHERE {condicao}"), parametros
+        )
+
+    destino = EXCLUIDAS_ARQUIVO
+    colunas = ", ".join(c.name for c in NotaFiscal.__table__.columns)
+    await garantir_pai_arquivo(conn)
+    await conn.execute(
+        text(f"CREATE TABLE IF NOT EXISTS {destino} () INHERITS ({PAI_ARQUIVO})")
+    )
+    # Buscas por id (fallback do GET /nota-fiscal/{id}) sem varrer a tabela
+    await conn.execute(
+        text(f"CREATE INDEX IF NOT EXISTS {TABELA}_excluidas_id_idx ON {destino} (id)")
+    )
+    result = await conn.execute(
+        text(
+            f"""
+            WITH movidas AS (
+                DELETE FROM {TABELA} WHERE {condicao}
+                RETURNING {colunas}
+            )
+            INSERT INTO {destino} ({colunas}) SELECT {colunas} FROM movidas
+            """
+        ),
+        parametros,
+    )
+    return result.rowcount
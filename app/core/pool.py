@@ -0,0 +1,57 @@
+# app/core/pool.py
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.metricas import pool_espera_segundos
+
+
+class PoolInstrumentado(AsyncAdaptedQueuePool):
+    """
+    Pool padrão do engine assíncrono que também mede quanto tempo cada
+    checkout espera por uma conexão livre (o gargalo quando o pool está
+    pequeno demais para a carga).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_metricas = threading.Lock()
+        self.checkouts = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except PoolTimeoutError:
+            # Só o estouro do pool_timeout; falhas ao conectar não são espera
+            with self._lock_metricas:
+                self.timeouts += 1
+            raise
+
+        # Estatísticas de espera só dos checkouts bem-sucedidos
+        espera = time.perf_counter() - inicio
+        pool_espera_segundos.observar(espera, self._orig_logging_name or "primario")
+        with self._lock_metricas:
+            self.checkouts += 1
+            self.espera_total += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+        return conexao
+
+    def metricas(self) -> dict:
+        with self._lock_metricas:
+            checkouts, espera_total = self.checkouts, self.espera_total
+            espera_maxima, timeouts = self.espera_maxima, self.timeouts
+        return {
+            "tamanho": self.size(),
+            "em_uso": self.checkedout(),
+            "livres": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "espera_media_ms": round(espera_total / checkouts * 1000, 3) if checkouts else 0.0,
+            "espera_maxima_ms": round(espera_maxima * 1000, 3),
+        }
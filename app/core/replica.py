@@ -0,0 +1,148 @@
+# app/core/replica.py
+import asyncio
+import time
+from fastapi import Request
+from sqlalchemy import text
+from app.core.config import settings
+from app.database import AsyncReadSessionLocal, AsyncSessionLocal, replica_engine
+
+_METODOS_LEITURA = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Segundos de atraso da réplica (0 se ela já aplicou todo o WAL recebido)
+_SQL_LAG = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+# Marcador da última escrita, devolvido ao cliente: cookie (navegador no
+# mesmo site) e cabeçalho (clientes que o reenviam, ex: front em outro domínio)
+COOKIE_ESCRITA = "ultima_escrita"
+HEADER_ESCRITA = "X-Ultima-Escrita"
+
+
+def momento_escrita(request: Request) -> float | None:
+    """Momento (epoch) da última escrita do cliente, pelo cabeçalho ou cookie."""
+    valor = request.headers.get(HEADER_ESCRITA) or request.cookies.get(COOKIE_ESCRITA)
+    try:
+        return float(valor) if valor else None
+    except ValueError:
+        return None
+
+
+def escreveu_recentemente(momento: float | None) -> bool:
+    if momento is None:
+        return False
+    return 0 <= time.time() - momento < settings.REPLICA_LEITURA_PROPRIA_SEGUNDOS
+
+
+class RoteadorLeitura:
+    """
+    Decide se uma leitura pode ir para a réplica:
+
+    - a réplica precisa estar configurada, acessível e com lag abaixo de
+      REPLICA_MAX_LAG_SEGUNDOS (checagem em cache por alguns segundos);
+    - o cliente não pode ter feito uma escrita nos últimos
+      REPLICA_LEITURA_PROPRIA_SEGUNDOS (leitura da própria escrita).
+
+    A escrita recente vem no marcador que o próprio cliente carrega (ver
+    RegistroEscritaMiddleware), então vale para qualquer worker ou instância.
+    """
+
+    def __init__(self, engine=None, consulta_lag=_SQL_LAG):
+        self.engine = engine
+        self.consulta_lag = consulta_lag
+        self._lock = asyncio.Lock()
+        self._verificado_em = float("-inf")
+        self._saudavel = False
+        self.lag: float | None = None
+
+    async def _medir_lag(self) -> float | None:
+        async with self.engine.connect() as conn:
+            lag = await conn.scalar(self.consulta_lag)
+        return None if lag is None else float(lag)
+
+    async def replica_saudavel(self) -> bool:
+        if self.engine is None:
+            return False
+        if time.monotonic() - self._verificado_em < settings.REPLICA_VERIFICACAO_SEGUNDOS:
+            return self._saudavel
+
+        async with self._lock:
+            # Outra requisição pode ter verificado enquanto esperávamos o lock
+            if time.monotonic() - self._verificado_em < settings.REPLICA_VERIFICACAO_SEGUNDOS:
+                return self._saudavel
+            try:
+                self.lag = await asyncio.wait_for(self._medir_lag(), timeout=1.0)
+                self._saudavel = (
+                    self.lag is not None and self.lag <= settings.REPLICA_MAX_LAG_SEGUNDOS
+                )
+                if not self._saudavel:
+                    print(f"[REPLICA] Lag de {self.lag}s; leituras no primário")
+            except Exception as e:
+                self.lag = None
+                self._saudavel = False
+                print(f"[REPLICA] Réplica indisponível; leituras no primário: {e}")
+            self._verificado_em = time.monotonic()
+        return self._saudavel
+
+    async def usar_replica(self, request: Request) -> bool:
+        if escreveu_recentemente(momento_escrita(request)):
+            return False
+        return await self.replica_saudavel()
+
+
+roteador_leitura = RoteadorLeitura(replica_engine)
+
+
+async def get_read_db(request: Request):
+    """
+    Sessão para endpoints só de leitura (listagens e relatórios): usa a
+    réplica quando possível e o primário caso contrário.
+    """
+    if await roteador_leitura.usar_replica(request):
+        sessao = AsyncReadSessionLocal
+    else:
+        sessao = AsyncSessionLocal
+    async with sessao() as session:
+        yield session
+
+
+class RegistroEscritaMiddleware:
+    """
+    Middleware ASGI: quando uma requisição de escrita termina com sucesso,
+    devolve ao cliente o momento da escrita (cookie com validade da janela
+    de leitura própria e cabeçalho X-Ultima-Escrita). Enquanto o cliente o
+    reenviar, suas leituras vão ao primário e veem o próprio dado mesmo que
+    a réplica ainda não o tenha aplicado.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _METODOS_LEITURA:
+            await self.app(scope, receive, send)
+            return
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start" and mensagem["status"] < 400:
+                momento = f"{time.time():.3f}"
+                janela = int(settings.REPLICA_LEITURA_PROPRIA_SEGUNDOS)
+                cookie = (
+                    f"{COOKIE_ESCRITA}={momento}; Max-Age={janela}; Path=/; "
+                    "HttpOnly; SameSite=Lax"
+                )
+                mensagem["headers"] = [
+                    *mensagem.get("headers", []),
+                    (HEADER_ESCRITA.lower().encode("latin-1"), momento.encode("latin-1")),
+                    (b"set-cookie", cookie.encode("latin-1")),
+                ]
+            await send(mensagem)
+
+        await self.app(scope, receive, enviar)
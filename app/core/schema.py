@@ -0,0 +1,301 @@
+# app/core/schema.py
+"""
+Estrutura do banco sem ferramenta de migração:
+
+- preparar_banco: passo explícito de deploy (python -m app.cli.migrar_banco).
+  Cria o que falta (tabelas, colunas, índices, funções, triggers) numa única
+  transação, serializada por advisory lock, e falha no primeiro erro;
+- verificar_banco: roda na subida da aplicação e só confere, por catálogo,
+  que os objetos obrigatórios existem. Falta algo, a subida falha.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.database import engine, Base
+import app.models  # noqa: F401  (registra todos os modelos no metadata)
+
+
+# Colunas novas em tabelas existentes (o create_all não altera tabelas)
+DDL_COLUNAS = [
+    "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS cpf_cnpj_digitos VARCHAR",
+    "ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS cnpj_cpf_digitos VARCHAR",
+]
+
+# Preenche as colunas normalizadas que ficaram nulas (registros anteriores a
+# elas). Precisa rodar antes dos índices: o único de clientes depende delas.
+# Em tabelas grandes, rode antes o app.cli.backfill_documentos (em lotes);
+# aqui sobra só o que entrou depois dele
+DDL_PREENCHIMENTO = [
+    """
+    UPDATE clientes SET cpf_cnpj_digitos = regexp_replace(cpf_cnpj, '\\D', '', 'g')
+    WHERE cpf_cnpj_digitos IS NULL AND cpf_cnpj IS NOT NULL
+    """,
+    """
+    UPDATE usuarios SET cnpj_cpf_digitos = regexp_replace(cnpj_cpf, '\\D', '', 'g')
+    WHERE cnpj_cpf_digitos IS NULL AND cnpj_cpf IS NOT NULL
+    """,
+]
+
+# DDL que não dá para declarar nos modelos (extensões, funções, índices de expressão)
+DDL_EXTRA = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() não é IMMUTABLE; o wrapper permite usá-lo em índices
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_clientes_razao_social_trgm
+    ON clientes USING gin (f_unaccent(lower(razao_social)) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_clientes_razao_social_prefixo
+    ON clientes (f_unaccent(lower(razao_social)) text_pattern_ops)
+    """,
+    # Versão dos catálogos em memória: incrementada a cada alteração da tabela
+    """
+    CREATE OR REPLACE FUNCTION incrementar_versao_catalogo() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO versoes_catalogo (nome, versao, atualizado_em)
+        VALUES (TG_ARGV[0], 1, now())
+        ON CONFLICT (nome) DO UPDATE
+        SET versao = versoes_catalogo.versao + 1, atualizado_em = now();
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE TRIGGER trg_versao_catalogo_cnae
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON cnae_lista_servicos
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_catalogo('cnae')
+    """,
+    """
+    CREATE OR REPLACE TRIGGER trg_versao_catalogo_status
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON status_nota
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_catalogo('status')
+    """,
+    # Pendentes por usuário: triggers por instrução com tabelas de transição,
+    # então um lote de 500 notas aplica um único delta por usuário
+    """
+    CREATE OR REPLACE FUNCTION atualizar_pendencias_usuario() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO pendencias_usuario (usuario_id, pendentes, atualizado_em)
+            SELECT usuario_id, count(*), now() FROM novas
+            WHERE status_id = 1 GROUP BY usuario_id
+            ON CONFLICT (usuario_id) DO UPDATE
+            SET pendentes = pendencias_usuario.pendentes + EXCLUDED.pendentes,
+                atualizado_em = now();
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE pendencias_usuario p
+            SET pendentes = p.pendentes - d.n, atualizado_em = now()
+            FROM (
+                SELECT usuario_id, count(*) AS n FROM antigas
+                WHERE status_id = 1 GROUP BY usuario_id
+            ) d
+            WHERE p.usuario_id = d.usuario_id;
+        ELSE
+            INSERT INTO pendencias_usuario (usuario_id, pendentes, atualizado_em)
+            SELECT usuario_id, sum(delta), now() FROM (
+                SELECT usuario_id, 1 AS delta FROM novas WHERE status_id = 1
+                UNION ALL
+                SELECT usuario_id, -1 FROM antigas WHERE status_id = 1
+            ) d
+            GROUP BY usuario_id
+            HAVING sum(delta) <> 0
+            ON CONFLICT (usuario_id) DO UPDATE
+            SET pendentes = pendencias_usuario.pendentes + EXCLUDED.pendentes,
+                atualizado_em = now();
+        END IF;
+        RETURN NULL;
+    END $$
+    """,
+    # Tabelas de transição exigem um trigger por evento
+    """
+    CREATE OR REPLACE TRIGGER trg_pendencias_usuario_insert
+    AFTER INSERT ON notas_fiscais REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualizar_pendencias_usuario()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER trg_pendencias_usuario_update
+    AFTER UPDATE ON notas_fiscais REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualizar_pendencias_usuario()
+    """,
+    """
+    CREATE OR REPLACE TRIGGER trg_pendencias_usuario_delete
+    AFTER DELETE ON notas_fiscais REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION atualizar_pendencias_usuario()
+    """,
+    # Carga inicial quando a tabela de contagem é nova. Roda depois dos
+    # triggers, na mesma transação: o CREATE TRIGGER segura as escritas em
+    # notas_fiscais até o commit, então nenhuma nota escapa da contagem
+    """
+    INSERT INTO pendencias_usuario (usuario_id, pendentes, atualizado_em)
+    SELECT usuario_id, count(*), now() FROM notas_fiscais
+    WHERE status_id = 1
+      AND NOT EXISTS (SELECT 1 FROM pendencias_usuario)
+    GROUP BY usuario_id
+    """,
+]
+
+
+# Objetos do DDL_EXTRA conferidos na subida pelo verificar_banco
+INDICES_EXTRA = ("ix_clientes_razao_social_trgm", "ix_clientes_razao_social_prefixo")
+FUNCOES_EXTRA = (
+    "f_unaccent(text)",
+    "incrementar_versao_catalogo()",
+    "atualizar_pendencias_usuario()",
+)
+GATILHOS_EXTRA = (
+    "trg_versao_catalogo_cnae",
+    "trg_versao_catalogo_status",
+    "trg_pendencias_usuario_insert",
+    "trg_pendencias_usuario_update",
+    "trg_pendencias_usuario_delete",
+)
+
+
+def _executar_comandos(sync_conn, comandos: list[str]):
+    for comando in comandos:
+        try:
+            sync_conn.execute(text(comando))
+        except Exception as e:
+            resumo = " ".join(comando.split())[:80]
+            raise RuntimeError(f"Falha ao executar DDL: {resumo}... {e}") from e
+
+
+def _contar_duplicados(sync_conn, indice) -> int:
+    """Quantas combinações de valores impedem a criação do índice único."""
+    colunas = ", ".join(c.name for c in indice.columns)
+    nao_nulas = " AND ".join(f"{c.name} IS NOT NULL" for c in indice.columns)
+    return sync_conn.scalar(
+        text(
+            f"""
+            SELECT count(*) FROM (
+                SELECT 1 FROM {indice.table.name} WHERE {nao_nulas}
+                GROUP BY {colunas} HAVING count(*) > 1
+            ) d
+            """
+        )
+    )
+
+
+def _criar_indices_faltantes(sync_conn):
+    """
+    O create_all só cria os índices junto com tabelas novas. Aqui garantimos
+    também os índices declarados nos modelos de tabelas que já existem.
+    """
+    for tabela in Base.metadata.sorted_tables:
+        for indice in tabela.indexes:
+            if indice.unique and not sync_conn.scalar(
+                text("SELECT to_regclass(:nome)"), {"nome": indice.name}
+            ):
+                duplicados = _contar_duplicados(sync_conn, indice)
+                if duplicados:
+                    raise RuntimeError(
+                        f"Índice único {indice.name} não pode ser criado: {duplicados} "
+                        "valores duplicados. Veja o relatório do app.cli.backfill_documentos."
+                    )
+            indice.create(sync_conn, checkfirst=True)
+
+
+async def _executar_ddl(conn: AsyncConnection):
+    await conn.run_sync(Base.metadata.create_all)
+    await conn.run_sync(_executar_comandos, DDL_COLUNAS)
+    await conn.run_sync(_executar_comandos, DDL_PREENCHIMENTO)
+    await conn.run_sync(_criar_indices_faltantes)
+    await conn.run_sync(_executar_comandos, DDL_EXTRA)
+
+
+async def preparar_banco(conn: AsyncConnection | None = None):
+    """
+    Cria as tabelas, colunas e índices auxiliares que ainda não existem no
+    banco, preenchendo as colunas normalizadas antes dos índices que
+    dependem delas. Nunca remove nem altera estruturas existentes. Tudo ou
+    nada: qualquer falha desfaz a transação e é propagada.
+
+    Com `conn`, roda dentro da transação de quem chamou (ex: a conversão
+    para tabela particionada, que precisa dos triggers antes do commit).
+    """
+    if conn is None:
+        async with engine.begin() as conn:
+            await preparar_banco(conn)
+        print("[SCHEMA] Banco preparado")
+        return
+
+    # Dois deploys simultâneos: um de cada vez
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('preparar_banco'))"))
+    await _executar_ddl(conn)
+
+
+async def garantir_colunas():
+    """Só as colunas novas, sem preenchimento nem índices (usado pelo backfill em lotes)."""
+    async with engine.begin() as conn:
+        await conn.run_sync(_executar_comandos, DDL_COLUNAS)
+
+
+async def objetos_faltantes(conn: AsyncConnection) -> list[str]:
+    """Tabelas, colunas, índices, funções e triggers esperados que não existem."""
+    faltantes = []
+
+    result = await conn.execute(
+        text(
+            """
+            SELECT table_name, column_name FROM information_schema.columns
+            WHERE table_schema = current_schema()
+            """
+        )
+    )
+    existentes = set(result.tuples())
+    relacoes = list(INDICES_EXTRA)
+    for tabela in Base.metadata.sorted_tables:
+        relacoes.extend(i.name for i in tabela.indexes)
+        if not any(nome == tabela.name for nome, _ in existentes):
+            faltantes.append(f"tabela {tabela.name}")
+            continue
+        faltantes.extend(
+            f"coluna {tabela.name}.{c.name}"
+            for c in tabela.columns
+            if (tabela.name, c.name) not in existentes
+        )
+
+    result = await conn.execute(
+        text("SELECT n FROM unnest(CAST(:nomes AS text[])) n WHERE to_regclass(n) IS NULL"),
+        {"nomes": relacoes},
+    )
+    faltantes.extend(f"índice {nome}" for nome in result.scalars())
+
+    result = await conn.execute(
+        text("SELECT f FROM unnest(CAST(:funcoes AS text[])) f WHERE to_regprocedure(f) IS NULL"),
+        {"funcoes": list(FUNCOES_EXTRA)},
+    )
+    faltantes.extend(f"função {nome}" for nome in result.scalars())
+
+    result = await conn.execute(
+        text(
+            """
+            SELECT t FROM unnest(CAST(:gatilhos AS text[])) t
+            WHERE NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = t)
+            """
+        ),
+        {"gatilhos": list(GATILHOS_EXTRA)},
+    )
+    faltantes.extend(f"trigger {nome}" for nome in result.scalars())
+    return faltantes
+
+
+async def verificar_banco():
+    """
+    Conferência rápida na subida (só leituras de catálogo, sem DDL nem
+    locks). Levanta RuntimeError listando o que falta, para a subida falhar
+    em vez de atender com o banco incompleto.
+    """
+    async with engine.connect() as conn:
+        faltantes = await objetos_faltantes(conn)
+    if faltantes:
+        raise RuntimeError(
+            "Banco desatualizado; rode python -m app.cli.migrar_banco. Faltando: "
+            + ", ".join(faltantes)
+        )
@@ -1,12 +1,19 @@
 # app/core/security.py
 
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+from app.core.instrumentacao_db import orcamento_consultas
+from app.core.metricas import bcrypt_segundos
 from app.crud.usuario import get_user_by_documento
 from app.schemas.usuario import User
 from fastapi import Depends, HTTPException, status, Header  # ← adicionado Header
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 
@@ -22,12 +29,52 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__ident=
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     truncated_password = plain_password[:72]
-    return pwd_context.verify(truncated_password, hashed_password)
+    inicio = time.perf_counter()
+    try:
+        return pwd_context.verify(truncated_password, hashed_password)
+    finally:
+        bcrypt_segundos.observar(time.perf_counter() - inicio, "verificar")
 
 
 def get_password_hash(password: str) -> str:
     truncated_password = password[:72]
-    return pwd_context.hash(truncated_password)
+    inicio = time.perf_counter()
+    try:
+        return pwd_context.hash(truncated_password)
+    finally:
+        bcrypt_segundos.observar(time.perf_counter() - inicio, "gerar")
+
+
+def _hash_lote(senhas: list[str]) -> list[str]:
+    # Executado nos processos do pool (precisa ser função de módulo)
+    return [get_password_hash(senha) for senha in senhas]
+
+
+_PROCESSOS_HASH = os.cpu_count() or 1
+
+
+async def hash_senhas_em_paralelo(senhas: list[str]) -> list[str]:
+    """
+    Gera os hashes bcrypt de várias senhas usando um pool de processos, para
+    importações em lote. Mantém a ordem da lista recebida. O pool vive só
+    durante a chamada: nenhum processo fica parado no worker da API.
+    """
+    if not senhas:
+        return []
+
+    tamanho = max(1, -(-len(senhas) // _PROCESSOS_HASH))  # divisão arredondada para cima
+    lotes = [senhas[i : i + tamanho] for i in range(0, len(senhas), tamanho)]
+
+    loop = asyncio.get_running_loop()
+    pool = ProcessPoolExecutor(max_workers=len(lotes))
+    try:
+        resultados = await asyncio.gather(
+            *(loop.run_in_executor(pool, _hash_lote, lote) for lote in lotes)
+        )
+    finally:
+        # shutdown espera os processos terminarem: fora do event loop
+        await run_in_threadpool(pool.shutdown, cancel_futures=True)
+    return [hash_ for lote in resultados for hash_ in lote]
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -47,29 +94,40 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 async def authenticate_user(db, email: str, password: str):
     user = await get_user_by_documento(db, email)
-    if not user or not verify_password(password, user.hashed_password):
+    if not user:
+        return False
+    # bcrypt é CPU-bound: roda fora do event loop para não travar as outras rotas
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
         return False
     return user
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db),
-):
+async def verificar_token(token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Autenticação leve: só valida assinatura e validade do JWT e devolve o
+    payload, sem ir ao banco. Para rotas de dados não sensíveis (ex: status).
+    """
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
         )
-        documento: str = payload.get("sub")
-        if documento is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido"
-            )
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido"
         )
+    if payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido"
+        )
+    return payload
+
 
+async def get_current_user(
+    payload: dict = Depends(verificar_token),
+    db: AsyncSession = Depends(get_db),
+    _orcamento: None = Depends(orcamento_consultas(1)),  # busca do usuário
+):
+    documento: str = payload["sub"]
     user = await get_user_by_documento(db, documento=documento)
     if user is None:
         raise HTTPException(
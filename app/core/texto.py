@@ -0,0 +1,13 @@
+# app/core/texto.py
+import unicodedata
+
+
+def remover_acentos(texto: str) -> str:
+    """Remove acentos/diacríticos ("Açaí" -> "Acai"), como o unaccent do Postgres."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def normalizar_busca(texto: str) -> str:
+    """Forma canônica para comparações de busca: sem acentos e em minúsculas."""
+    return remover_acentos(texto).lower().strip()
@@ -0,0 +1,232 @@
+# app/crud/arquivo_notas.py
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import column, delete, func, insert, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from app.core.arquivo_notas import (
+    NOTAS_POR_BLOCO,
+    EscritorArquivo,
+    diretorio_arquivo,
+    ler_bloco,
+    ler_nota,
+)
+from app.core.config import settings
+from app.core.particoes import PAI_ARQUIVO, SCHEMA_ARQUIVO, TABELA
+from app.models.cliente import Cliente
+from app.models.nota_arquivada import NotaArquivada
+from app.models.nota_fiscal import NotaFiscal
+from app.models.status_nota import StatusNotaId
+
+# Só notas que não mudam mais (ou quase nunca) vão para o arquivo frio
+STATUS_ARQUIVAVEIS = (StatusNotaId.EMITIDA, StatusNotaId.RECUSADA, StatusNotaId.EXCLUIDA)
+
+_COLUNAS_NOTA = NotaFiscal.__table__.columns
+_COLUNAS_CLIENTE = Cliente.__table__.columns
+
+# arquivo.notas_fiscais: pai, por herança, das partições e excluídas que o
+# particionamento move para o schema de arquivo (app.core.particoes)
+_NOTAS_SCHEMA_ARQUIVO = table(
+    TABELA, *(column(c.name, c.type) for c in _COLUNAS_NOTA), schema=SCHEMA_ARQUIVO
+)
+
+
+def _registro(nota: NotaFiscal) -> dict:
+    """Linha completa da nota + cópia do cliente (a resposta de /{id} o inclui)."""
+    registro = {c.name: getattr(nota, c.key) for c in _COLUNAS_NOTA}
+    registro["cliente"] = (
+        {c.name: getattr(nota.cliente, c.key) for c in _COLUNAS_CLIENTE}
+        if nota.cliente
+        else None
+    )
+    return registro
+
+
+def _valor_coluna(coluna, valor):
+    """Converte o valor lido do JSON de volta para o tipo da coluna."""
+    tipo = coluna.type.python_type
+    if valor is None or isinstance(valor, tipo):
+        return valor
+    if tipo in (datetime, date):
+        return tipo.fromisoformat(valor)
+    return tipo(valor)
+
+
+async def arquivar_notas_antigas(
+    db: AsyncSession,
+    *,
+    idade_dias: int | None = None,
+    lote: int | None = None,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Move para o arquivo frio as notas emitidas, recusadas ou excluídas sem
+    alteração há mais de `idade_dias` dias. Cada lote grava os blocos em
+    disco (com fsync), registra o índice e apaga as notas na mesma transação.
+    """
+    idade_dias = idade_dias or settings.ARQUIVO_NOTAS_IDADE_DIAS
+    lote = lote or settings.ARQUIVO_NOTAS_LOTE
+    limite = datetime.now(timezone.utc) - timedelta(days=idade_dias)
+    condicoes = [
+        NotaFiscal.status_id.in_([int(s) for s in STATUS_ARQUIVAVEIS]),
+        func.coalesce(NotaFiscal.data_atualizacao, NotaFiscal.data_criacao) < limite,
+    ]
+
+    if dry_run:
+        total = await db.scalar(
+            select(func.count()).select_from(NotaFiscal).where(*condicoes)
+        )
+        return {"dry_run": True, "notas": total, "limite": limite.isoformat()}
+
+    nome = f"notas_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.ndjson.zz"
+    total = 0
+    ultimo_id = 0
+    with EscritorArquivo(nome) as escritor:
+        while True:
+            # 1. Próximo lote, bloqueado (notas em uso por outra transação ficam para depois)
+            notas = (
+                await db.scalars(
+                    select(NotaFiscal)
+                    .where(*condicoes, NotaFiscal.id > ultimo_id)
+                    .options(selectinload(NotaFiscal.cliente))
+                    .order_by(NotaFiscal.id)
+                    .limit(lote)
+                    .with_for_update(of=NotaFiscal, skip_locked=True)
+                )
+            ).all()
+            if not notas:
+                break
+            ultimo_id = notas[-1].id
+
+            # 2. Blocos comprimidos em disco antes de qualquer alteração no banco
+            indice = []
+            for i in range(0, len(notas), NOTAS_POR_BLOCO):
+                parte = notas[i : i + NOTAS_POR_BLOCO]
+                posicao, tamanho = await run_in_threadpool(
+                    escritor.escrever_bloco, [_registro(n) for n in parte]
+                )
+                indice.extend(
+                    {
+                        "nota_id": n.id,
+                        "usuario_id": n.usuario_id,
+                        "status_id": n.status_id,
+                        "arquivo": nome,
+                        "posicao": posicao,
+                        "tamanho": tamanho,
+                    }
+                    for n in parte
+                )
+
+            # 3. Índice + remoção da tabela quente no mesmo commit
+            await db.execute(insert(NotaArquivada), indice)
+            await db.execute(
+                delete(NotaFiscal)
+                .where(NotaFiscal.id.in_([n.id for n in notas]))
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            db.expunge_all()
+
+            total += len(notas)
+            print(f"[ARQUIVO] {total} notas arquivadas em {nome}")
+
+    if total == 0:
+        os.remove(diretorio_arquivo() / nome)
+        nome = None
+    return {"dry_run": False, "notas": total, "arquivo": nome, "limite": limite.isoformat()}
+
+
+async def _buscar_no_schema_arquivo(
+    db: AsyncSession, nota_id: int, usuario_id: uuid.UUID | None
+) -> dict | None:
+    if not await db.scalar(text("SELECT to_regclass(:pai)"), {"pai": PAI_ARQUIVO}):
+        return None  # nada foi movido para o schema de arquivo ainda
+    query = select(_NOTAS_SCHEMA_ARQUIVO).where(_NOTAS_SCHEMA_ARQUIVO.c.id == nota_id)
+    if usuario_id is not None:
+        query = query.where(_NOTAS_SCHEMA_ARQUIVO.c.usuario_id == usuario_id)
+    linha = (await db.execute(query.limit(1))).mappings().first()
+    if linha is None:
+        return None
+
+    # Mesmo formato do arquivo frio: a nota com a cópia do cliente
+    registro = dict(linha)
+    cliente = await db.get(Cliente, registro["cliente_id"]) if registro["cliente_id"] else None
+    registro["cliente"] = (
+        {c.name: getattr(cliente, c.key) for c in _COLUNAS_CLIENTE} if cliente else None
+    )
+    return registro
+
+
+async def buscar_nota_arquivada(
+    db: AsyncSession, nota_id: int, usuario_id: uuid.UUID | None = None
+) -> dict | None:
+    """
+    Lê uma nota que saiu da tabela quente: primeiro nas tabelas do schema
+    de arquivo (partições antigas e excluídas), depois no arquivo frio pelo
+    índice. None se não estiver em nenhum dos dois.
+    """
+    registro = await _buscar_no_schema_arquivo(db, nota_id, usuario_id)
+    if registro is not None:
+        return registro
+
+    query = select(NotaArquivada).where(NotaArquivada.nota_id == nota_id)
+    if usuario_id is not None:
+        query = query.where(NotaArquivada.usuario_id == usuario_id)
+    entrada = (await db.scalars(query)).first()
+    if entrada is None:
+        return None
+
+    try:
+        return await run_in_threadpool(
+            ler_nota, entrada.arquivo, entrada.posicao, entrada.tamanho, nota_id
+        )
+    except OSError as e:
+        print(f"[ARQUIVO] Falha ao ler a nota {nota_id} de {entrada.arquivo}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Nota arquivada indisponível no momento.",
+        )
+
+
+async def restaurar_notas(db: AsyncSession, nota_ids: list[int]) -> dict:
+    """
+    Devolve notas do arquivo frio para notas_fiscais (mesmo id) e remove as
+    entradas do índice. Os blocos continuam no arquivo, só deixam de ser
+    apontados.
+    """
+    entradas = (
+        await db.scalars(select(NotaArquivada).where(NotaArquivada.nota_id.in_(nota_ids)))
+    ).all()
+
+    # Cada bloco é lido uma vez, mesmo com várias notas dele
+    por_bloco: dict[tuple, set[int]] = {}
+    for entrada in entradas:
+        chave = (entrada.arquivo, entrada.posicao, entrada.tamanho)
+        por_bloco.setdefault(chave, set()).add(entrada.nota_id)
+
+    linhas = []
+    for (arquivo, posicao, tamanho), ids in por_bloco.items():
+        for registro in await run_in_threadpool(ler_bloco, arquivo, posicao, tamanho):
+            if registro["id"] in ids:
+                linhas.append(
+                    {c.name: _valor_coluna(c, registro.get(c.name)) for c in _COLUNAS_NOTA}
+                )
+
+    if linhas:
+        await db.execute(insert(NotaFiscal.__table__), linhas)
+        await db.execute(
+            delete(NotaArquivada).where(
+                NotaArquivada.nota_id.in_([linha["id"] for linha in linhas])
+            )
+        )
+        await db.commit()
+
+    restauradas = {linha["id"] for linha in linhas}
+    return {
+        "restauradas": sorted(restauradas),
+        "nao_encontradas": [i for i in nota_ids if i not in restauradas],
+    }
@@ -8,6 +8,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import insert, update, delete
 from app.models import Atividade
 import uuid
 
@@ -17,3 +18,51 @@ async def get_atividades_by_id_usuario(db: AsyncSession, usuario_id: uuid.UUID):
         select(Atividade).where(Atividade.usuario_id == usuario_id)
     )
     return result.scalars().all()
+
+
+async def sincronizar_atividades(
+    db: AsyncSession,
+    usuario_id: uuid.UUID,
+    existentes: list[Atividade],
+    novas: list[dict],
+) -> bool:
+    """
+    Compara as atividades recebidas com as existentes (chave: cod_cnae) e
+    aplica só a diferença: um INSERT multi-linha para as novas, um UPDATE em
+    lote para descrições alteradas e um DELETE para as removidas. Não faz
+    commit. Retorna True se algo foi alterado.
+    """
+    desejadas = {str(atv["cod_cnae"]): atv["desc_cnae"] for atv in novas}
+
+    atuais: dict[str, Atividade] = {}
+    remover = []
+    for atividade in existentes:
+        if atividade.cod_cnae in atuais:
+            remover.append(atividade.id)  # duplicada de gravações antigas
+        else:
+            atuais[atividade.cod_cnae] = atividade
+
+    inserir = [
+        {"usuario_id": usuario_id, "cod_cnae": cod, "desc_cnae": desc}
+        for cod, desc in desejadas.items()
+        if cod not in atuais
+    ]
+    alterar = [
+        {"id": atividade.id, "desc_cnae": desejadas[cod]}
+        for cod, atividade in atuais.items()
+        if cod in desejadas and atividade.desc_cnae != desejadas[cod]
+    ]
+    remover += [atividade.id for cod, atividade in atuais.items() if cod not in desejadas]
+
+    if inserir:
+        await db.execute(insert(Atividade).values(inserir))
+    if alterar:
+        await db.execute(update(Atividade), alterar)
+    if remover:
+        await db.execute(
+            delete(Atividade)
+            .where(Atividade.id.in_(remover))
+            .execution_options(synchronize_session=False)
+        )
+
+    return bool(inserir or alterar or remover)
@@ -4,6 +4,18 @@ from app.models import *
 from app.schemas.cliente import ClienteCreate
 import uuid
 from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import and_, func, literal, literal_column, or_, tuple_, union_all
+from app.core.texto import normalizar_busca
+from app.core.documentos import normalizar_cpf_cnpj, normalizar_lote, somente_digitos
+from app.crud.paginacao import (
+    codificar_cursor,
+    decodificar_cursor,
+    escapar_like,
+    padrao_prefixo,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.crud.escrita import executar_retornando
 
 
 async def get_cliente_by_id(db: AsyncSession, id: int):
@@ -22,15 +34,46 @@ async def get_cliente_by_id_usuario(db: AsyncSession, id: int, current_user: str
     return result.scalar_one_or_none()
 
 
+def dados_documento(valor: str | None) -> dict:
+    """
+    Colunas do documento para qualquer escrita em clientes: cpf_cnpj e
+    cpf_cnpj_digitos gravados iguais, só com dígitos, depois de validados
+    por normalizar_cpf_cnpj (400 se inválido). Vazio fica nulo.
+    """
+    if not valor:
+        return {"cpf_cnpj": None, "cpf_cnpj_digitos": None}
+    try:
+        documento = normalizar_cpf_cnpj(valor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"cpf_cnpj": documento, "cpf_cnpj_digitos": documento}
+
+
+def _mesmo_documento(digitos: str):
+    """
+    Condição de busca pelo documento. Registros antigos ainda sem
+    cpf_cnpj_digitos (backfill pendente) são comparados pelo cpf_cnpj limpo.
+    """
+    return or_(
+        Cliente.cpf_cnpj_digitos == digitos,
+        and_(
+            Cliente.cpf_cnpj_digitos.is_(None),
+            func.regexp_replace(Cliente.cpf_cnpj, r"\D", "", "g") == digitos,
+        ),
+    )
+
+
 async def get_cliente_by_cpf_cnpj(db: AsyncSession, cpf_cnpj: str, current_user: str):
-    print(f"Buscando cliente com cpf_cnpj={cpf_cnpj}, usuario_id={current_user}")
     query = (
         select(Cliente)
         .where(Cliente.usuario_id == current_user)
-        .where(Cliente.cpf_cnpj == cpf_cnpj)
+        .where(_mesmo_documento(somente_digitos(cpf_cnpj)))
+        # Sem o índice único pode haver mais de um; o já normalizado vence
+        .order_by(Cliente.cpf_cnpj_digitos.is_(None), Cliente.id)
+        .limit(1)
     )
     result = await db.execute(query)
-    return result.scalar_one_or_none()
+    return result.scalars().first()
 
 
 async def get_clientes_by_usuario_id(db: AsyncSession, usuario_id: int):
@@ -45,26 +88,81 @@ async def create_cliente(
     cliente_data: dict,
     usuario_id: uuid.UUID,
 ) -> Cliente:
-    
-    # Verifica se já existe
-    cliente_existente = await get_cliente_by_cpf_cnpj(
-        db, cliente_data["cpf_cnpj"], usuario_id
+    # Cria o cliente num único INSERT ... ON CONFLICT DO NOTHING RETURNING;
+    # sem linha de volta, o documento já estava cadastrado para o usuário
+    cliente_data["usuario_id"] = usuario_id
+    cliente_data.update(dados_documento(cliente_data.get("cpf_cnpj")))
+    stmt = (
+        pg_insert(Cliente)
+        .values(**cliente_data)
+        .on_conflict_do_nothing(
+            index_elements=[Cliente.usuario_id, Cliente.cpf_cnpj_digitos]
+        )
     )
-    if cliente_existente:
+    db_cliente = await executar_retornando(db, Cliente, stmt)
+
+    if db_cliente is None:
+        await db.rollback()
+        cliente_existente = await get_cliente_by_cpf_cnpj(
+            db, cliente_data["cpf_cnpj"], usuario_id
+        )
         raise HTTPException(
             status_code=400,
             detail=f"Já existe um cliente com esse CPF/CNPJ. ({cliente_existente.razao_social} - {cliente_existente.cpf_cnpj})",
         )
 
-    # Cria novo cliente
-    cliente_data["usuario_id"] = usuario_id
-    db_cliente = Cliente(**cliente_data)
-    db.add(db_cliente)
     await db.commit()
-    await db.refresh(db_cliente)
     return db_cliente
 
 
+async def obter_ou_criar_cliente_id(
+    db: AsyncSession, cliente_data: dict, usuario_id: uuid.UUID
+) -> int:
+    """
+    Retorna o id do cliente do usuário com esse documento, criando-o se não
+    existir, em um único statement (INSERT ... ON CONFLICT DO NOTHING unido
+    ao SELECT do existente). Cliente existente não é alterado. Sem commit.
+    """
+    dados = {
+        **cliente_data,
+        "usuario_id": usuario_id,
+        **dados_documento(cliente_data["cpf_cnpj"]),
+    }
+    documento = dados["cpf_cnpj_digitos"]
+
+    existente = (
+        select(Cliente.id)
+        .where(Cliente.usuario_id == usuario_id, _mesmo_documento(documento))
+        .order_by(Cliente.cpf_cnpj_digitos.is_(None), Cliente.id)
+        .limit(1)
+    )
+    # O ON CONFLICT não enxerga registros antigos sem cpf_cnpj_digitos:
+    # o INSERT só acontece se nenhum cliente com o documento existir
+    colunas = Cliente.__table__.c
+    novo = (
+        pg_insert(Cliente)
+        .from_select(
+            list(dados),
+            select(*(literal(v, colunas[k].type) for k, v in dados.items())).where(
+                ~existente.exists()
+            ),
+        )
+        .on_conflict_do_nothing(
+            index_elements=[Cliente.usuario_id, Cliente.cpf_cnpj_digitos]
+        )
+        .returning(Cliente.id)
+        .cte("novo")
+    )
+    cliente_id = await db.scalar(
+        union_all(select(novo.c.id), existente.subquery().select()).limit(1)
+    )
+
+    if cliente_id is None:
+        # Inserido por outra transação concorrente depois do nosso snapshot
+        cliente_id = await db.scalar(existente)
+    return cliente_id
+
+
 async def delete_cliente(db: AsyncSession, id: int, current_user: str):
     query = (
         select(Cliente)
@@ -86,6 +184,8 @@ async def edita_cliente(db: AsyncSession, id: int, cliente_data: dict):
     cliente = result.scalar_one_or_none()
     if not cliente:
         return None
+    if "cpf_cnpj" in cliente_data:
+        cliente_data = {**cliente_data, **dados_documento(cliente_data["cpf_cnpj"])}
     for key, value in cliente_data.items():
         setattr(cliente, key, value)
     await db.commit()
@@ -96,3 +196,144 @@ async def edita_cliente(db: AsyncSession, id: int, cliente_data: dict):
 async def get_todos_os_clientes(db: AsyncSession):
     result = await db.execute(select(Cliente))
     return result.scalars().all()
+
+
+# Colunas que a importação pode sobrescrever em um cliente já existente
+_COLUNAS_IMPORTACAO = [
+    c.name
+    for c in Cliente.__table__.columns
+    if c.name
+    not in {"id", "usuario_id", "cpf_cnpj", "cpf_cnpj_digitos", "created_at", "updated_at"}
+]
+
+
+async def importar_clientes(
+    db: AsyncSession, registros: list[dict], usuario_id: uuid.UUID
+) -> dict:
+    """
+    Importação em lote dos clientes (tomadores) de um usuário. Valida e
+    normaliza o cpf_cnpj (normalizar_lote, a versão em lote do
+    dados_documento: só dígitos nas duas colunas), deduplica dentro do arquivo (a última linha vence)
+    e grava em lotes com INSERT ... ON CONFLICT (usuario_id, cpf_cnpj_digitos)
+    DO UPDATE.
+    Campos vazios no arquivo não apagam os valores já cadastrados.
+    """
+    rejeitados = []
+    por_documento: dict[str, tuple[int, dict]] = {}
+    documentos = normalizar_lote(r.get("cpf_cnpj") for r in registros)
+
+    for numero, (registro, documento) in enumerate(zip(registros, documentos), start=1):
+        try:
+            cliente = ClienteCreate.model_validate(registro)
+        except ValidationError as e:
+            rejeitados.append({"linha": numero, "motivo": str(e.errors()[0]["msg"])})
+            continue
+
+        if documento is None:
+            rejeitados.append({"linha": numero, "motivo": "CPF ou CNPJ inválido"})
+            continue
+
+        if documento in por_documento:
+            linha_anterior = por_documento[documento][0]
+            rejeitados.append(
+                {
+                    "linha": linha_anterior,
+                    "motivo": f"Documento repetido no arquivo (substituída pela linha {numero})",
+                }
+            )
+
+        dados = cliente.model_dump()
+        dados.update(
+            cpf_cnpj=documento, cpf_cnpj_digitos=documento, usuario_id=usuario_id
+        )
+        por_documento[documento] = (numero, dados)
+
+    criados = atualizados = 0
+    linhas = [dados for _, dados in por_documento.values()]
+    for i in range(0, len(linhas), 500):
+        stmt = pg_insert(Cliente).values(linhas[i : i + 500])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Cliente.usuario_id, Cliente.cpf_cnpj_digitos],
+            set_={
+                **{
+                    coluna: func.coalesce(
+                        getattr(stmt.excluded, coluna), getattr(Cliente, coluna)
+                    )
+                    for coluna in _COLUNAS_IMPORTACAO
+                },
+                "updated_at": func.now(),
+            },
+        ).returning(literal_column("xmax = 0").label("inserido"))
+
+        result = await db.execute(stmt)
+        for inserido in result.scalars():
+            if inserido:
+                criados += 1
+            else:
+                atualizados += 1
+
+    await db.commit()
+
+    return {
+        "criados": criados,
+        "atualizados": atualizados,
+        "rejeitados": len(rejeitados),
+        "erros": sorted(rejeitados, key=lambda r: r["linha"]),
+    }
+
+
+async def buscar_clientes(
+    db: AsyncSession,
+    termo: str,
+    usuario_id: uuid.UUID | None,
+    *,
+    cursor: str | None = None,
+    limite: int = 20,
+):
+    """
+    Busca para o autocomplete de tomadores, paginada por cursor (razao_social,
+    id). Termos numéricos buscam por prefixo do documento; os demais buscam
+    trechos da razão social sem diferenciar acentos e maiúsculas (índice
+    trigram; termos com menos de 3 letras usam prefixo). usuario_id=None
+    busca em todos os clientes (admin). Retorna (clientes, proximo_cursor).
+    """
+    query = select(Cliente).order_by(Cliente.razao_social, Cliente.id).limit(limite + 1)
+
+    if usuario_id is not None:
+        query = query.where(Cliente.usuario_id == usuario_id)
+
+    termo = termo.strip()
+    if all(c.isdigit() or c in ".-/ " for c in termo):
+        digitos = somente_digitos(termo)
+        if not digitos:
+            # Só separadores (ou espaços): o prefixo vazio casaria com todos
+            return [], None
+        query = query.where(
+            Cliente.cpf_cnpj_digitos.like(padrao_prefixo(digitos), escape="\\")
+        )
+    else:
+        trecho = normalizar_busca(termo)
+        razao_normalizada = func.f_unaccent(func.lower(Cliente.razao_social))
+        if len(trecho) < 3:
+            # Trigramas precisam de 3 caracteres: termos curtos buscam por prefixo
+            padrao = padrao_prefixo(trecho)
+        else:
+            padrao = f"%{escapar_like(trecho)}%"
+        query = query.where(razao_normalizada.like(padrao, escape="\\"))
+
+    if cursor:
+        razao_social, ultimo_id = decodificar_cursor(cursor, 2)
+        if not ultimo_id.isdigit():
+            raise HTTPException(status_code=400, detail="Cursor inválido.")
+        query = query.where(
+            tuple_(Cliente.razao_social, Cliente.id) > tuple_(razao_social, int(ultimo_id))
+        )
+
+    clientes = (await db.scalars(query)).all()
+
+    proximo_cursor = None
+    if len(clientes) > limite:
+        clientes = clientes[:limite]
+        proximo_cursor = codificar_cursor(clientes[-1].razao_social, clientes[-1].id)
+
+    return clientes, proximo_cursor
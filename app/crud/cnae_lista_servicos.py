@@ -1,7 +1,9 @@
 # app/crud/cnae_lista_servicos.py
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.cnae_lista_servicos import CnaeListaAtividades
+from app.core.catalogo_cnae import catalogo_cnae
 import uuid
 from fastapi import APIRouter, Depends, HTTPException, status
 
@@ -25,9 +27,157 @@ async def get_cnae_atividade(db: AsyncSession, current_user: User):
 
 
 async def get_codigo_servico_by_cnae(db: AsyncSession, cnae: str):
+    # Consulta em memória; o catálogo é carregado na subida da aplicação
+    await catalogo_cnae.garantir_carregado(db)
+    return catalogo_cnae.codigo_servico(cnae)
+
+
+_COLUNAS_CATALOGO = (
+    "cnae_numerico",
+    "cnae_descricao",
+    "codigo_lista_servico",
+    "lista_servico_descricao",
+)
+
+# Aplica a diferença entre a tabela e a área de staging num único comando.
+# As CTEs enxergam o mesmo snapshot e mexem em linhas disjuntas.
+_SQL_MESCLAR_CATALOGO = """
+WITH removidos AS (
+    DELETE FROM cnae_lista_servicos c
+    WHERE NOT EXISTS (
+        SELECT 1 FROM cnae_staging s
+        WHERE s.cnae_numerico = c.cnae_numerico
+          AND s.codigo_lista_servico = c.codigo_lista_servico
+    )
+    -- Duplicatas antigas (editadas à mão) ficam só com o menor id
+    OR EXISTS (
+        SELECT 1 FROM cnae_lista_servicos d
+        WHERE d.cnae_numerico = c.cnae_numerico
+          AND d.codigo_lista_servico = c.codigo_lista_servico
+          AND d.id < c.id
+    )
+    RETURNING 1
+),
+atualizados AS (
+    UPDATE cnae_lista_servicos c
+    SET cnae_descricao = s.cnae_descricao,
+        lista_servico_descricao = s.lista_servico_descricao
+    FROM cnae_staging s
+    WHERE s.cnae_numerico = c.cnae_numerico
+      AND s.codigo_lista_servico = c.codigo_lista_servico
+      AND (c.cnae_descricao, c.lista_servico_descricao)
+          IS DISTINCT FROM (s.cnae_descricao, s.lista_servico_descricao)
+      AND NOT EXISTS (
+        SELECT 1 FROM cnae_lista_servicos d
+        WHERE d.cnae_numerico = c.cnae_numerico
+          AND d.codigo_lista_servico = c.codigo_lista_servico
+          AND d.id < c.id
+    )
+    RETURNING 1
+),
+inseridos AS (
+    INSERT INTO cnae_lista_servicos
+        (cnae_numerico, cnae_descricao, codigo_lista_servico, lista_servico_descricao)
+    SELECT s.cnae_numerico, s.cnae_descricao, s.codigo_lista_servico, s.lista_servico_descricao
+    FROM cnae_staging s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM cnae_lista_servicos c
+        WHERE c.cnae_numerico = s.cnae_numerico
+          AND c.codigo_lista_servico = s.codigo_lista_servico
+    )
+    ORDER BY s.cnae_numerico, s.codigo_lista_servico
+    RETURNING 1
+)
+SELECT
+    (SELECT count(*) FROM inseridos),
+    (SELECT count(*) FROM atualizados),
+    (SELECT count(*) FROM removidos)
+"""
+
+
+async def _diferenca_catalogo(db: AsyncSession, linhas: list[tuple]) -> dict:
+    """Compara o arquivo com a tabela atual sem escrever nada."""
     result = await db.execute(
-        select(CnaeListaAtividades.codigo_lista_servico)
-        .where(CnaeListaAtividades.cnae_numerico == cnae)
-        .limit(1) 
+        select(
+            CnaeListaAtividades.cnae_numerico,
+            CnaeListaAtividades.codigo_lista_servico,
+            CnaeListaAtividades.cnae_descricao,
+            CnaeListaAtividades.lista_servico_descricao,
+        ).order_by(CnaeListaAtividades.id)
+    )
+    atuais, duplicadas = {}, 0
+    for cnae, item, descricao, item_descricao in result:
+        if (cnae, item) in atuais:
+            duplicadas += 1
+        else:
+            atuais[(cnae, item)] = (descricao, item_descricao)
+
+    inserir = atualizar = 0
+    novas = set()
+    for cnae, descricao, item, item_descricao in linhas:
+        novas.add((cnae, item))
+        atual = atuais.get((cnae, item))
+        if atual is None:
+            inserir += 1
+        elif atual != (descricao, item_descricao):
+            atualizar += 1
+
+    remover = duplicadas + sum(1 for chave in atuais if chave not in novas)
+    return {"inseridos": inserir, "atualizados": atualizar, "removidos": remover}
+
+
+async def importar_catalogo_cnae(
+    db: AsyncSession, linhas: list[tuple], *, dry_run: bool = False
+) -> dict:
+    """
+    Substitui o conteúdo de cnae_lista_servicos pelas linhas do arquivo oficial
+    (ver ler_catalogo_cnae_csv), alterando só o que mudou: COPY para uma
+    tabela temporária e um único comando de mescla. Quando há alteração, o
+    trigger da tabela publica nova versão e os workers recarregam o catálogo.
+    """
+    # 1. Calcula a diferença; nada a fazer não gera escrita nem nova versão
+    diferenca = await _diferenca_catalogo(db, linhas)
+    if dry_run or not any(diferenca.values()):
+        await db.rollback()
+        return {"total": len(linhas), "aplicado": False, **diferenca}
+
+    # 2. COPY das linhas para a staging (apagada no fim da transação)
+    conexao = await db.connection()
+    await conexao.execute(
+        text(
+            """
+            CREATE TEMP TABLE cnae_staging (
+                cnae_numerico varchar NOT NULL,
+                cnae_descricao varchar NOT NULL,
+                codigo_lista_servico varchar NOT NULL,
+                lista_servico_descricao varchar NOT NULL
+            ) ON COMMIT DROP
+            """
+        )
+    )
+    bruta = await conexao.get_raw_connection()
+    await bruta.driver_connection.copy_records_to_table(
+        "cnae_staging", records=linhas, columns=list(_COLUNAS_CATALOGO)
+    )
+    await conexao.execute(text("ANALYZE cnae_staging"))
+
+    # 3. Mescla set-based e commit
+    inseridos, atualizados, removidos = (
+        await conexao.execute(text(_SQL_MESCLAR_CATALOGO))
+    ).one()
+    await db.commit()
+
+    # 4. Recarrega este processo na hora; os demais seguem a versão publicada
+    await catalogo_cnae.recarregar(db)
+    print(
+        f"[CNAE] Catálogo importado: {inseridos} inseridos, {atualizados} atualizados, "
+        f"{removidos} removidos"
     )
-    return result.scalar()
\ No newline at end of file
+    return {
+        "total": len(linhas),
+        "aplicado": True,
+        "inseridos": inseridos,
+        "atualizados": atualizados,
+        "removidos": removidos,
+        "versao": catalogo_cnae.versao,
+    }
@@ -0,0 +1,61 @@
+# app/crud/escrita.py
+"""
+Escritas com RETURNING: o INSERT/UPDATE devolve a linha completa (inclusive
+valores gerados pelo banco, como id, data_criacao e data_atualizacao) no
+mesmo statement, sem o SELECT do db.refresh() nem recargas posteriores.
+"""
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import lazyload, selectinload
+
+
+def _select_retorno(modelo, stmt, carregar):
+    # Só os relacionamentos pedidos são carregados (um SELECT IN cada); os
+    # demais, inclusive os lazy="selectin" do modelo, ficam sem consulta
+    opcoes = [selectinload(rel) for rel in carregar]
+    opcoes.append(lazyload("*"))
+    return (
+        select(modelo)
+        .from_statement(stmt)
+        .options(*opcoes)
+        .execution_options(populate_existing=True)
+    )
+
+
+async def inserir_retornando(db: AsyncSession, modelo, valores: dict, *, carregar=()):
+    """INSERT ... RETURNING da linha inserida como objeto do modelo. Sem commit."""
+    stmt = insert(modelo).values(**valores).returning(modelo)
+    result = await db.execute(_select_retorno(modelo, stmt, carregar))
+    return result.scalar_one()
+
+
+async def atualizar_retornando(
+    db: AsyncSession, modelo, criterios: list, valores: dict, *, carregar=(), ctes=()
+):
+    """
+    UPDATE ... WHERE <criterios> RETURNING da linha atualizada, ou None se
+    nenhuma linha atendeu aos critérios. Os onupdate do modelo (ex:
+    data_atualizacao) são aplicados. `ctes` são CTEs de escrita executadas
+    no mesmo statement (ex: registro de histórico). Sem commit.
+    """
+    stmt = update(modelo).where(*criterios).values(**valores).returning(modelo)
+    if ctes:
+        stmt = stmt.add_cte(*ctes)
+    result = await db.execute(_select_retorno(modelo, stmt, carregar))
+    return result.scalar_one_or_none()
+
+
+async def executar_retornando(db: AsyncSession, modelo, stmt, *, carregar=()):
+    """Versão genérica, para statements já montados (ex: INSERT ... ON CONFLICT)."""
+    result = await db.execute(_select_retorno(modelo, stmt.returning(modelo), carregar))
+    return result.scalar_one_or_none()
+
+
+async def ler_retornando(db: AsyncSession, modelo, stmt, *, carregar=()):
+    """
+    Para statements cujo resultado já são as colunas do modelo (ex: SELECT
+    sobre uma CTE de UPDATE ... RETURNING). Devolve o objeto ou None.
+    """
+    result = await db.execute(_select_retorno(modelo, stmt, carregar))
+    return result.scalar_one_or_none()
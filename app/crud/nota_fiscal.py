@@ -6,33 +6,127 @@ from app.models import *
 from sqlalchemy.orm import selectinload
 from sqlalchemy.sql import func
 from app.core.config import settings
+from app.core.metricas import medir, nfse_soap_segundos
 import xml.etree.ElementTree as ET
-import re
 import httpx
 import json
-from datetime import datetime, date
+import uuid
+from datetime import datetime, date, time, timedelta
 import pytz
 from typing import Optional
 
 from app.schemas.nota_fiscal import NotaFiscalCreate
 from app.schemas.usuario import User
 from app.models import NotaFiscal, Cliente, Usuario, Atividade  # 👈 adicione Atividade
+from app.models.status_nota import StatusNotaId
 from app.crud.cnae_lista_servicos import get_codigo_servico_by_cnae
+from app.crud.cliente import dados_documento, obter_ou_criar_cliente_id
+from app.core.documentos import formatar_cpf_cnpj
+from app.crud.escrita import atualizar_retornando, inserir_retornando
+from app.crud.transicoes_nota import transicionar_nota, transicionar_notas_em_lote
+from app.crud.paginacao import codificar_cursor, decodificar_cursor
+from app.crud.arquivo_notas import buscar_nota_arquivada
+from app.models.pendencias_usuario import PendenciasUsuario
+from sqlalchemy import tuple_, update
+from sqlalchemy.orm.attributes import set_committed_value
 
 
 async def create_nota_fiscal(db: AsyncSession, nota_data: dict):
-    db_nota = NotaFiscal(**nota_data)
-    db.add(db_nota)
+    db_nota = await inserir_retornando(db, NotaFiscal, nota_data)
     await db.commit()
-    await db.refresh(db_nota)
     return db_nota
 
 
-async def get_notas_by_usuario(db: AsyncSession, usuario_id: str):
+_CAMPOS_CLIENTE_NOTA = {
+    "razao_social",
+    "cpf_cnpj",
+    "email",
+    "telefone",
+    "pais",
+    "uf",
+    "cidade",
+    "cep",
+    "logradouro",
+    "numero",
+    "complemento",
+    "bairro",
+}
+
+
+async def criar_nota_fiscal_com_cliente(
+    db: AsyncSession, nota_nova: NotaFiscalCreate, usuario: User
+) -> NotaFiscal:
+    """
+    Caminho de criação de nota em uma única transação: código da lista de
+    serviços vindo da memória, upsert do cliente com RETURNING do id e
+    INSERT ... RETURNING da nota, com um único commit no final.
+    """
+    codigo_lista_servico = await get_codigo_servico_by_cnae(db, nota_nova.cod_cnae)
+
+    if codigo_lista_servico is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Não foi encontrado código da Lista de Serviços para o CNAE {nota_nova.cod_cnae}.",
+        )
+
+    cliente_id = await obter_ou_criar_cliente_id(
+        db, nota_nova.model_dump(include=_CAMPOS_CLIENTE_NOTA), usuario.id
+    )
+
+    nota = await inserir_retornando(
+        db,
+        NotaFiscal,
+        {
+            "usuario_id": usuario.id,
+            "cliente_id": cliente_id,
+            "cod_cnae": nota_nova.cod_cnae,
+            "valor_total": nota_nova.valor_total,
+            "descricao": nota_nova.descricao,
+            "status_id": StatusNotaId.PENDENTE,
+            "aliquota": usuario.aliquota,
+            "codigo_lista_servico": codigo_lista_servico,
+        },
+    )
+    await db.commit()
+    return nota
+
+
+def _filtro_periodo(desde: date | None, ate: date | None) -> list:
+    """
+    Condições em data_criacao para um intervalo de dias (inclusivo). Com
+    limites constantes o Postgres lê só as partições mensais do intervalo.
+    """
+    if desde and ate and desde > ate:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A data inicial não pode ser posterior à data final.",
+        )
+    fuso = pytz.timezone("America/Fortaleza")
+    condicoes = []
+    if desde:
+        condicoes.append(
+            NotaFiscal.data_criacao >= fuso.localize(datetime.combine(desde, time.min))
+        )
+    if ate:
+        condicoes.append(
+            NotaFiscal.data_criacao
+            < fuso.localize(datetime.combine(ate + timedelta(days=1), time.min))
+        )
+    return condicoes
+
+
+async def get_notas_by_usuario(
+    db: AsyncSession,
+    usuario_id: str,
+    *,
+    desde: date | None = None,
+    ate: date | None = None,
+):
     result = await db.execute(
         select(NotaFiscal)
         .where(NotaFiscal.usuario_id == usuario_id)
-        .where(NotaFiscal.status_id != 5)
+        .where(NotaFiscal.status_id != StatusNotaId.EXCLUIDA)
+        .where(*_filtro_periodo(desde, ate))
         .options(
             selectinload(NotaFiscal.status),
             selectinload(NotaFiscal.usuario).selectinload(Usuario.atividades),
@@ -64,15 +158,30 @@ async def get_nota_usuario_by_id(db: AsyncSession, usuario_id: str, nota_id: int
             selectinload(NotaFiscal.usuario).selectinload(Usuario.atividades),
         )
     )
-    return result.scalar_one_or_none()
+    nota = result.scalar_one_or_none()
+    if nota is not None:
+        return nota
 
+    # Fora da tabela quente: pode ter ido para o schema de arquivo ou o arquivo frio
+    return await buscar_nota_arquivada(db, nota_id, usuario_id)
 
-async def get_todas_notas(db: AsyncSession, current_user: User):
+
+async def get_todas_notas(
+    db: AsyncSession,
+    current_user: User,
+    *,
+    desde: date | None = None,
+    ate: date | None = None,
+):
     # Carrega cliente + usuario + atividades do usuário em todos os casos
-    query = select(NotaFiscal).options(
-        selectinload(NotaFiscal.cliente),
-        selectinload(NotaFiscal.usuario).selectinload(Usuario.atividades),
-        selectinload(NotaFiscal.status),
+    query = (
+        select(NotaFiscal)
+        .where(*_filtro_periodo(desde, ate))
+        .options(
+            selectinload(NotaFiscal.cliente),
+            selectinload(NotaFiscal.usuario).selectinload(Usuario.atividades),
+            selectinload(NotaFiscal.status),
+        )
     )
 
     if current_user.role_id != 1:
@@ -82,14 +191,104 @@ async def get_todas_notas(db: AsyncSession, current_user: User):
     result = await db.execute(query)
     notas = result.scalars().all()
 
-    # Agora podemos acessar atividades com segurança
+    _preencher_desc_cnae(notas)
+    return notas
+
+
+def _preencher_desc_cnae(notas):
+    # Atividades já carregadas via selectinload: acesso seguro fora do async
     for nota in notas:
         atividade = next(
             (a for a in nota.usuario.atividades if a.cod_cnae == nota.cod_cnae), None
         )
         nota.desc_cnae = atividade.desc_cnae if atividade else None
 
-    return notas
+
+async def get_fila_pendentes(
+    db: AsyncSession,
+    *,
+    cursor: str | None = None,
+    limit: int = 100,
+    usuario_id: uuid.UUID | None = None,
+):
+    """
+    Fila de revisão: notas pendentes da mais antiga para a mais nova, paginada
+    por cursor (keyset em data_criacao, id). Lê só os índices parciais de
+    pendentes. Retorna (notas, proximo_cursor).
+    """
+    query = (
+        select(NotaFiscal)
+        .where(NotaFiscal.status_id == StatusNotaId.PENDENTE)
+        .options(
+            selectinload(NotaFiscal.cliente),
+            selectinload(NotaFiscal.usuario).selectinload(Usuario.atividades),
+        )
+        .order_by(NotaFiscal.data_criacao, NotaFiscal.id)
+        .limit(limit + 1)
+    )
+    if usuario_id is not None:
+        query = query.where(NotaFiscal.usuario_id == usuario_id)
+    if cursor:
+        data_criacao, ultimo_id = decodificar_cursor(cursor, 2)
+        try:
+            data_criacao = datetime.fromisoformat(data_criacao)
+            ultimo_id = int(ultimo_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido."
+            )
+        query = query.where(
+            tuple_(NotaFiscal.data_criacao, NotaFiscal.id) > tuple_(data_criacao, ultimo_id)
+        )
+
+    notas = (await db.scalars(query)).all()
+
+    proximo_cursor = None
+    if len(notas) > limit:
+        notas = notas[:limit]
+        proximo_cursor = codificar_cursor(notas[-1].data_criacao.isoformat(), notas[-1].id)
+
+    _preencher_desc_cnae(notas)
+    return notas, proximo_cursor
+
+
+async def contar_pendentes(db: AsyncSession, usuario_id: uuid.UUID | None = None) -> int:
+    """Total de pendentes lido da contagem mantida por trigger (sem varrer notas)."""
+    query = select(func.coalesce(func.sum(PendenciasUsuario.pendentes), 0))
+    if usuario_id is not None:
+        query = query.where(PendenciasUsuario.usuario_id == usuario_id)
+    return int(await db.scalar(query))
+
+
+async def get_pendencias_por_usuario(db: AsyncSession):
+    """
+    Fila agrupada por usuário: quantidade de pendentes (contagem mantida por
+    trigger) e a data da pendente mais antiga, da espera mais longa para a
+    mais curta.
+    """
+    mais_antiga = (
+        select(func.min(NotaFiscal.data_criacao))
+        .where(
+            NotaFiscal.usuario_id == PendenciasUsuario.usuario_id,
+            NotaFiscal.status_id == StatusNotaId.PENDENTE,
+        )
+        .correlate(PendenciasUsuario)
+        .scalar_subquery()
+        .label("mais_antiga")
+    )
+    query = (
+        select(
+            PendenciasUsuario.usuario_id,
+            Usuario.razao_social,
+            PendenciasUsuario.pendentes,
+            mais_antiga,
+        )
+        .join(Usuario, Usuario.id == PendenciasUsuario.usuario_id)
+        .where(PendenciasUsuario.pendentes > 0)
+        .order_by(mais_antiga.asc().nulls_last(), PendenciasUsuario.usuario_id)
+    )
+    result = await db.execute(query)
+    return [dict(linha._mapping) for linha in result]
 
 
 async def get_notas_fiscal_by_id(db: AsyncSession, nota_id: int):
@@ -98,22 +297,17 @@ async def get_notas_fiscal_by_id(db: AsyncSession, nota_id: int):
 
 
 async def insert_id_nota_api(db: AsyncSession, nota_id: int, id_api: int):
-    result = await db.execute(select(NotaFiscal).where(NotaFiscal.id == nota_id))
-    nota = result.scalar_one_or_none()
-    if nota:
-        nota.id_api = id_api
-        await db.commit()
-        await db.refresh(nota)
+    nota = await atualizar_retornando(
+        db, NotaFiscal, [NotaFiscal.id == nota_id], {"id_api": str(id_api)}
+    )
+    await db.commit()
     return nota
 
 
 async def update_status_nota(db: AsyncSession, nota_id: int, novo_status_id: int):
-    result = await db.execute(select(NotaFiscal).where(NotaFiscal.id == nota_id))
-    nota = result.scalar_one_or_none()
-    if nota:
-        nota.status_id = novo_status_id
-        await db.commit()
-        await db.refresh(nota)
+    # Qualquer origem que a máquina de estados permita para o novo status
+    nota = await transicionar_nota(db, nota_id, novo_status_id)
+    await db.commit()
     return nota
 
 
@@ -123,143 +317,175 @@ async def update_nota_fiscal(
     usuario_id: str,  # UUID como string
     nota_atualizada: NotaFiscalCreate,
 ):
-    # Buscar a nota com o cliente
-    result = await db.execute(
-        select(NotaFiscal)
-        .options(selectinload(NotaFiscal.cliente))
-        .where(NotaFiscal.id == nota_id, NotaFiscal.usuario_id == usuario_id)
-    )
-    nota = result.scalar_one_or_none()
-
-    if not nota:
-        return None  # ou lançar exceção, mas prefiro tratar no controller
-
-    # Atualizar cliente
-    cliente = nota.cliente
-    if cliente:
-        for field, value in nota_atualizada.model_dump(exclude_unset=True).items():
-            if field in Cliente.__table__.columns:
-                setattr(cliente, field, value)
-        cliente.usuario_id = usuario_id  # garantir consistência
-    else:
-        # Criar novo cliente (caso raro)
-        cliente_data = nota_atualizada.model_dump(
-            include={
-                "razao_social",
-                "cpf_cnpj",
-                "email",
-                "telefone",
-                "pais",
-                "uf",
-                "cidade",
-                "cep",
-                "logradouro",
-                "numero",
-                "complemento",
-                "bairro",
-            }
-        )
-        cliente_data["usuario_id"] = usuario_id
-        cliente = Cliente(**cliente_data)
-        db.add(cliente)
-        await db.flush()
-        nota.cliente_id = cliente.id
-
-    # Atualizar nota fiscal
-    nota_fields = {"cod_cnae", "valor_total", "descricao"}
-    for field in nota_fields:
-        if hasattr(nota_atualizada, field):
-            setattr(nota, field, getattr(nota_atualizada, field))
-
-    nota.status_id = 1
-    nota.desc_motivo = ""
-
-    codigo_lista_servico = await get_codigo_servico_by_cnae(db, nota.cod_cnae)
+    # 1. Código da lista de serviços (memória) antes de qualquer escrita
+    codigo_lista_servico = await get_codigo_servico_by_cnae(db, nota_atualizada.cod_cnae)
 
     if codigo_lista_servico is None:
         raise HTTPException(
             status_code=400,
-            detail=f"Não foi encontrado código da Lista de Serviços para o CNAE {nota.cod_cnae}.",
+            detail=f"Não foi encontrado código da Lista de Serviços para o CNAE {nota_atualizada.cod_cnae}.",
         )
 
-    nota.codigo_lista_servicos = codigo_lista_servico
+    # Documento do cliente validado antes de qualquer escrita (400 se inválido)
+    campos_cliente = {
+        campo: valor
+        for campo, valor in nota_atualizada.model_dump(exclude_unset=True).items()
+        if campo in Cliente.__table__.columns
+    }
+    if "cpf_cnpj" in campos_cliente:
+        campos_cliente.update(dados_documento(campos_cliente["cpf_cnpj"]))
+    campos_cliente["usuario_id"] = usuario_id  # garantir consistência
+
+    # 2. Atualiza a nota e a devolve para Pendente pela máquina de estados:
+    #    só notas ainda não emitidas nem em processamento podem ser editadas
+    nota = await transicionar_nota(
+        db,
+        nota_id,
+        StatusNotaId.PENDENTE,
+        origem=(StatusNotaId.PENDENTE, StatusNotaId.RECUSADA, StatusNotaId.APROVADA),
+        usuario_id=usuario_id,
+        motivo="Nota editada",
+        valores={
+            "cod_cnae": nota_atualizada.cod_cnae,
+            "valor_total": nota_atualizada.valor_total,
+            "descricao": nota_atualizada.descricao,
+            "desc_motivo": "",
+            "codigo_lista_servico": codigo_lista_servico,
+        },
+        criterios=(NotaFiscal.usuario_id == usuario_id,),
+    )
+
+    # 3. Atualiza o cliente da nota com RETURNING (ou, caso raro de nota sem
+    #    cliente, usa o do documento, criando-o se preciso)
+    cliente = None
+    if nota.cliente_id is not None:
+        cliente = await atualizar_retornando(
+            db, Cliente, [Cliente.id == nota.cliente_id], campos_cliente
+        )
+    if cliente is None:
+        cliente_id = await obter_ou_criar_cliente_id(
+            db, nota_atualizada.model_dump(include=_CAMPOS_CLIENTE_NOTA), usuario_id
+        )
+        cliente = await db.get(Cliente, cliente_id)
+        nota = await atualizar_retornando(
+            db, NotaFiscal, [NotaFiscal.id == nota.id], {"cliente_id": cliente_id}
+        )
 
-    nota.data_atualizacao = func.now()
     await db.commit()
-    await db.refresh(nota)
 
-    # Recarregar com relacionamentos
-    result = await db.execute(
-        select(NotaFiscal)
-        .options(selectinload(NotaFiscal.cliente), selectinload(NotaFiscal.status))
-        .where(NotaFiscal.id == nota.id)
-    )
-    return result.scalar_one_or_none()
+    # A resposta inclui o cliente: associa o já retornado, sem nova consulta
+    set_committed_value(nota, "cliente", cliente)
+    return nota
 
 
 async def recusar_nota_fiscal(
-    db: AsyncSession, nota_id: int, novo_status_id: int, desc_motivo: str
+    db: AsyncSession,
+    nota_id: int,
+    novo_status_id: int,
+    desc_motivo: str,
+    usuario_id: uuid.UUID | None = None,
 ):
-    nota = await db.get(NotaFiscal, nota_id)
-
-    if nota.status_id != 1:
-        raise HTTPException(
-            status_code=400,
-            detail="Apenas notas com status 'Pendente' podem ser recusadas. Atualize a página e tente novamente!",
-        )
-
-    result = await db.execute(select(NotaFiscal).where(NotaFiscal.id == nota_id))
-
-    nota = result.scalar_one_or_none()
+    # Só sai de Pendente: uma segunda recusa/aprovação simultânea recebe 409
+    nota = await transicionar_nota(
+        db,
+        nota_id,
+        novo_status_id,
+        origem=StatusNotaId.PENDENTE,
+        usuario_id=usuario_id,
+        motivo=desc_motivo,
+        valores={"desc_motivo": desc_motivo},
+    )
+    await db.commit()
+    return nota
 
-    if nota:
-        nota.status_id = novo_status_id
-        nota.desc_motivo = desc_motivo
-        await db.commit()
-        await db.refresh(nota)
 
+async def aprovar_nota_fiscal(
+    db: AsyncSession, nota_id: int, usuario_id: uuid.UUID | None = None
+):
+    nota = await transicionar_nota(
+        db,
+        nota_id,
+        StatusNotaId.APROVADA,
+        origem=StatusNotaId.PENDENTE,
+        usuario_id=usuario_id,
+    )
+    await db.commit()
     return nota
 
 
-async def aprovar_nota_fiscal(db: AsyncSession, nota_id: int):
-    nota = await db.get(NotaFiscal, nota_id)
-    if not nota:
-        return None
+async def aprovar_notas_em_lote(
+    db: AsyncSession, nota_ids: list[int], usuario_id: uuid.UUID | None = None
+) -> dict:
+    transicionadas, ignoradas = await transicionar_notas_em_lote(
+        db,
+        nota_ids,
+        StatusNotaId.APROVADA,
+        origem=StatusNotaId.PENDENTE,
+        usuario_id=usuario_id,
+    )
+    await db.commit()
+    return {"transicionadas": transicionadas, "ignoradas": ignoradas}
 
-    if nota.status_id != 1:
-        raise HTTPException(
-            status_code=400,
-            detail="Apenas notas com status 'Pendente' podem ser aprovadas.",
-        )
 
-    nota.status_id = 4  # ← Aprovação ⇒ status 4 (fixo)
+async def recusar_notas_em_lote(
+    db: AsyncSession,
+    nota_ids: list[int],
+    desc_motivo: str,
+    usuario_id: uuid.UUID | None = None,
+) -> dict:
+    transicionadas, ignoradas = await transicionar_notas_em_lote(
+        db,
+        nota_ids,
+        StatusNotaId.RECUSADA,
+        origem=StatusNotaId.PENDENTE,
+        usuario_id=usuario_id,
+        motivo=desc_motivo,
+        valores={"desc_motivo": desc_motivo},
+    )
     await db.commit()
-    await db.refresh(nota)
-    return nota
+    return {"transicionadas": transicionadas, "ignoradas": ignoradas}
 
 
 async def emitir_nota_finalizada(db: AsyncSession, nota_id: int, current_user: Usuario):
-    # Busca nota com relacionamentos
-    nota = await db.get(NotaFiscal, nota_id)
-    if not nota:
-        raise HTTPException(status_code=404, detail="Nota fiscal não encontrada.")
-
-    if nota.status_id != 1:
-        raise HTTPException(
-            status_code=400,
-            detail="Apenas notas com status 'Aguardando Validação' podem ser emitidas.",
-        )
-
+    criterios = ()
     if current_user.role_id == 2:  # Se for emissor
-        if nota.usuario_id != current_user.id or current_user.emite == False:
+        if current_user.emite == False:
             raise HTTPException(status_code=403, detail="Não autorizado.")
+        criterios = (NotaFiscal.usuario_id == current_user.id,)
+
+    # 1. Reserva a nota (Pendente → Em Processamento) ANTES do SOAP: um segundo
+    #    clique ou outro admin recebe 409 em vez de emitir a mesma nota duas vezes
+    nota = await transicionar_nota(
+        db,
+        nota_id,
+        StatusNotaId.EM_PROCESSAMENTO,
+        origem=StatusNotaId.PENDENTE,
+        usuario_id=current_user.id,
+        criterios=criterios,
+        carregar=[NotaFiscal.cliente],
+    )
+    await db.commit()
+
+    async def desfazer_reserva(motivo: str):
+        await transicionar_nota(
+            db,
+            nota_id,
+            StatusNotaId.PENDENTE,
+            origem=StatusNotaId.EM_PROCESSAMENTO,
+            usuario_id=current_user.id,
+            motivo=motivo[:500],
+        )
+        await db.commit()
 
     if not nota.cliente:
+        await desfazer_reserva("Nota sem cliente associado")
         raise HTTPException(status_code=400, detail="Nota sem cliente associado!")
 
     prestador = await db.get(Usuario, nota.usuario_id)
 
-    # ✅ Tenta emitir via SOAP ANTES de alterar o status
+    # 2. Emite via SOAP. Só uma recusa certa do provedor devolve a nota para
+    #    Pendente; em qualquer outro caso ela pode ter sido emitida e fica Em
+    #    Processamento até a sincronização conciliar (nova tentativa = nota em dobro)
     try:
         await emitir_nfse_via_soap(
             db=db,
@@ -269,19 +495,41 @@ async def emitir_nota_finalizada(db: AsyncSession, nota_id: int, current_user: U
             descricao=nota.descricao or "Emissão via sistema 2RS Contabilidade",
             email_destino=prestador.email,
         )
-    except Exception as e:
-        # ❌ Emissão falhou → NÃO atualiza status
+    except EmissaoRecusada as e:
+        # ❌ Provedor recusou → nota volta para Pendente
+        await desfazer_reserva(f"Falha na emissão: {e}")
         raise HTTPException(
             status_code=502, detail=f"Falha na emissão da NFSe: {str(e)}"
         )
+    except Exception as e:
+        print(f"[NFSE] Emissão da nota {nota_id} sem confirmação: {e}")
+        raise HTTPException(
+            status_code=502,
+            detail=(
+                f"Emissão da NFSe sem confirmação do provedor ({e}). A nota segue "
+                "em processamento e será conciliada; não emita novamente."
+            ),
+        )
+
+    # 3. Emitida: vincula o ID da API. Uma falha aqui não desfaz a reserva; a
+    #    nota fica sem id_api e a sincronização a concilia depois
+    try:
+        ultima_nota_solicitada_api: dict = await consultar_ultima_solicitacao_api_nfse(
+            formatar_cpf_cnpj(prestador.cnpj_cpf), nota.data_criacao
+        )
+        await insert_id_nota_api(db, nota.id, ultima_nota_solicitada_api["nota_api"]["ID"])
+    except Exception as e:
+        print(f"[NFSE] Nota {nota_id} emitida sem ID da API vinculado: {e}")
+        await db.rollback()
+        await db.refresh(nota)
 
-    # ✅ Só agora atualiza o status
-    nota.status_id = 6  # Em Processamento
-    await db.commit()
-    await db.refresh(nota)
     return nota
 
 
+class EmissaoRecusada(Exception):
+    """O provedor recusou a nota com certeza: ela não foi emitida."""
+
+
 async def emitir_nfse_via_soap(
     db: AsyncSession,
     nota: NotaFiscal,
@@ -291,8 +539,9 @@ async def emitir_nfse_via_soap(
     email_destino: str,
 ) -> dict:
     """
-    Envia a nota fiscal via SOAP e retorna o resultado.
-    Lança exceção em caso de falha.
+    Envia a nota fiscal via SOAP e retorna o resultado. Lança
+    EmissaoRecusada quando o provedor recusa (status HTTP de erro ou
+    eNFSeResult com erro) e Exception quando o resultado é incerto.
     """
 
     prestador_cpf_cnpj_fmt = formatar_cpf_cnpj(prestador.cnpj_cpf)
@@ -333,36 +582,33 @@ async def emitir_nfse_via_soap(
 
     async with httpx.AsyncClient(timeout=60.0) as client:
         try:
-            response = await client.post(
-                settings.NFSE_URL, content=soap_body, headers=headers
-            )
-            response.raise_for_status()
+            with medir(nfse_soap_segundos, "eNFSe"):
+                response = await client.post(
+                    settings.NFSE_URL, content=soap_body, headers=headers
+                )
+                response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise EmissaoRecusada(f"Provedor respondeu {e.response.status_code}")
         except httpx.HTTPError as e:
+            # Timeout/conexão caída: o provedor pode ter recebido a nota
             raise Exception(f"Falha na comunicação SOAP: {str(e)}")
 
     # Analisa a resposta XML
     try:
         root = ET.fromstring(response.text)
-        # Ajuste o namespace conforme a resposta real da API
-        namespace = {"ns": "http://tempuri.org/"}
-        result = root.find(".//ns:eNFSeResult", namespace)
-        if result is None or not result.text or "erro" in result.text.lower():
-            raise Exception(
-                f"Erro na emissão: {result.text if result is not None else 'Resposta inválida'}"
-            )
-
-        ultima_nota_solicitada_api: dict = await consultar_ultima_solicitacao_api_nfse(
-            prestador_cpf_cnpj_fmt, nota.data_criacao
-        )
-
-        ultima_nota_id = ultima_nota_solicitada_api["nota_api"]["ID"]
-        await insert_id_nota_api(db, nota.id, ultima_nota_id)
-
-        return {"success": True, "response": result.text}
-
     except ET.ParseError:
         raise Exception("Resposta SOAP inválida (XML malformado)")
 
+    # Ajuste o namespace conforme a resposta real da API
+    namespace = {"ns": "http://tempuri.org/"}
+    result = root.find(".//ns:eNFSeResult", namespace)
+    if result is None or not result.text:
+        raise Exception("Resposta SOAP sem eNFSeResult")
+    if "erro" in result.text.lower():
+        raise EmissaoRecusada(f"Erro na emissão: {result.text}")
+
+    return {"success": True, "response": result.text}
+
 
 async def consultar_ultima_solicitacao_api_nfse(prestador_cnpj: str, data) -> dict:
     """
@@ -391,7 +637,7 @@ async def consultar_notas_em_processamento_api_by_usuario(
     result = await db.execute(
         select(NotaFiscal)
         .where(NotaFiscal.usuario_id == usuario_id)
-        .where(NotaFiscal.status_id == 6)
+        .where(NotaFiscal.status_id == StatusNotaId.EM_PROCESSAMENTO)
         .options(
             selectinload(NotaFiscal.status),
             selectinload(NotaFiscal.usuario).selectinload(Usuario.atividades),
@@ -426,9 +672,10 @@ async def consultar_notas_em_processamento_api_by_usuario(
     data_fim = max(datas)
 
     # 4. Consulta a API com o período
+    prestador_cnpj = formatar_cpf_cnpj(usuario.cnpj_cpf)
     try:
         resposta_api = await consultar_notas_por_periodo_api(
-            formatar_cpf_cnpj(usuario.cnpj_cpf),
+            prestador_cnpj,
             data_inicio,
             data_fim,
         )
@@ -436,7 +683,10 @@ async def consultar_notas_em_processamento_api_by_usuario(
         notas_api = resposta_api
     except Exception as e:
         print(f"Erro ao consultar API para sincronização: {e}")
-        return notas  # retorna como está se falhar
+        notas_api = []
+
+    # 4b. Notas emitidas sem o ID da API gravado ficariam presas aqui para sempre
+    notas_api = notas_api + await _conciliar_notas_sem_id_api(db, notas, prestador_cnpj)
 
     # 5. Cria mapa: ID da API → status
     mapa_notas_api = {}
@@ -451,6 +701,7 @@ async def consultar_notas_em_processamento_api_by_usuario(
             }
 
     # Atualiza as notas locais
+    emitidas = 0
     for nota in notas:
         if not nota.id_api:
             continue
@@ -461,15 +712,95 @@ async def consultar_notas_em_processamento_api_by_usuario(
 
         status_na_api = dados_api["Status"]
         if status_na_api == "EMITIDA":
-            nota.status_id = 2
-            nota.link_api_pdf = dados_api["eNFSe_PDF"]
-            nota.link_api_xml = dados_api["eNFSe_XML"]
-            nota.data_emissao = parse_ddmmyyyy(dados_api.get("Emissao")) 
-            nota.numero_nota = dados_api["NFSe"]         
-            await db.commit()
-            await db.refresh(nota)
+            try:
+                # Recarrega o cliente: a nota pode já estar na resposta de quem chamou
+                await transicionar_nota(
+                    db,
+                    nota.id,
+                    StatusNotaId.EMITIDA,
+                    origem=StatusNotaId.EM_PROCESSAMENTO,
+                    motivo="Confirmada pela API NFSe",
+                    valores={
+                        "link_api_pdf": dados_api["eNFSe_PDF"],
+                        "link_api_xml": dados_api["eNFSe_XML"],
+                        "data_emissao": parse_ddmmyyyy(dados_api.get("Emissao")),
+                        "numero_nota": dados_api["NFSe"],
+                    },
+                    carregar=[NotaFiscal.cliente],
+                )
+                emitidas += 1
+            except HTTPException:
+                # Outra requisição já sincronizou esta nota
+                continue
+
+    if emitidas:
+        await db.commit()
 
-        return notas
+    return notas
+
+
+# Reservas mais novas que isso podem estar com o eNFSe em andamento
+_CONCILIACAO_CARENCIA = timedelta(minutes=5)
+
+
+async def _conciliar_notas_sem_id_api(
+    db: AsyncSession, notas: list, prestador_cnpj: str
+) -> list[dict]:
+    """
+    Notas Em Processamento sem id_api: o provedor pode ter emitido sem que
+    o ID fosse gravado (timeout, falha ao consultar o ID). Para cada dia de
+    reserva, consulta as solicitações do prestador naquele dia e descarta os
+    IDs já vinculados; se sobrarem tantas quanto as notas sem ID, pareia na
+    ordem (reserva × ID). Com contagens diferentes o par seria um palpite:
+    fica para conciliação manual. Devolve as solicitações consultadas.
+    """
+    limite = datetime.now(pytz.UTC) - _CONCILIACAO_CARENCIA
+    por_dia: dict[str, list] = {}
+    for nota in notas:
+        if not nota.id_api and nota.data_atualizacao and nota.data_atualizacao < limite:
+            dia = datetime_utc_to_brasilia_date_str(nota.data_atualizacao)
+            por_dia.setdefault(dia, []).append(nota)
+
+    consultadas, vinculadas = [], 0
+    for dia, sem_id in por_dia.items():
+        try:
+            reserva = sem_id[0].data_atualizacao
+            itens = await consultar_notas_por_periodo_api(prestador_cnpj, reserva, reserva)
+        except Exception as e:
+            print(f"[NFSE] Conciliação de {dia} sem resposta da API: {e}")
+            continue
+        consultadas.extend(itens)
+
+        ids = {str(item["ID"]) for item in itens if "ID" in item}
+        ja_vinculados = set()
+        if ids:
+            ja_vinculados = set(
+                (await db.scalars(select(NotaFiscal.id_api).where(NotaFiscal.id_api.in_(ids)))).all()
+            )
+        livres = sorted(ids - ja_vinculados, key=int)
+        if len(livres) != len(sem_id):
+            print(
+                f"[NFSE] Conciliação manual: {len(sem_id)} nota(s) sem ID da API em {dia} "
+                f"e {len(livres)} solicitação(ões) sem nota"
+            )
+            continue
+
+        sem_id.sort(key=lambda n: (n.data_atualizacao, n.id))
+        for nota, id_api in zip(sem_id, livres):
+            result = await db.execute(
+                update(NotaFiscal)
+                .where(NotaFiscal.id == nota.id, NotaFiscal.id_api.is_(None))
+                .values(id_api=id_api)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                set_committed_value(nota, "id_api", id_api)
+                vinculadas += 1
+
+    if vinculadas:
+        await db.commit()
+        print(f"[NFSE] {vinculadas} nota(s) conciliada(s) com a API pelo dia da reserva")
+    return consultadas
 
 
 async def consultar_notas_por_periodo_api(prestador_cnpj, data_inicio, data_fim):
@@ -498,10 +829,11 @@ async def consultar_notas_por_periodo_api(prestador_cnpj, data_inicio, data_fim)
 
     async with httpx.AsyncClient(timeout=60.0) as client:
         try:
-            response = await client.post(
-                settings.NFSE_URL, content=soap_body, headers=headers
-            )
-            response.raise_for_status()
+            with medir(nfse_soap_segundos, "eNFSe_GetAll_DMS_E"):
+                response = await client.post(
+                    settings.NFSE_URL, content=soap_body, headers=headers
+                )
+                response.raise_for_status()
         except httpx.HTTPError as e:
             raise Exception(f"Falha na consulta SOAP: {str(e)}")
 
@@ -529,24 +861,6 @@ async def consultar_notas_por_periodo_api(prestador_cnpj, data_inicio, data_fim)
         raise Exception("Resposta SOAP malformada.")
 
 
-def formatar_cpf_cnpj(valor: str) -> str:
-    """
-    Formata um CPF ou CNPJ com máscara adequada.
-    Assume que o valor recebido contém apenas dígitos numéricos.
-    """
-    valor = re.sub(r"\D", "", str(valor))  # Remove tudo que não for dígito
-
-    if len(valor) == 11:
-        # Formata como CPF: XXX.XXX.XXX-XX
-        return f"{valor[:3]}.{valor[3:6]}.{valor[6:9]}-{valor[9:]}"
-    elif len(valor) == 14:
-        # Formata como CNPJ: XX.XXX.XXX/XXXX-XX
-        return f"{valor[:2]}.{valor[2:5]}.{valor[5:8]}/{valor[8:12]}-{valor[12:]}"
-    else:
-        # Se não for CPF nem CNPJ válido, retorna como está (ou lança erro, se preferir)
-        return valor
-
-
 def datetime_utc_to_brasilia_date_str(dt_utc: datetime) -> str:
     """
     Converte um datetime UTC (timezone-aware) para a data civil em Brasília (BRT/BRST)
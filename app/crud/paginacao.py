@@ -0,0 +1,33 @@
+# app/crud/paginacao.py
+import base64
+import json
+from fastapi import HTTPException, status
+
+
+def codificar_cursor(*valores) -> str:
+    """Gera um cursor opaco com os valores da chave de ordenação da última linha."""
+    bruto = json.dumps([str(v) for v in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, tamanho: int) -> list[str]:
+    try:
+        preenchido = cursor + "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(preenchido.encode()))
+        if not isinstance(valores, list) or len(valores) != tamanho:
+            raise ValueError
+        return valores
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido."
+        )
+
+
+def escapar_like(texto: str) -> str:
+    """Escapa os curingas do LIKE com barra invertida."""
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def padrao_prefixo(texto: str) -> str:
+    """Padrão LIKE de prefixo, com os curingas escapados por barra invertida."""
+    return escapar_like(texto) + "%"
@@ -1,24 +1,14 @@
-# app/crud/status.py
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from app.models import *
-from app.schemas.cliente import ClienteCreate
-import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Optional, List
+from app.core.catalogo_status import catalogo_status
 
 
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from app.models import Atividade
-import uuid
-
-
-async def get_status_by_id(db: AsyncSession, status_id: int) -> Optional[StatusNota]:
-    result = await db.execute(select(StatusNota).where(StatusNota.id == status_id))
-    return result.scalar_one_or_none()
+# status_nota é servido do catálogo em memória (carregado na subida da aplicação)
+async def get_status_by_id(db: AsyncSession, status_id: int) -> Optional[dict]:
+    await catalogo_status.garantir_carregado(db)
+    return catalogo_status.dados.por_id.get(status_id)
 
 
-async def get_all_status(db: AsyncSession) -> List[StatusNota]:
-    result = await db.execute(select(StatusNota))
-    return result.scalars().all()
+async def get_all_status(db: AsyncSession) -> List[dict]:
+    await catalogo_status.garantir_carregado(db)
+    return list(catalogo_status.dados.por_id.values())
@@ -0,0 +1,216 @@
+# app/crud/transicoes_nota.py
+"""
+Máquina de estados das notas fiscais. Toda mudança de status passa por
+transicionar_nota: uma única instrução que bloqueia a nota se ela estiver
+num status de origem permitido, atualiza e grava o histórico a partir da
+saída do próprio UPDATE. Duas requisições concorrentes não passam ambas: a
+segunda espera o lock, não encontra mais a nota no status de origem e
+recebe 409.
+"""
+import uuid
+from typing import Iterable
+from fastapi import HTTPException, status
+from sqlalchemy import insert, literal, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.types import Integer, String, UUID
+from app.core.catalogo_status import catalogo_status
+from app.crud.escrita import ler_retornando
+from app.models.historico_status_nota import HistoricoStatusNota
+from app.models.nota_fiscal import NotaFiscal
+from app.models.status_nota import StatusNotaId
+
+# Destinos permitidos a partir de cada status
+TRANSICOES: dict[StatusNotaId, frozenset[StatusNotaId]] = {
+    StatusNotaId.PENDENTE: frozenset(
+        {
+            StatusNotaId.APROVADA,
+            StatusNotaId.RECUSADA,
+            StatusNotaId.EM_PROCESSAMENTO,
+            StatusNotaId.EXCLUIDA,
+        }
+    ),
+    StatusNotaId.APROVADA: frozenset(
+        {StatusNotaId.PENDENTE, StatusNotaId.EM_PROCESSAMENTO, StatusNotaId.EXCLUIDA}
+    ),
+    StatusNotaId.RECUSADA: frozenset({StatusNotaId.PENDENTE, StatusNotaId.EXCLUIDA}),
+    # Volta para Pendente quando a emissão falha depois de reservada
+    StatusNotaId.EM_PROCESSAMENTO: frozenset({StatusNotaId.EMITIDA, StatusNotaId.PENDENTE}),
+    StatusNotaId.EMITIDA: frozenset(),
+    StatusNotaId.EXCLUIDA: frozenset(),
+}
+
+
+def origens_permitidas(destino: int) -> frozenset[StatusNotaId]:
+    return frozenset(origem for origem, destinos in TRANSICOES.items() if destino in destinos)
+
+
+def _ctes_transicao(condicoes, destino, usuario_id, motivo, valores):
+    """
+    CTEs da transição:
+
+        antigas      SELECT id, status_id ... WHERE <condições> FOR UPDATE
+        atualizadas  UPDATE notas_fiscais ... FROM antigas RETURNING *, status anterior
+        historico    INSERT INTO historico_status_nota ... SELECT FROM atualizadas
+
+    O histórico lê a saída do UPDATE (e não a tabela): a mesma linha não é
+    lida e modificada por partes diferentes da instrução. Numa corrida, o
+    FOR UPDATE espera o lock e reavalia as condições com a versão nova da
+    linha, então quem perde não atualiza nem grava histórico.
+    """
+    antigas = (
+        select(NotaFiscal.id, NotaFiscal.status_id)
+        .where(*condicoes)
+        .with_for_update()
+        .cte("antigas")
+    )
+    atualizadas = (
+        update(NotaFiscal)
+        .where(NotaFiscal.id == antigas.c.id)
+        .values(**(valores or {}), status_id=int(destino))
+        .returning(*NotaFiscal.__table__.c, antigas.c.status_id.label("status_anterior"))
+        .cte("atualizadas")
+    )
+    historico = insert(HistoricoStatusNota).from_select(
+        ["nota_id", "status_anterior", "status_novo", "usuario_id", "motivo"],
+        select(
+            atualizadas.c.id,
+            atualizadas.c.status_anterior,
+            literal(int(destino), Integer),
+            literal(usuario_id, UUID(as_uuid=True)),
+            literal(motivo, String),
+        )
+        # Edição sem mudança de status (ex: Pendente → Pendente) não entra no histórico
+        .where(atualizadas.c.status_anterior != int(destino)),
+    ).cte("historico")
+    return atualizadas, historico
+
+
+def _nome_status(status_id: int) -> str:
+    if catalogo_status.carregado:
+        linha = catalogo_status.dados.por_id.get(status_id)
+        if linha:
+            return linha["nome"]
+    return str(status_id)
+
+
+async def transicionar_nota(
+    db: AsyncSession,
+    nota_id: int,
+    destino: int,
+    *,
+    origem: int | Iterable[int] | None = None,
+    usuario_id: uuid.UUID | None = None,
+    motivo: str | None = None,
+    valores: dict | None = None,
+    criterios: tuple = (),
+    carregar=(),
+) -> NotaFiscal:
+    """
+    Leva a nota para `destino` se ela estiver em `origem` (um status ou
+    vários; sem origem, qualquer status que permita ir para o destino),
+    aplicando também `valores` e exigindo `criterios` extras (ex: dono da
+    nota). Uma origem igual ao destino só é aceita quando passada
+    explicitamente (edição que mantém o status). Devolve a nota atualizada.
+
+    Nenhuma linha atualizada vira 404 (nota não existe), 409 (status atual
+    não permite a transição) ou 403 (critérios extras). Sem commit.
+    """
+    if origem is not None:
+        origens = {origem} if isinstance(origem, int) else set(origem)
+        for o in origens:
+            if o != destino and destino not in TRANSICOES.get(o, ()):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Transição inválida: '{_nome_status(o)}' → '{_nome_status(destino)}'.",
+                )
+    else:
+        origens = origens_permitidas(destino)
+        if not origens:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Nenhuma nota pode ir para o status '{_nome_status(destino)}'.",
+            )
+
+    condicoes = [
+        NotaFiscal.id == nota_id,
+        NotaFiscal.status_id.in_([int(o) for o in origens]),
+        *criterios,
+    ]
+
+    atualizadas, historico = _ctes_transicao(condicoes, destino, usuario_id, motivo, valores)
+    stmt = select(*(atualizadas.c[c.name] for c in NotaFiscal.__table__.c)).add_cte(historico)
+
+    nota = await ler_retornando(db, NotaFiscal, stmt, carregar=carregar)
+    if nota is not None:
+        return nota
+
+    # Nenhuma linha: descobre o motivo para devolver o erro certo
+    atual = await db.scalar(select(NotaFiscal.status_id).where(NotaFiscal.id == nota_id))
+    if atual is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Nota fiscal não encontrada."
+        )
+    if atual in origens:
+        # O status permitia; quem barrou foram os critérios extras (ex: dono da nota)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Não autorizado.")
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=(
+            f"A nota está com status '{_nome_status(atual)}' e não pode ir para "
+            f"'{_nome_status(destino)}'. Atualize a página e tente novamente!"
+        ),
+    )
+
+
+async def transicionar_notas_em_lote(
+    db: AsyncSession,
+    nota_ids: list[int],
+    destino: int,
+    *,
+    origem: int,
+    usuario_id: uuid.UUID | None = None,
+    motivo: str | None = None,
+    valores: dict | None = None,
+) -> tuple[list[int], list[dict]]:
+    """
+    Versão em lote de transicionar_nota: um único UPDATE para todas as notas
+    que estão em `origem` (com o histórico na mesma instrução). Devolve os
+    ids transicionados e, para os ignorados, o status atual (ou None se a
+    nota não existe). Sem commit.
+    """
+    if destino not in TRANSICOES.get(origem, ()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Transição inválida: '{_nome_status(origem)}' → '{_nome_status(destino)}'.",
+        )
+
+    ids = list(dict.fromkeys(nota_ids))  # sem repetidos, na ordem recebida
+    condicoes = [NotaFiscal.id.in_(ids), NotaFiscal.status_id == int(origem)]
+
+    atualizadas, historico = _ctes_transicao(condicoes, destino, usuario_id, motivo, valores)
+    stmt = select(atualizadas.c.id).add_cte(historico)
+    transicionadas = set((await db.execute(stmt)).scalars())
+
+    # Os que ficaram de fora: status atual para o relatório
+    restantes = [i for i in ids if i not in transicionadas]
+    atuais = {}
+    if restantes:
+        result = await db.execute(
+            select(NotaFiscal.id, NotaFiscal.status_id).where(NotaFiscal.id.in_(restantes))
+        )
+        atuais = dict(result.all())
+
+    ignoradas = [
+        {
+            "id": nota_id,
+            "status_id": atuais.get(nota_id),
+            "motivo": (
+                "Nota fiscal não encontrada."
+                if nota_id not in atuais
+                else f"Status atual '{_nome_status(atuais[nota_id])}' não permite a ação."
+            ),
+        }
+        for nota_id in restantes
+    ]
+    return [i for i in ids if i in transicionadas], ignoradas
@@ -5,14 +5,22 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from app.schemas.atividade import AtividadeCreate
-from app.schemas.usuario import User, UserUpdate
-from sqlalchemy import delete
+from app.schemas.usuario import User, UserUpdate, UsuarioImportacao
+from app.core.importacao import ler_atividades_csv
+from app.core.documentos import normalizar_cpf_cnpj, somente_digitos
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy import delete, func, or_, tuple_
 import uuid
 from app.models import NotaFiscal
+from app.models.status_nota import StatusNotaId
 from sqlalchemy import update
 from sqlalchemy.future import select
 from app.models.usuario import Usuario
 from app.models.atividade import Atividade
+from app.models.pendencias_usuario import PendenciasUsuario
+from app.crud.atividade import sincronizar_atividades
+from app.crud.paginacao import codificar_cursor, decodificar_cursor, padrao_prefixo
 
 
 async def get_user_by_email(db: AsyncSession, email: str):
@@ -25,12 +33,20 @@ async def get_user_by_email(db: AsyncSession, email: str):
 
 
 async def get_user_by_documento(db: AsyncSession, documento: str):
+    # cnpj_cpf_digitos não é único (o mesmo documento pode estar gravado com
+    # e sem máscara): o cadastro com o valor exato vence, depois o mais antigo
+    digitos = somente_digitos(documento)
+    condicao = Usuario.cnpj_cpf == documento
+    if digitos:
+        condicao = or_(condicao, Usuario.cnpj_cpf_digitos == digitos)
     result = await db.execute(
         select(Usuario)
         .options(selectinload(Usuario.role), selectinload(Usuario.atividades))
-        .where(Usuario.cnpj_cpf == documento)
+        .where(condicao)
+        .order_by((Usuario.cnpj_cpf == documento).desc(), Usuario.created_at, Usuario.id)
+        .limit(1)
     )
-    return result.scalar_one_or_none()
+    return result.scalars().first()
 
 
 async def get_user_by_id(db: AsyncSession, user_id: uuid.UUID) -> Usuario | None:
@@ -102,9 +118,150 @@ async def create_user(
     return result.scalar_one()
 
 
+def _resumir_erro_validacao(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in erro['loc'])}: {erro['msg']}" for erro in e.errors()
+    )
+
+
+def _em_lotes(itens: list, tamanho: int):
+    for i in range(0, len(itens), tamanho):
+        yield itens[i : i + tamanho]
+
+
+async def importar_usuarios(
+    db: AsyncSession, registros: list[dict], *, manter_role: bool = False
+) -> dict:
+    """
+    Cadastro em lote de usuários (com atividades) a partir de registros já
+    lidos de CSV/JSON. Valida e deduplica tudo antes de escrever, consulta
+    e-mails/documentos existentes em uma única query, gera os hashes em
+    paralelo e grava tudo com INSERTs multi-linha em uma única transação.
+    Retorna um relatório por linha.
+
+    O role_id do arquivo é ignorado (todos entram com o perfil padrão de
+    UsuarioImportacao), a não ser com `manter_role`: um arquivo não cria
+    administradores por engano.
+    """
+    from app.core.security import hash_senhas_em_paralelo
+
+    relatorio = []
+    validos: list[tuple[dict, UsuarioImportacao]] = []
+    emails_vistos, documentos_vistos = set(), set()
+
+    # 1. Validação e deduplicação dentro do próprio arquivo
+    for numero, registro in enumerate(registros, start=1):
+        linha = {
+            "linha": numero,
+            "email": registro.get("email"),
+            "cnpj_cpf": registro.get("cnpj_cpf"),
+        }
+        relatorio.append(linha)
+
+        try:
+            registro = {**registro, "atividades": ler_atividades_csv(registro.get("atividades"))}
+            if not manter_role:
+                registro.pop("role_id", None)
+            usuario = UsuarioImportacao.model_validate(registro)
+        except ValidationError as e:
+            linha.update(status="rejeitado", motivo=_resumir_erro_validacao(e))
+            continue
+
+        email = usuario.email.lower()
+        linha["cnpj_cpf"] = usuario.cnpj_cpf
+        if email in emails_vistos:
+            linha.update(status="rejeitado", motivo="E-mail repetido no arquivo")
+            continue
+        if usuario.cnpj_cpf in documentos_vistos:
+            linha.update(status="rejeitado", motivo="CNPJ ou CPF repetido no arquivo")
+            continue
+        emails_vistos.add(email)
+        documentos_vistos.add(usuario.cnpj_cpf)
+        validos.append((linha, usuario))
+
+    # 2. Uma única consulta para o que já está cadastrado. Compara pelos
+    #    dígitos: cadastros antigos podem ter o documento gravado com máscara
+    existentes_email, existentes_documento = set(), set()
+    if validos:
+        result = await db.execute(
+            select(Usuario.email, Usuario.cnpj_cpf_digitos).where(
+                or_(
+                    func.lower(Usuario.email).in_(emails_vistos),
+                    Usuario.cnpj_cpf_digitos.in_(documentos_vistos),
+                )
+            )
+        )
+        for email, documento in result:
+            existentes_email.add(email.lower())
+            existentes_documento.add(documento)
+
+    novos = []
+    for linha, usuario in validos:
+        if usuario.email.lower() in existentes_email:
+            linha.update(status="rejeitado", motivo="E-mail já cadastrado")
+        elif usuario.cnpj_cpf in existentes_documento:
+            linha.update(status="rejeitado", motivo="CNPJ ou CPF já cadastrado")
+        else:
+            novos.append((linha, usuario))
+
+    # 3. Hash das senhas em paralelo (senha padrão: o próprio documento)
+    hashes = await hash_senhas_em_paralelo(
+        [usuario.password or usuario.cnpj_cpf for _, usuario in novos]
+    )
+
+    # 4. Inserção em lote, tudo em uma transação
+    linhas_usuarios, linhas_atividades = [], []
+    for (linha, usuario), hashed_password in zip(novos, hashes):
+        usuario_id = uuid.uuid4()
+        dados = usuario.model_dump(exclude={"password", "atividades"})
+        linhas_usuarios.append(
+            {
+                **dados,
+                "id": usuario_id,
+                "hashed_password": hashed_password,
+                "cnpj_cpf_digitos": usuario.cnpj_cpf,
+            }
+        )
+        linhas_atividades += [
+            {
+                "usuario_id": usuario_id,
+                "cod_cnae": str(atv.cod_cnae),
+                "desc_cnae": atv.desc_cnae,
+            }
+            for atv in usuario.atividades
+        ]
+        linha.update(status="criado", id=str(usuario_id))
+
+    # Lotes para respeitar o limite de parâmetros por statement do Postgres
+    for lote in _em_lotes(linhas_usuarios, 1000):
+        await db.execute(insert(Usuario).values(lote))
+    for lote in _em_lotes(linhas_atividades, 5000):
+        await db.execute(insert(Atividade).values(lote))
+    await db.commit()
+
+    return {
+        "total": len(relatorio),
+        "criados": len(linhas_usuarios),
+        "rejeitados": len(relatorio) - len(linhas_usuarios),
+        "linhas": relatorio,
+    }
+
+
 async def get_users(
-    db: AsyncSession, current_user: User, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    current_user: User,
+    *,
+    cursor: str | None = None,
+    limit: int = 100,
+    busca: str | None = None,
+    emite: bool | None = None,
+    role_id: int | None = None,
 ):
+    """
+    Listagem administrativa paginada por cursor (keyset em razao_social, id).
+    Cada usuário já vem com as contagens de notas pendentes e de notas do mês,
+    calculadas na mesma query. Retorna (usuarios, proximo_cursor).
+    """
 
     if current_user.role_id != 1:
         raise HTTPException(
@@ -112,19 +269,77 @@ async def get_users(
             detail="Você não tem permissão.",
         )
 
-    usuarios = await db.scalars(
-        select(Usuario).where(Usuario.role_id != 1)
+    # Pendentes vêm da contagem mantida por trigger (pendencias_usuario)
+    notas_pendentes = func.coalesce(
+        select(PendenciasUsuario.pendentes)
+        .where(PendenciasUsuario.usuario_id == Usuario.id)
+        .correlate(Usuario)
+        .scalar_subquery(),
+        0,
+    )
+    notas_mes = (
+        select(func.count())
+        .where(
+            NotaFiscal.usuario_id == Usuario.id,
+            NotaFiscal.data_criacao >= func.date_trunc("month", func.now()),
+        )
+        .correlate(Usuario)
+        .scalar_subquery()
+    )
+
+    query = (
+        select(Usuario, notas_pendentes, notas_mes)
+        .where(Usuario.role_id != 1)
         .options(selectinload(Usuario.atividades))
-        .offset(skip)
-        .limit(limit)
+        .order_by(Usuario.razao_social, Usuario.id)
+        .limit(limit + 1)
     )
 
-    if not usuarios:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Usuários nao encontrados."
+    if busca:
+        termo = busca.strip().lower()
+        query = query.where(
+            or_(
+                func.lower(Usuario.razao_social).like(
+                    padrao_prefixo(termo), escape="\\"
+                ),
+                func.lower(Usuario.email).like(padrao_prefixo(termo), escape="\\"),
+                Usuario.cnpj_cpf.like(
+                    padrao_prefixo(somente_digitos(termo) or termo), escape="\\"
+                ),
+            )
         )
+    if emite is not None:
+        query = query.where(func.coalesce(Usuario.emite, False) == emite)
+    if role_id is not None:
+        query = query.where(Usuario.role_id == role_id)
+    if cursor:
+        razao_social, ultimo_id = decodificar_cursor(cursor, 2)
+        try:
+            ultimo_id = uuid.UUID(ultimo_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido."
+            )
+        query = query.where(
+            tuple_(Usuario.razao_social, Usuario.id) > tuple_(razao_social, ultimo_id)
+        )
+
+    result = await db.execute(query)
+    linhas = result.all()
+
+    proximo_cursor = None
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        ultimo = linhas[-1][0]
+        proximo_cursor = codificar_cursor(ultimo.razao_social, ultimo.id)
 
-    return usuarios
+    usuarios = []
+    for usuario, pendentes, do_mes in linhas:
+        usuario.notas_pendentes = pendentes
+        usuario.notas_mes = do_mes
+        usuarios.append(usuario)
+
+    return usuarios, proximo_cursor
 
 
 async def update_user(
@@ -157,33 +372,46 @@ async def update_user(
         update_data.pop("email", None)  # opcional: permitir mudança de email?
         update_data.pop("cnpj_cpf", None)  # geralmente não se muda
 
+    # Documento: valida só quando muda; reenviado igual, fica como está
+    if "cnpj_cpf" in update_data:
+        novo_documento = update_data["cnpj_cpf"]
+        if novo_documento is None or somente_digitos(novo_documento) == db_user.cnpj_cpf_digitos:
+            update_data.pop("cnpj_cpf")
+        else:
+            try:
+                update_data["cnpj_cpf"] = normalizar_cpf_cnpj(novo_documento)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+    aliquota_alterada = "aliquota" in update_data and (
+        update_data["aliquota"] is None
+        or db_user.aliquota is None
+        or float(db_user.aliquota) != update_data["aliquota"]
+    )
+
     for field, value in update_data.items():
         if field != "atividades":
             setattr(db_user, field, value)
 
-    # 4. Atualizar atividades (substituir todas)
+    # Mantém as notas pendentes com a alíquota nova, na mesma transação
+    if aliquota_alterada:
+        await propagar_aliquota_usuario(db, user_id, update_data["aliquota"])
+
+    # 4. Atualizar atividades (aplica só a diferença por cod_cnae)
     if "atividades" in update_data and update_data["atividades"] is not None:
-        # Apagar atividades antigas
-        await db.execute(delete(Atividade).where(Atividade.usuario_id == user_id))
-
-        # Adicionar as novas
-        for atv in update_data["atividades"]:
-            nova_atividade = Atividade(
-                cod_cnae=str(atv["cod_cnae"]),
-                desc_cnae=atv["desc_cnae"],
-                usuario_id=user_id,
-            )
-            db.add(nova_atividade)
+        await sincronizar_atividades(
+            db, user_id, db_user.atividades, update_data["atividades"]
+        )
 
     # 5. Salvar
     await db.commit()
-    await db.refresh(db_user)
 
-    # 6. Recarregar com atividades
+    # 6. Recarregar uma única vez, já com as atividades atualizadas
     result = await db.execute(
         select(Usuario)
         .options(selectinload(Usuario.atividades))
         .where(Usuario.id == user_id)
+        .execution_options(populate_existing=True)
     )
     return result.scalar_one()
 
@@ -212,31 +440,115 @@ async def delete_user(db: AsyncSession, user_id: uuid.UUID, admin_user_id: uuid.
     return {"message": "Usuário excluído com sucesso"}
 
 
-async def atualizar_aliquotas_notas_em_lote(db: AsyncSession):
-    result = await db.execute(
-        select(Usuario.id, Usuario.aliquota).where(Usuario.aliquota.isnot(None))
+def _criterios_propagacao_aliquota():
+    # Notas pendentes cuja alíquota difere da alíquota atual do usuário
+    return (
+        NotaFiscal.usuario_id == Usuario.id,
+        Usuario.aliquota.isnot(None),
+        NotaFiscal.status_id == StatusNotaId.PENDENTE,
+        NotaFiscal.aliquota.is_distinct_from(Usuario.aliquota),
     )
-    usuarios = result.fetchall()
 
-    total_notas_atualizadas = 0
 
-    for user_id, aliquota_usuario in usuarios:
-        stmt = (
-            update(NotaFiscal)
-            .where(
-                NotaFiscal.usuario_id == user_id,
-                NotaFiscal.status_id == 1,
-                (NotaFiscal.aliquota != aliquota_usuario)
-                | (NotaFiscal.aliquota.is_(None)),
-            )
-            .values(aliquota=aliquota_usuario)
+async def propagar_aliquota_usuario(
+    db: AsyncSession, usuario_id: uuid.UUID, aliquota: float | None
+) -> int:
+    """
+    Modo direcionado: aplica a alíquota de um único usuário às suas notas
+    pendentes. Não faz commit (roda dentro da transação de quem chamou).
+    """
+    if aliquota is None:
+        return 0
+
+    res = await db.execute(
+        update(NotaFiscal)
+        .where(
+            NotaFiscal.usuario_id == usuario_id,
+            NotaFiscal.status_id == StatusNotaId.PENDENTE,
+            NotaFiscal.aliquota.is_distinct_from(aliquota),
         )
-        res = await db.execute(stmt)
-        total_notas_atualizadas += res.rowcount
+        .values(aliquota=aliquota)
+        .execution_options(synchronize_session=False)
+    )
+    return res.rowcount
 
-    await db.commit()
+
+async def atualizar_aliquotas_notas_em_lote(
+    db: AsyncSession,
+    *,
+    dry_run: bool = False,
+    tamanho_lote: int | None = None,
+):
+    """
+    Propaga a alíquota de cada usuário para as suas notas pendentes.
+
+    - Padrão: um único UPDATE notas_fiscais ... FROM usuarios.
+    - tamanho_lote: processa os usuários em lotes (keyset por id), com um
+      commit e um registro de progresso por lote, para tabelas muito grandes.
+    - dry_run: apenas conta as notas que seriam atualizadas, sem escrever.
+    """
+    total_usuarios = await db.scalar(
+        select(func.count()).select_from(Usuario).where(Usuario.aliquota.isnot(None))
+    )
+
+    if dry_run:
+        total_notas = await db.scalar(
+            select(func.count())
+            .select_from(NotaFiscal)
+            .join(Usuario, NotaFiscal.usuario_id == Usuario.id)
+            .where(*_criterios_propagacao_aliquota())
+        )
+        return {
+            "dry_run": True,
+            "total_usuarios": total_usuarios,
+            "total_notas_atualizadas": total_notas,
+        }
+
+    stmt = (
+        update(NotaFiscal)
+        .values(aliquota=Usuario.aliquota)
+        .execution_options(synchronize_session=False)
+    )
+
+    if not tamanho_lote:
+        res = await db.execute(stmt.where(*_criterios_propagacao_aliquota()))
+        await db.commit()
+        return {
+            "total_usuarios": total_usuarios,
+            "total_notas_atualizadas": res.rowcount,
+        }
+
+    total_notas_atualizadas = 0
+    lotes = 0
+    ultimo_id = None
+    while True:
+        ids_query = (
+            select(Usuario.id)
+            .where(Usuario.aliquota.isnot(None))
+            .order_by(Usuario.id)
+            .limit(tamanho_lote)
+        )
+        if ultimo_id is not None:
+            ids_query = ids_query.where(Usuario.id > ultimo_id)
+        ids = (await db.scalars(ids_query)).all()
+        if not ids:
+            break
+
+        res = await db.execute(
+            stmt.where(*_criterios_propagacao_aliquota(), Usuario.id.in_(ids))
+        )
+        await db.commit()
+
+        lotes += 1
+        ultimo_id = ids[-1]
+        total_notas_atualizadas += res.rowcount
+        print(
+            f"[ALIQUOTA] Lote {lotes}: {len(ids)} usuários, {res.rowcount} notas "
+            f"(total {total_notas_atualizadas})"
+        )
 
     return {
-        "total_usuarios": len(usuarios),
+        "total_usuarios": total_usuarios,
         "total_notas_atualizadas": total_notas_atualizadas,
+        "lotes": lotes,
     }
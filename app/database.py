@@ -1,26 +1,155 @@
 # app/database.py
+import asyncio
+import uuid
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
+from app.core.instrumentacao_db import instrumentar_engine
+from app.core.pool import PoolInstrumentado
+from app.core.metricas import registro as registro_metricas
 
 # Cria a classe base para os modelos
 Base = declarative_base()
 
+
+def _nome_statement_pgbouncer() -> str:
+    # Nome único por statement: conexões de servidor compartilhadas pelo
+    # PgBouncer nunca recebem dois prepares com o mesmo nome
+    return f"__asyncpg_{uuid.uuid4().hex}__"
+
+
+def connect_args_statement_cache(modo: str) -> dict:
+    """
+    Parâmetros do asyncpg para o cache de prepared statements:
+
+    - "desativado": nada é cacheado; todo SQL é re-parseado e re-planejado;
+    - "direto": cache normal, para conexão direta com o Postgres;
+    - "pgbouncer": cache do SQLAlchemy com nomes únicos e cache interno do
+      asyncpg desligado, para PgBouncer em modo transaction (requer
+      max_prepared_statements > 0, PgBouncer 1.21+).
+    """
+    if modo == "desativado":
+        return {
+            "prepared_statement_cache_size": 0,  # Desativa o cache de statements preparados
+            "statement_cache_size": 0,  # Garante que o asyncpg não cacheie nada
+        }
+    if modo == "direto":
+        return {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    if modo == "pgbouncer":
+        return {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_name_func": _nome_statement_pgbouncer,
+            "statement_cache_size": 0,
+        }
+    raise ValueError(f"DB_STATEMENT_CACHE_MODE inválido: {modo!r}")
+
+
+# Perfis do engine; cada valor pode ser sobrescrito pelo DB_* equivalente
+PERFIS_ENGINE = {
+    "dev": {"echo": False, "pool_size": 5, "max_overflow": 10, "pool_recycle": -1,
+            "pool_timeout": 30, "warmup": 0},
+    "prod": {"echo": False, "pool_size": 20, "max_overflow": 10, "pool_recycle": 1800,
+             "pool_timeout": 10, "warmup": 5},
+}
+
+
+def configuracao_engine() -> dict:
+    if settings.DB_PROFILE not in PERFIS_ENGINE:
+        raise ValueError(f"DB_PROFILE inválido: {settings.DB_PROFILE!r}")
+    config = dict(PERFIS_ENGINE[settings.DB_PROFILE])
+    sobrescritas = {
+        "echo": settings.DB_ECHO,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SEGUNDOS,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SEGUNDOS,
+        "warmup": settings.DB_POOL_WARMUP,
+    }
+    config.update({k: v for k, v in sobrescritas.items() if v is not None})
+    return config
+
+
+_config_engine = configuracao_engine()
+
 # Cria engine assíncrono
 engine = create_async_engine(
     settings.DATABASE_URL,
-    echo=True,
+    echo=_config_engine["echo"],
     future=True,
     pool_pre_ping=True,
-    connect_args={
-        "prepared_statement_cache_size": 0,  # Desativa o cache de statements preparados
-        "statement_cache_size": 0,  # Garante que o asyncpg não cacheie nada
-    },
+    poolclass=PoolInstrumentado,
+    pool_logging_name="primario",  # rótulo do pool nas métricas
+    pool_size=_config_engine["pool_size"],
+    max_overflow=_config_engine["max_overflow"],
+    pool_recycle=_config_engine["pool_recycle"],
+    pool_timeout=_config_engine["pool_timeout"],
+    connect_args=connect_args_statement_cache(settings.DB_STATEMENT_CACHE_MODE),
 )
 
+# Sempre instrumentado: o log de consultas lentas não depende das outras opções
+instrumentar_engine(engine, "primario")
+
 # Cria sessionmaker assíncrono
 AsyncSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+# Réplica de leitura opcional (mesmo perfil de pool do primário)
+replica_engine = None
+AsyncReadSessionLocal = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        settings.DATABASE_REPLICA_URL,
+        echo=_config_engine["echo"],
+        future=True,
+        pool_pre_ping=True,
+        poolclass=PoolInstrumentado,
+        pool_logging_name="replica",
+        pool_size=_config_engine["pool_size"],
+        max_overflow=_config_engine["max_overflow"],
+        pool_recycle=_config_engine["pool_recycle"],
+        pool_timeout=_config_engine["pool_timeout"],
+        connect_args=connect_args_statement_cache(settings.DB_STATEMENT_CACHE_MODE),
+    )
+    instrumentar_engine(replica_engine, "replica")
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=replica_engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+
+def _conexoes_pool():
+    engines = [("primario", engine)]
+    if replica_engine is not None:
+        engines.append(("replica", replica_engine))
+    for nome, engine_async in engines:
+        pool = engine_async.pool
+        yield (nome, "em_uso"), pool.checkedout()
+        yield (nome, "livres"), pool.checkedin()
+        yield (nome, "overflow"), max(pool.overflow(), 0)
+
+
+registro_metricas.medidor(
+    "pool_conexoes",
+    "Conexões do pool por engine e estado.",
+    ("engine", "estado"),
+    _conexoes_pool,
+)
+
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def aquecer_pool(conexoes: int | None = None):
+    """
+    Abre N conexões na subida (em paralelo) e as devolve ao pool, para que as
+    primeiras requisições não paguem o handshake com o banco.
+    """
+    conexoes = _config_engine["warmup"] if conexoes is None else conexoes
+    conexoes = min(conexoes, _config_engine["pool_size"])
+    if conexoes <= 0:
+        return
+
+    abertas = await asyncio.gather(*(engine.connect().start() for _ in range(conexoes)))
+    for conexao in abertas:
+        await conexao.close()
+    print(f"[DB] Pool aquecido com {conexoes} conexões (perfil {settings.DB_PROFILE})")
@@ -1,6 +1,12 @@
 from app.models.role import Role
-from app.models.status_nota import StatusNota  # se existir
+from app.models.status_nota import StatusNota, StatusNotaId  # se existir
 from app.models.usuario import Usuario
 from app.models.cliente import Cliente
 from app.models.nota_fiscal import NotaFiscal
-from app.models.atividade import Atividade
\ No newline at end of file
+from app.models.atividade import Atividade
+from app.models.cnae_lista_servicos import CnaeListaAtividades
+from app.models.login_bucket import LoginBucket
+from app.models.versao_catalogo import VersaoCatalogo
+from app.models.historico_status_nota import HistoricoStatusNota
+from app.models.pendencias_usuario import PendenciasUsuario
+from app.models.nota_arquivada import NotaArquivada
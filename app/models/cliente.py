@@ -1,8 +1,9 @@
 # app/models/cliente.py
-from sqlalchemy import Column, BigInteger, String, UUID, ForeignKey, DateTime, Numeric, Integer
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, BigInteger, String, UUID, ForeignKey, DateTime, Numeric, Integer, Index
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from app.database import Base
+from app.core.documentos import somente_digitos
 
 class Cliente(Base):
     __tablename__ = "clientes"
@@ -12,6 +13,7 @@ class Cliente(Base):
     
     razao_social = Column(String, nullable=False)
     cpf_cnpj = Column(String, nullable=True)
+    cpf_cnpj_digitos = Column(String, nullable=True)  # cpf_cnpj sem máscara (buscas)
     email = Column(String, nullable=True)
     telefone = Column(String, nullable=True)
 
@@ -32,3 +34,25 @@ class Cliente(Base):
     # Relacionamentos
     usuario = relationship("Usuario", back_populates="clientes")
     notas_fiscais = relationship("NotaFiscal", back_populates="cliente")
+
+    @validates("cpf_cnpj")
+    def _sincronizar_digitos(self, key, valor):
+        self.cpf_cnpj_digitos = somente_digitos(valor) if valor else None
+        return valor
+
+
+# Um cliente por documento para cada usuário (alvo dos ON CONFLICT)
+Index(
+    "ux_clientes_usuario_cpf_cnpj_digitos",
+    Cliente.usuario_id,
+    Cliente.cpf_cnpj_digitos,
+    unique=True,
+)
+
+# Autocomplete por prefixo do documento dentro dos clientes do usuário
+Index(
+    "ix_clientes_usuario_cpf_cnpj_prefixo",
+    Cliente.usuario_id,
+    Cliente.cpf_cnpj_digitos,
+    postgresql_ops={"cpf_cnpj_digitos": "text_pattern_ops"},
+)
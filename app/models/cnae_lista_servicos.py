@@ -1,6 +1,6 @@
 # app/models/cnae_lista_servicos.py
 
-from sqlalchemy import Column, Integer, String, UUID, ForeignKey
+from sqlalchemy import Column, Integer, String, UUID, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 import uuid
@@ -13,3 +13,11 @@ class CnaeListaAtividades(Base):
     cnae_descricao = Column(String, nullable=False)
     codigo_lista_servico = Column(String, nullable=False)
     lista_servico_descricao = Column(String, nullable=False)
+
+
+# Chave natural usada na carga do catálogo (um CNAE pode ter vários itens)
+Index(
+    "ix_cnae_lista_servicos_cnae_item",
+    CnaeListaAtividades.cnae_numerico,
+    CnaeListaAtividades.codigo_lista_servico,
+)
@@ -0,0 +1,29 @@
+# app/models/historico_status_nota.py
+from sqlalchemy import Column, BigInteger, Integer, String, UUID, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class HistoricoStatusNota(Base):
+    """
+    Cada mudança de status de uma nota (quem, quando, de/para e motivo).
+    Sem FK para notas_fiscais de propósito: o histórico sobrevive ao
+    arquivamento das notas e não impede o particionamento da tabela.
+    """
+
+    __tablename__ = "historico_status_nota"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    nota_id = Column(BigInteger, nullable=False)
+    status_anterior = Column(Integer, nullable=False)
+    status_novo = Column(Integer, nullable=False)
+    usuario_id = Column(UUID(as_uuid=True), nullable=True)  # None = processo automático
+    motivo = Column(String, nullable=True)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+Index(
+    "ix_historico_status_nota_nota_criado_em",
+    HistoricoStatusNota.nota_id,
+    HistoricoStatusNota.criado_em,
+)
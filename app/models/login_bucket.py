@@ -0,0 +1,14 @@
+# app/models/login_bucket.py
+from sqlalchemy import Column, String, Float, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class LoginBucket(Base):
+    """Estado dos token buckets de login compartilhado entre os workers."""
+
+    __tablename__ = "login_buckets"
+
+    chave = Column(String, primary_key=True)  # ex: "id:12345678000190" ou "ip:10.0.0.1"
+    tokens = Column(Float, nullable=False)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,22 @@
+# app/models/nota_arquivada.py
+from sqlalchemy import Column, BigInteger, Integer, String, UUID, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class NotaArquivada(Base):
+    """
+    Índice do arquivo frio: onde está cada nota que saiu de notas_fiscais
+    (arquivo, posição e tamanho do bloco comprimido que a contém). Ver
+    app/core/arquivo_notas.py.
+    """
+
+    __tablename__ = "notas_arquivadas"
+
+    nota_id = Column(BigInteger, primary_key=True)
+    usuario_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    status_id = Column(Integer, nullable=False)
+    arquivo = Column(String, nullable=False)  # nome relativo a ARQUIVO_NOTAS_DIR
+    posicao = Column(BigInteger, nullable=False)  # byte inicial do bloco
+    tamanho = Column(Integer, nullable=False)  # bytes do bloco comprimido
+    arquivado_em = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -9,10 +9,12 @@ from sqlalchemy import (
     Numeric,
     Integer,
     DateTime,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
+from app.models.status_nota import StatusNotaId
 
 
 class NotaFiscal(Base):
@@ -32,7 +34,7 @@ class NotaFiscal(Base):
     data_emissao = Column(Date, nullable=True)
     valor_total = Column(Numeric(10, 2), nullable=False)
     descricao = Column(String, nullable=True)
-    status_id = Column(Integer, ForeignKey("status_nota.id"), nullable=False, default=1)
+    status_id = Column(Integer, ForeignKey("status_nota.id"), nullable=False, default=StatusNotaId.PENDENTE)
     data_criacao = Column(DateTime(timezone=True), server_default=func.now())
     data_atualizacao = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
@@ -50,3 +52,27 @@ class NotaFiscal(Base):
     usuario = relationship("Usuario", back_populates="notas_fiscais")
     cliente = relationship("Cliente", back_populates="notas_fiscais", lazy="selectin")
     status = relationship("StatusNota")
+
+
+# Contagens por usuário (pendentes / notas do mês) sem varrer a tabela inteira
+Index("ix_notas_fiscais_usuario_status", NotaFiscal.usuario_id, NotaFiscal.status_id)
+Index(
+    "ix_notas_fiscais_usuario_data_criacao",
+    NotaFiscal.usuario_id,
+    NotaFiscal.data_criacao,
+)
+# Fila de revisão: índices parciais só com as notas pendentes (poucas linhas,
+# já na ordem da fila, geral e por usuário)
+Index(
+    "ix_notas_fiscais_pendentes_data_criacao",
+    NotaFiscal.data_criacao,
+    NotaFiscal.id,
+    postgresql_where=NotaFiscal.status_id == int(StatusNotaId.PENDENTE),
+)
+Index(
+    "ix_notas_fiscais_pendentes_usuario_data_criacao",
+    NotaFiscal.usuario_id,
+    NotaFiscal.data_criacao,
+    NotaFiscal.id,
+    postgresql_where=NotaFiscal.status_id == int(StatusNotaId.PENDENTE),
+)
@@ -0,0 +1,22 @@
+# app/models/pendencias_usuario.py
+from sqlalchemy import Column, Integer, UUID, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PendenciasUsuario(Base):
+    """
+    Quantidade de notas pendentes de cada usuário, mantida por trigger em
+    notas_fiscais (ver DDL_EXTRA em app/core/schema.py). Serve o contador da
+    fila de revisão sem varrer a tabela de notas.
+    """
+
+    __tablename__ = "pendencias_usuario"
+
+    usuario_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("usuarios.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    pendentes = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,8 +1,19 @@
-# app/models/status_nota.py
+from enum import IntEnum
 from sqlalchemy import Column, Integer, String
 from app.database import Base
 
 class StatusNota(Base):
     __tablename__ = "status_nota"
     id = Column(Integer, primary_key=True)
-    nome = Column(String, unique=True, nullable=False)
\ No newline at end of file
+    nome = Column(String, unique=True, nullable=False)
+
+
+class StatusNotaId(IntEnum):
+    """IDs fixos da tabela status_nota usados nas regras de negócio."""
+
+    PENDENTE = 1  # Aguardando Validação
+    EMITIDA = 2
+    RECUSADA = 3
+    APROVADA = 4
+    EXCLUIDA = 5  # exclusão lógica
+    EM_PROCESSAMENTO = 6
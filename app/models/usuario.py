@@ -1,8 +1,9 @@
 # app/models/usuario.py
-from sqlalchemy import Column, String, Integer, DateTime, UUID, ForeignKey, Numeric, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, DateTime, UUID, ForeignKey, Numeric, Boolean, Index
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from app.database import Base
+from app.core.documentos import somente_digitos
 import uuid
 
 
@@ -17,6 +18,7 @@ class Usuario(Base):
 
     # Dados da empresa
     cnpj_cpf = Column(String, unique=True, nullable=False)
+    cnpj_cpf_digitos = Column(String, nullable=True, index=True)  # sem máscara
     razao_social = Column(String, nullable=False)
     aliquota = Column(Numeric(5, 2), nullable=True)
     emite = Column(Boolean, nullable=True, default=False)
@@ -52,3 +54,27 @@ class Usuario(Base):
     atividades = relationship(
         "Atividade", back_populates="usuario", cascade="all, delete-orphan"
     )
+
+    @validates("cnpj_cpf")
+    def _sincronizar_digitos(self, key, valor):
+        self.cnpj_cpf_digitos = somente_digitos(valor) if valor else None
+        return valor
+
+
+# Índices da listagem administrativa (ordenação por razão social e busca por prefixo)
+Index("ix_usuarios_razao_social_id", Usuario.razao_social, Usuario.id)
+Index(
+    "ix_usuarios_razao_social_prefixo",
+    func.lower(Usuario.razao_social).label("razao_social_lower"),
+    postgresql_ops={"razao_social_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_usuarios_email_prefixo",
+    func.lower(Usuario.email).label("email_lower"),
+    postgresql_ops={"email_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_usuarios_cnpj_cpf_prefixo",
+    Usuario.cnpj_cpf,
+    postgresql_ops={"cnpj_cpf": "text_pattern_ops"},
+)
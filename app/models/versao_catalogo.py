@@ -0,0 +1,18 @@
+# app/models/versao_catalogo.py
+from sqlalchemy import Column, String, BigInteger, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class VersaoCatalogo(Base):
+    """
+    Versão de cada catálogo mantido em memória (ex: CNAE). Triggers
+    incrementam a versão a cada alteração da tabela de origem e os workers
+    recarregam o catálogo quando a versão muda.
+    """
+
+    __tablename__ = "versoes_catalogo"
+
+    nome = Column(String, primary_key=True)
+    versao = Column(BigInteger, nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
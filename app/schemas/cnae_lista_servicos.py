@@ -0,0 +1,12 @@
+# app/schemas/cnae_lista_servicos.py
+from pydantic import BaseModel, ConfigDict
+
+
+class CnaeListaServico(BaseModel):
+    id: int
+    cnae_numerico: str
+    cnae_descricao: str
+    codigo_lista_servico: str
+    lista_servico_descricao: str
+
+    model_config = ConfigDict(from_attributes=True)
@@ -1,5 +1,5 @@
 # app/schemas/nota_fiscal.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import date, datetime
 import uuid
@@ -64,6 +64,30 @@ class AtualizarStatusNotaPayload(BaseModel):
 class AtualizarStutasNotaAceitePayload(BaseModel):
     nota_id: int
 
+class AcaoNotasLotePayload(BaseModel):
+    nota_ids: list[int] = Field(..., min_length=1, max_length=5000)
+
+
+class RecusarNotasLotePayload(AcaoNotasLotePayload):
+    desc_motivo: str
+
+
+class NotaIgnoradaLote(BaseModel):
+    id: int
+    status_id: Optional[int] = None  # None = nota não encontrada
+    motivo: str
+
+
+class ResultadoAcaoLote(BaseModel):
+    transicionadas: list[int]
+    ignoradas: list[NotaIgnoradaLote]
+
+class PendenciasPorUsuario(BaseModel):
+    usuario_id: uuid.UUID
+    razao_social: str
+    pendentes: int
+    mais_antiga: Optional[datetime] = None
+
 class AtualizarStatusMotivoNotaPayload(BaseModel):
     nota_id: int
     status_id: int
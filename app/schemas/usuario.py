@@ -1,10 +1,10 @@
 # schemas/usuario.py
-import re
 import uuid
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr, field_validator
 from pydantic import ConfigDict
 from .atividade import Atividade, AtividadeCreate
+from app.core.documentos import normalizar_cpf_cnpj
 
 
 class ResetPasswordRequest(BaseModel):
@@ -43,10 +43,19 @@ class UserCreate(UserBase):
     @field_validator("cnpj_cpf")
     @classmethod
     def clean_cnpj_cpf(cls, v: str) -> str:
-        cleaned = re.sub(r"\D", "", v)
-        if len(cleaned) not in (11, 14):
-            raise ValueError("CPF ou CNPJ inválido")
-        return cleaned
+        return normalizar_cpf_cnpj(v)
+
+
+class UsuarioImportacao(UserBase):
+    """Linha de importação em lote. Sem senha, a senha inicial é o documento."""
+
+    role_id: int = 2
+    password: Optional[str] = None
+
+    @field_validator("cnpj_cpf")
+    @classmethod
+    def clean_cnpj_cpf(cls, v: str) -> str:
+        return normalizar_cpf_cnpj(v)
 
 
 class UserLogin(BaseModel):
@@ -74,20 +83,18 @@ class UserUpdate(BaseModel):
     emite: Optional[bool] = None
     insc_municipal: Optional[str] = None
 
+    # cnpj_cpf sem validação aqui: o formulário reenvia o documento mesmo sem
+    # alterá-lo, e cadastros antigos podem ter um inválido. O update_user só
+    # valida quando o documento muda.
     atividades: Optional[List[AtividadeCreate]] = None
 
-    @field_validator("cnpj_cpf")
-    @classmethod
-    def clean_cnpj_cpf(cls, v: Optional[str]) -> Optional[str]:
-        if v is None:
-            return v
-        cleaned = re.sub(r"\D", "", v)
-        if len(cleaned) not in (11, 14):
-            raise ValueError("CPF ou CNPJ inválido")
-        return cleaned
-
 
 class User(UserBase):
     id: uuid.UUID
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+class UsuarioListagem(User):
+    notas_pendentes: int = 0
+    notas_mes: int = 0
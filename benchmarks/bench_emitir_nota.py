@@ -0,0 +1,114 @@
+# benchmarks/bench_emitir_nota.py
+"""
+Notas criadas por segundo no caminho do POST /nota-fiscal: fluxo antigo
+(busca do cliente, create_cliente com commit, consulta do CNAE e
+create_nota_fiscal com commit) contra criar_nota_fiscal_com_cliente.
+
+Roda contra o banco do DATABASE_URL e apaga as notas/clientes criados.
+
+Uso:
+    python -m benchmarks.bench_emitir_nota --documento 12345678000190 --cnae 6201501 -n 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from sqlalchemy import delete, select
+from app.crud.cliente import create_cliente, get_cliente_by_cpf_cnpj
+from app.crud.nota_fiscal import create_nota_fiscal, criar_nota_fiscal_com_cliente
+from app.crud.usuario import get_user_by_documento
+from app.database import AsyncSessionLocal
+from app.models import Cliente, NotaFiscal
+from app.models.cnae_lista_servicos import CnaeListaAtividades
+from app.schemas.nota_fiscal import NotaFiscalCreate
+
+
+def _nota(documento_cliente: str, cnae: str) -> NotaFiscalCreate:
+    return NotaFiscalCreate(
+        cpf_cnpj=documento_cliente,
+        razao_social="Tomador Benchmark",
+        pais="Brasil",
+        uf="CE",
+        cidade="Fortaleza",
+        cep="60000000",
+        logradouro="Rua Teste",
+        numero="1",
+        bairro="Centro",
+        cod_cnae=cnae,
+        valor_total=100.0,
+        descricao="benchmark",
+    )
+
+
+async def _fluxo_antigo(db, usuario, nota_nova: NotaFiscalCreate):
+    cliente = await get_cliente_by_cpf_cnpj(db, nota_nova.cpf_cnpj, usuario.id)
+    if cliente is None:
+        cliente_data = nota_nova.model_dump(
+            include={"razao_social", "cpf_cnpj", "pais", "uf", "cidade", "cep",
+                     "logradouro", "numero", "bairro"}
+        )
+        cliente = await create_cliente(db, cliente_data, usuario.id)
+    codigo = await db.scalar(
+        select(CnaeListaAtividades.codigo_lista_servico)
+        .where(CnaeListaAtividades.cnae_numerico == nota_nova.cod_cnae)
+        .limit(1)
+    )
+    return await create_nota_fiscal(
+        db,
+        {
+            "usuario_id": usuario.id,
+            "cliente_id": cliente.id,
+            "cod_cnae": nota_nova.cod_cnae,
+            "valor_total": nota_nova.valor_total,
+            "descricao": nota_nova.descricao,
+            "status_id": 1,
+            "aliquota": usuario.aliquota,
+            "codigo_lista_servico": codigo,
+        },
+    )
+
+
+async def _medir(nome, fluxo, usuario, cnae, n, cliente_existente):
+    notas, documentos = [], []
+    async with AsyncSessionLocal() as db:
+        inicio = time.perf_counter()
+        for _ in range(n):
+            documento = cliente_existente or str(random.randrange(10**13, 10**14))
+            documentos.append(documento)
+            nota = await fluxo(db, usuario, _nota(documento, cnae))
+            notas.append(nota.id)
+        duracao = time.perf_counter() - inicio
+
+        # Limpeza do que o benchmark criou
+        await db.execute(delete(NotaFiscal).where(NotaFiscal.id.in_(notas)))
+        if not cliente_existente:
+            await db.execute(
+                delete(Cliente).where(
+                    Cliente.usuario_id == usuario.id, Cliente.cpf_cnpj.in_(documentos)
+                )
+            )
+        await db.commit()
+
+    print(f"{nome:<8} {n} notas em {duracao:.2f}s -> {n / duracao:.1f} notas/s")
+
+
+async def main(args):
+    async with AsyncSessionLocal() as db:
+        usuario = await get_user_by_documento(db, args.documento)
+    if usuario is None:
+        raise SystemExit(f"Usuário {args.documento} não encontrado.")
+
+    for nome, fluxo in (("antes", _fluxo_antigo), ("depois", criar_nota_fiscal_com_cliente)):
+        await _medir(nome, fluxo, usuario, args.cnae, args.n, args.cliente_existente)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da criação de notas")
+    parser.add_argument("--documento", required=True, help="CNPJ/CPF do usuário emissor")
+    parser.add_argument("--cnae", required=True, help="CNAE cadastrado em cnae_lista_servicos")
+    parser.add_argument("-n", type=int, default=200)
+    parser.add_argument(
+        "--cliente-existente",
+        help="Documento de um cliente já cadastrado (mede o caminho sem criação)",
+    )
+    asyncio.run(main(parser.parse_args()))
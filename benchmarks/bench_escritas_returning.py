@@ -0,0 +1,158 @@
+# benchmarks/bench_escritas_returning.py
+"""
+Statements SQL e latência por operação de escrita: padrão antigo (SELECT,
+setattr, commit, refresh) contra as versões com UPDATE/INSERT ... RETURNING
+de app/crud. O commit (1 round trip a mais) é igual nos dois lados e não
+entra na contagem de statements.
+
+Roda contra o banco do DATABASE_URL numa nota/cliente temporários, apagados
+no final.
+
+Uso:
+    python -m benchmarks.bench_escritas_returning --documento 12345678000190 --cnae 6201501 -n 50
+"""
+import argparse
+import asyncio
+import random
+import time
+from sqlalchemy import delete
+from sqlalchemy.future import select
+from app.core.instrumentacao_db import MetricasRequisicao, metricas_requisicao
+from app.crud.cliente import create_cliente
+from app.crud.nota_fiscal import (
+    aprovar_nota_fiscal,
+    create_nota_fiscal,
+    insert_id_nota_api,
+    update_status_nota,
+)
+from app.crud.usuario import get_user_by_documento
+from app.database import AsyncSessionLocal
+from app.models import Cliente, NotaFiscal
+from app.models.status_nota import StatusNotaId
+
+
+def _dados_cliente() -> dict:
+    return {
+        "razao_social": "Tomador Benchmark",
+        "cpf_cnpj": str(random.randrange(10**13, 10**14)),
+        "pais": "Brasil",
+        "uf": "CE",
+        "cidade": "Fortaleza",
+    }
+
+
+# Padrão antigo, reproduzido aqui para comparação
+async def _antigo_create_cliente(db, dados, usuario_id):
+    existente = await db.scalar(
+        select(Cliente).where(
+            Cliente.usuario_id == usuario_id, Cliente.cpf_cnpj == dados["cpf_cnpj"]
+        )
+    )
+    assert existente is None
+    cliente = Cliente(**dados, usuario_id=usuario_id)
+    db.add(cliente)
+    await db.commit()
+    await db.refresh(cliente)
+    return cliente
+
+
+async def _antigo_update_status(db, nota_id, status_id):
+    nota = await db.scalar(select(NotaFiscal).where(NotaFiscal.id == nota_id))
+    nota.status_id = status_id
+    await db.commit()
+    await db.refresh(nota)
+    return nota
+
+
+async def _antigo_aprovar(db, nota_id):
+    nota = await db.get(NotaFiscal, nota_id)
+    assert nota.status_id == StatusNotaId.PENDENTE
+    nota.status_id = StatusNotaId.APROVADA
+    await db.commit()
+    await db.refresh(nota)
+    return nota
+
+
+async def _medir(nome, operacao, n, preparar=None):
+    statements, tempos = 0, []
+    for _ in range(n):
+        if preparar is not None:
+            async with AsyncSessionLocal() as db:
+                await preparar(db)
+        metricas = MetricasRequisicao(nome)
+        token = metricas_requisicao.set(metricas)
+        async with AsyncSessionLocal() as db:
+            inicio = time.perf_counter()
+            await operacao(db)
+            tempos.append(time.perf_counter() - inicio)
+        metricas_requisicao.reset(token)
+        statements += metricas.consultas
+    print(
+        f"{nome:<28} {statements / n:4.1f} statements/op  "
+        f"{sum(tempos) / n * 1000:7.2f} ms/op"
+    )
+
+
+async def main(args):
+    async with AsyncSessionLocal() as db:
+        usuario = await get_user_by_documento(db, args.documento)
+    if usuario is None:
+        raise SystemExit(f"Usuário {args.documento} não encontrado.")
+
+    clientes_criados, notas_criadas = [], []
+
+    async def nova_nota(db):
+        nota = await create_nota_fiscal(
+            db,
+            {
+                "usuario_id": usuario.id,
+                "cod_cnae": args.cnae,
+                "valor_total": 100.0,
+                "descricao": "benchmark",
+                "status_id": StatusNotaId.PENDENTE,
+            },
+        )
+        notas_criadas.append(nota.id)
+        return nota
+
+    async with AsyncSessionLocal() as db:
+        nota_id = (await nova_nota(db)).id
+
+    async def antigo_cliente(db):
+        cliente = await _antigo_create_cliente(db, _dados_cliente(), usuario.id)
+        clientes_criados.append(cliente.id)
+
+    async def novo_cliente(db):
+        cliente = await create_cliente(db, _dados_cliente(), usuario.id)
+        clientes_criados.append(cliente.id)
+
+    async def voltar_para_pendente(db):
+        await update_status_nota(db, nota_id, StatusNotaId.PENDENTE)
+
+    pendente = StatusNotaId.PENDENTE
+    operacoes = [
+        ("create_cliente (antigo)", antigo_cliente, None),
+        ("create_cliente (RETURNING)", novo_cliente, None),
+        ("create_nota_fiscal (RETURNING)", nova_nota, None),
+        ("update_status (antigo)", lambda db: _antigo_update_status(db, nota_id, pendente), None),
+        ("update_status (RETURNING)", lambda db: update_status_nota(db, nota_id, pendente), None),
+        ("insert_id_nota_api (RETURNING)", lambda db: insert_id_nota_api(db, nota_id, 0), None),
+        ("aprovar (antigo)", lambda db: _antigo_aprovar(db, nota_id), voltar_para_pendente),
+        ("aprovar (RETURNING)", lambda db: aprovar_nota_fiscal(db, nota_id), voltar_para_pendente),
+    ]
+    try:
+        for nome, operacao, preparar in operacoes:
+            await _medir(nome, operacao, args.n, preparar)
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(NotaFiscal).where(NotaFiscal.id.in_(notas_criadas)))
+            await db.execute(delete(Cliente).where(Cliente.id.in_(clientes_criados)))
+            await db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das escritas com RETURNING")
+    parser.add_argument("--documento", required=True, help="CNPJ/CPF do usuário dono das notas")
+    parser.add_argument("--cnae", required=True)
+    parser.add_argument("-n", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
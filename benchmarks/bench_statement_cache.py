@@ -0,0 +1,71 @@
+# benchmarks/bench_statement_cache.py
+"""
+Requisições por segundo no caminho autenticação + listagem (o mesmo do
+GET /nota-fiscal/: busca do usuário pelo documento do token e
+get_todas_notas) com cada modo de DB_STATEMENT_CACHE_MODE.
+
+Só faz leituras no banco do DATABASE_URL. Para medir o modo "pgbouncer",
+aponte --url para o PgBouncer.
+
+Uso:
+    python -m benchmarks.bench_statement_cache --documento 12345678000190 -n 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.core.config import settings
+from app.crud.nota_fiscal import get_todas_notas
+from app.crud.usuario import get_user_by_documento
+from app.database import connect_args_statement_cache
+
+
+async def _medir(modo: str, url: str, documento: str, n: int):
+    engine = create_async_engine(
+        url, pool_size=1, connect_args=connect_args_statement_cache(modo)
+    )
+    Sessao = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def requisicao():
+        async with Sessao() as db:
+            usuario = await get_user_by_documento(db, documento)
+            if usuario is None:
+                raise SystemExit(f"Usuário {documento} não encontrado.")
+            return await get_todas_notas(db, usuario)
+
+    # Aquecimento: abre a conexão e, nos modos com cache, prepara os statements
+    for _ in range(5):
+        notas = await requisicao()
+
+    tempos = []
+    for _ in range(n):
+        inicio = time.perf_counter()
+        await requisicao()
+        tempos.append(time.perf_counter() - inicio)
+    await engine.dispose()
+
+    tempos.sort()
+    print(
+        f"{modo:<11} {n / sum(tempos):8.1f} req/s  "
+        f"p50 {statistics.median(tempos) * 1000:6.2f} ms  "
+        f"p95 {tempos[int(len(tempos) * 0.95) - 1] * 1000:6.2f} ms  "
+        f"({len(notas)} notas por listagem)"
+    )
+
+
+async def main(args):
+    for modo in args.modos:
+        await _medir(modo, args.url, args.documento, args.n)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do cache de statements")
+    parser.add_argument("--documento", required=True, help="CNPJ/CPF do usuário do token")
+    parser.add_argument("-n", type=int, default=500)
+    parser.add_argument("--url", default=settings.DATABASE_URL)
+    parser.add_argument(
+        "--modos", nargs="+", default=["desativado", "direto"],
+        choices=["desativado", "direto", "pgbouncer"],
+    )
+    asyncio.run(main(parser.parse_args()))
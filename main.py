@@ -1,11 +1,44 @@
 # main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.v1 import auth, cliente_routes, nota_fiscal, usuarios, atividades, status
+from app.api.v1 import auth, cliente_routes, nota_fiscal, usuarios, atividades, status, cnae, diagnostico, metricas
 from app.core.config import settings
+from app.core.schema import preparar_banco, verificar_banco
+from app.core.catalogos import carregar_catalogos, monitorar_catalogos
+from app.core.particoes import manter_particoes
+from app.database import aquecer_pool
+from app.core.replica import RegistroEscritaMiddleware
+from app.core.instrumentacao_db import MedicaoConsultasMiddleware
+from app.core.metricas import MetricasHttpMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema criado pelo app.cli.migrar_banco; aqui só se confere (falta
+    # algo, a subida falha em vez de atender com o banco incompleto)
+    if settings.DB_MIGRAR_NA_SUBIDA:
+        await preparar_banco()
+    await verificar_banco()
+    await aquecer_pool()
+
+    # Catálogos em memória + verificação periódica de versão
+    await carregar_catalogos()
+    monitor = asyncio.create_task(monitorar_catalogos())
+
+    # Partições futuras de notas_fiscais (só age se a tabela for particionada)
+    particoes = asyncio.create_task(manter_particoes())
+
+    yield
+
+    particoes.cancel()
+    monitor.cancel()
+
+
 app = FastAPI(
     title="Comunica - Backend",
+    lifespan=lifespan,
     swagger_ui_parameters={"oauth2RedirectUrl": None},
 )
 
@@ -22,6 +55,23 @@ app.include_router(cliente_routes.router, prefix="/clientes", tags=["cliente"])
 app.include_router(usuarios.router, prefix="/usuarios", tags=["usuarios"])
 app.include_router(atividades.router, prefix="/atividades", tags=["atividades"])
 app.include_router(status.router, prefix="/status", tags=["status"])
+app.include_router(cnae.router, prefix="/cnae", tags=["cnae"])
+app.include_router(diagnostico.router, prefix="/diagnostico", tags=["diagnostico"])
+app.include_router(metricas.router, tags=["metricas"])
+
+# Contagem de consultas/tempo de banco por requisição (Server-Timing)
+if settings.CONSULTAS_INSTRUMENTACAO:
+    app.add_middleware(MedicaoConsultasMiddleware)
+
+# Leitura da própria escrita quando há réplica de leitura
+if settings.DATABASE_REPLICA_URL:
+    app.add_middleware(RegistroEscritaMiddleware)
+
+# Latência por rota (template) e status para o /metrics
+if settings.METRICAS_HABILITADAS:
+    app.add_middleware(MetricasHttpMiddleware)
+    if not settings.METRICAS_TOKEN:
+        print("[METRICAS] METRICAS_TOKEN não definido: GET /metrics fica indisponível")
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +79,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Proximo-Cursor",
+        "X-Total-Pendentes",
+        "ETag",
+        "Server-Timing",
+        "X-Ultima-Escrita",
+    ],
 )
 
 
@@ -0,0 +1,32 @@
+# tests/conftest.py
+"""
+Testes de integração com Postgres de verdade. Usam dois bancos (ou duas
+instâncias): TEST_DATABASE_URL faz o papel do primário e
+TEST_DATABASE_REPLICA_URL o da réplica. Sem eles, os testes são pulados.
+
+    TEST_DATABASE_URL=postgresql+asyncpg://.../comunica_teste \
+    TEST_DATABASE_REPLICA_URL=postgresql+asyncpg://.../comunica_teste_replica \
+    python -m pytest -q
+"""
+import os
+
+# As configurações são lidas no import de app.*: precisam estar no ambiente antes
+_PRIMARIO = os.environ.get("TEST_DATABASE_URL")
+_REPLICA = os.environ.get("TEST_DATABASE_REPLICA_URL")
+os.environ["DATABASE_URL"] = _PRIMARIO or "postgresql+asyncpg://localhost/comunica_teste"
+if _REPLICA:
+    os.environ["DATABASE_REPLICA_URL"] = _REPLICA
+for nome, valor in {
+    "SECRET_KEY": "teste",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "RESEND_API_KEY": "re_teste",
+    "ADMIN_EMAILS": "admin@teste.local",
+    "NFSE_ACCESS_KEY": "teste",
+    "NFSE_CN": "teste",
+    "NFSE_URL": "http://127.0.0.1:9/nfse",
+    "DB_PROFILE": "prod",
+}.items():
+    os.environ.setdefault(nome, valor)
+
+BANCOS_CONFIGURADOS = bool(_PRIMARIO and _REPLICA)
@@ -0,0 +1,172 @@
+# tests/test_replica.py
+"""
+Roteamento de leituras para a réplica (app.core.replica): fallback por lag,
+réplica indisponível e leitura da própria escrita pelo marcador do cliente.
+"""
+import asyncio
+import time
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from tests.conftest import BANCOS_CONFIGURADOS
+
+pytestmark = pytest.mark.skipif(
+    not BANCOS_CONFIGURADOS,
+    reason="Defina TEST_DATABASE_URL e TEST_DATABASE_REPLICA_URL",
+)
+
+if BANCOS_CONFIGURADOS:
+    from app.core.config import settings
+    from app.core.replica import (
+        HEADER_ESCRITA,
+        COOKIE_ESCRITA,
+        RegistroEscritaMiddleware,
+        RoteadorLeitura,
+        get_read_db,
+        roteador_leitura,
+    )
+    from app.database import engine, replica_engine
+
+
+def _rodar(corrotina):
+    """Roda o teste num loop próprio, devolvendo as conexões dos pools ao final."""
+
+    async def executar():
+        try:
+            return await corrotina
+        finally:
+            await engine.dispose()
+            await replica_engine.dispose()
+
+    return asyncio.run(executar())
+
+
+async def _nome_banco(engine_async) -> str:
+    async with engine_async.connect() as conn:
+        return await conn.scalar(text("SELECT current_database()"))
+
+
+@pytest.fixture(autouse=True)
+def _roteador_sem_cache():
+    # A saúde da réplica fica em cache: cada teste começa sem ele
+    roteador_leitura._verificado_em = float("-inf")
+    yield
+
+
+def _app_teste() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RegistroEscritaMiddleware)
+
+    @app.get("/banco")
+    async def banco(db=Depends(get_read_db)):
+        return {"banco": await db.scalar(text("SELECT current_database()"))}
+
+    @app.post("/escrita")
+    async def escrita():
+        return {"ok": True}
+
+    @app.post("/escrita-invalida")
+    async def escrita_invalida():
+        raise HTTPException(status_code=400, detail="Inválida")
+
+    return app
+
+
+def _cliente(app: FastAPI, **kwargs) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://teste", **kwargs
+    )
+
+
+def test_replica_em_dia_recebe_leituras():
+    async def cenario():
+        roteador = RoteadorLeitura(replica_engine)
+        assert await roteador.replica_saudavel()
+        assert roteador.lag == 0
+
+    _rodar(cenario())
+
+
+def test_lag_acima_do_limite_volta_para_o_primario():
+    async def cenario():
+        atraso = settings.REPLICA_MAX_LAG_SEGUNDOS + 60
+        roteador = RoteadorLeitura(replica_engine, consulta_lag=text(f"SELECT {atraso}"))
+        assert not await roteador.replica_saudavel()
+        assert roteador.lag == atraso
+
+    _rodar(cenario())
+
+
+def test_replica_indisponivel_volta_para_o_primario():
+    async def cenario():
+        inacessivel = create_async_engine(
+            "postgresql+asyncpg://postgres@/inexistente?host=/nao/existe"
+        )
+        try:
+            roteador = RoteadorLeitura(inacessivel)
+            assert not await roteador.replica_saudavel()
+            assert roteador.lag is None
+        finally:
+            await inacessivel.dispose()
+
+    _rodar(cenario())
+
+
+def test_sem_replica_configurada_usa_o_primario():
+    async def cenario():
+        assert not await RoteadorLeitura(None).replica_saudavel()
+
+    _rodar(cenario())
+
+
+def test_leitura_da_propria_escrita_pelo_cookie():
+    async def cenario():
+        primario, replica = await _nome_banco(engine), await _nome_banco(replica_engine)
+        assert primario != replica
+        app = _app_teste()
+
+        async with _cliente(app) as cliente, _cliente(app) as outro:
+            assert (await cliente.get("/banco")).json()["banco"] == replica
+
+            resposta = await cliente.post("/escrita")
+            assert HEADER_ESCRITA in resposta.headers
+            assert COOKIE_ESCRITA in resposta.cookies
+
+            # Quem escreveu lê do primário; outro cliente continua na réplica
+            assert (await cliente.get("/banco")).json()["banco"] == primario
+            assert (await outro.get("/banco")).json()["banco"] == replica
+
+    _rodar(cenario())
+
+
+def test_leitura_da_propria_escrita_pelo_cabecalho():
+    async def cenario():
+        primario, replica = await _nome_banco(engine), await _nome_banco(replica_engine)
+        app = _app_teste()
+
+        async with _cliente(app) as escritor:
+            marcador = (await escritor.post("/escrita")).headers[HEADER_ESCRITA]
+
+        # O marcador vale em qualquer worker: um cliente novo que o reenvia lê do primário
+        async with _cliente(app, headers={HEADER_ESCRITA: marcador}) as cliente:
+            assert (await cliente.get("/banco")).json()["banco"] == primario
+
+        expirado = str(time.time() - settings.REPLICA_LEITURA_PROPRIA_SEGUNDOS - 1)
+        async with _cliente(app, headers={HEADER_ESCRITA: expirado}) as cliente:
+            assert (await cliente.get("/banco")).json()["banco"] == replica
+
+    _rodar(cenario())
+
+
+def test_escrita_com_erro_nao_marca_o_cliente():
+    async def cenario():
+        replica = await _nome_banco(replica_engine)
+        async with _cliente(_app_teste()) as cliente:
+            resposta = await cliente.post("/escrita-invalida")
+            assert resposta.status_code == 400
+            assert HEADER_ESCRITA not in resposta.headers
+            assert (await cliente.get("/banco")).json()["banco"] == replica
+
+    _rodar(cenario())